@@ -0,0 +1,54 @@
+"""Командная строка для служебных задач без графического интерфейса.
+
+    python aquafarm.py <команда> [параметры]
+    python aquafarm.py <команда> --help
+
+Модуль команды импортируется только при ее запуске, а сами команды не
+импортируют PyQt5 и matplotlib при загрузке, поэтому задания по расписанию
+запускаются быстро и работают на серверах без дисплея. Исключение -
+bench: нагрузочный тест открывает оперативное окно в режиме offscreen.
+"""
+import argparse
+import importlib
+import sys
+
+# Команда -> (модуль, функция main, описание)
+COMMANDS = {
+    "init-db": ("create_db", "main", "создать базу данных и все таблицы"),
+    "migrate": ("create_db", "migrate_main", "обновить схему рабочей базы"),
+    "import": ("services.importer", "main", "загрузить таблицу из CSV"),
+    "export": ("services.export", "main", "выгрузить таблицу или запрос в CSV/Parquet"),
+    "report": ("services.reports", "main", "отчет по ферме в HTML/PDF"),
+    "bench": ("bench.soak", "main", "нагрузочный тест оперативного окна"),
+    "rollups": ("services.rollups", "main", "обновить суточные сводки"),
+    "anomalies": ("services.anomaly", "main", "найти аномалии в новых показаниях"),
+    "maintenance": ("services.maintenance", "main", "пересчитать задачи обслуживания"),
+    "harvest": ("services.harvest", "main", "оценить готовность к сбору"),
+    "fcr": ("services.fcr", "main", "коэффициент конверсии корма за период"),
+    "capacity": ("services.capacity", "main", "плотность посадки аквариумов"),
+    "fridges": ("services.fridges", "main", "разместить партию по холодильникам"),
+    "cold-storage": ("services.cold_storage", "main", "перенести старую историю в архив"),
+    "telemetry": ("services.telemetry", "main", "сервис приема показаний датчиков"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="aquafarm",
+        description="Служебные задачи системы управления аквариумами",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="команды:\n" + "\n".join(f"  {name:<14}{help_text}" for name, (_, _, help_text) in COMMANDS.items()),
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="команда")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="параметры команды")
+    args = parser.parse_args(argv)
+
+    module_name, function, _ = COMMANDS[args.command]
+    command = getattr(importlib.import_module(module_name), function)
+    # Справка команды показывает ее полное имя
+    sys.argv[0] = f"aquafarm {args.command}"
+    return command(args.args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Нагрузочные тесты и замеры производительности (запускаются вручную: python -m bench.<имя>)"""
@@ -0,0 +1,152 @@
+"""Нагрузочный тест оперативного окна на утечки памяти и курсоров.
+
+Многократно выбирает аквариумы и переключает формы, как оператор за
+долгую смену, и сравнивает потребление памяти процессом (RSS) после
+прогрева и в конце. Завершается с кодом 1, если рост памяти превышает
+бюджет или остались незакрытые курсоры.
+
+    python -m bench.soak --iterations 5000 --budget-mb 50
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+ITERATIONS = 2000
+WARMUP = 200
+SAMPLE_EVERY = 100
+BUDGET_MB = 50.0
+
+
+class TrackingCursor(psycopg2.extensions.cursor):
+    """Курсор, считающий открытия и явные закрытия"""
+    opened = 0
+    closed = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        TrackingCursor.opened += 1
+        self._counted_close = False
+
+    def close(self):
+        if not self._counted_close:
+            self._counted_close = True
+            TrackingCursor.closed += 1
+        super().close()
+
+    @classmethod
+    def leaked(cls):
+        return cls.opened - cls.closed
+
+
+def rss_mb():
+    """Текущий размер резидентной памяти процесса, МБ"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        import resource  # Нет /proc: берем пиковое значение
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _silence_message_boxes(QMessageBox):
+    # Модальные окна остановили бы прогон; ответ "Ok"/"Yes" подходит всем формам
+    for name in ("information", "warning", "critical", "question"):
+        setattr(QMessageBox, name, staticmethod(lambda *args, **kwargs: QMessageBox.Ok))
+
+
+def run(iterations=ITERATIONS, warmup=WARMUP, sample_every=SAMPLE_EVERY):
+    """Выполняет прогон и возвращает (базовый RSS, итоговый RSS, замеры, утекшие курсоры)"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+    import connection
+    from operational.mainOperational import OperationalWindow
+
+    _silence_message_boxes(QMessageBox)
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    conn = psycopg2.connect(
+        dbname=connection.DB_NAME,
+        user=connection.DB_USER,
+        password=connection.DB_PASSWORD,
+        host=connection.DB_HOST,
+        cursor_factory=TrackingCursor,
+    )
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT aquarium_id FROM аквариумы ORDER BY aquarium_id LIMIT 50")
+            aquarium_ids = [row[0] for row in cursor.fetchall()]
+        if not aquarium_ids:
+            raise RuntimeError("В базе нет аквариумов для прогона")
+
+        window = OperationalWindow(conn)
+        forms = [window.add_water_parameters, window.add_feeding,
+                 window.add_aquarium_state, window.add_species_state]
+
+        baseline = None
+        samples = []
+        for i in range(iterations):
+            aquarium_id = aquarium_ids[i % len(aquarium_ids)]
+            window.current_aquarium_id = aquarium_id
+            window.aquarium_selected.emit(aquarium_id)
+            forms[i % len(forms)]()
+            app.processEvents()
+
+            if i + 1 == warmup:
+                gc.collect()
+                baseline = rss_mb()
+            if (i + 1) % sample_every == 0:
+                gc.collect()
+                samples.append((i + 1, rss_mb(), TrackingCursor.leaked()))
+
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+        gc.collect()
+        final = rss_mb()
+    finally:
+        conn.close()
+    return baseline if baseline is not None else final, final, samples, TrackingCursor.leaked()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка роста памяти и утечек курсоров оперативного окна")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--warmup", type=int, default=WARMUP, help="итераций до базового замера")
+    parser.add_argument("--budget-mb", type=float, default=BUDGET_MB, help="допустимый рост RSS после прогрева")
+    parser.add_argument("--sample-every", type=int, default=SAMPLE_EVERY)
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    baseline, final, samples, leaked = run(args.iterations, min(args.warmup, args.iterations),
+                                           args.sample_every)
+    elapsed = time.monotonic() - started
+
+    for iteration, rss, open_cursors in samples:
+        print(f"{iteration:>8}  RSS {rss:8.1f} МБ  незакрытых курсоров {open_cursors}")
+    growth = final - baseline
+    print(f"Итераций: {args.iterations} за {elapsed:.1f} с; RSS после прогрева {baseline:.1f} МБ, "
+          f"в конце {final:.1f} МБ, рост {growth:+.1f} МБ (бюджет {args.budget_mb} МБ); "
+          f"незакрытых курсоров: {leaked}")
+
+    failed = False
+    if growth > args.budget_mb:
+        print("ОШИБКА: рост памяти превышает бюджет", file=sys.stderr)
+        failed = True
+    if leaked:
+        print("ОШИБКА: остались незакрытые курсоры", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
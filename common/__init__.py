@@ -0,0 +1 @@
+"""Общие компоненты интерфейса для окон оперативного персонала и менеджмента"""
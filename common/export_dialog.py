@@ -0,0 +1,37 @@
+from PyQt5.QtWidgets import QFileDialog, QMessageBox
+from connection import get_reporting_connection
+from common.workers import TaskWorker
+from services.export import export_table
+
+FILE_FILTERS = "CSV (*.csv);;Parquet (*.parquet)"
+
+
+def _run_export(table, path, aquarium_id):
+    """Выгрузка на отдельном соединении (по возможности с реплики), чтобы не занимать соединение окна"""
+    conn = get_reporting_connection()
+    try:
+        return export_table(conn, table, path, aquarium_id=aquarium_id)
+    finally:
+        conn.close()
+
+
+def export_table_with_dialog(parent, table, aquarium_id=None):
+    """Спрашивает путь к файлу и выгружает таблицу в фоновом потоке"""
+    default_name = table if aquarium_id is None else f"{table}_{aquarium_id}"
+    path, selected_filter = QFileDialog.getSaveFileName(
+        parent, "Экспорт данных", f"{default_name}.csv", FILE_FILTERS
+    )
+    if not path:
+        return
+
+    # Если расширение не указано, берем его из выбранного фильтра
+    if not path.lower().endswith((".csv", ".parquet")):
+        path += ".parquet" if selected_filter.startswith("Parquet") else ".csv"
+
+    worker = TaskWorker(_run_export, table, path, aquarium_id)
+    worker.succeeded.connect(lambda count: QMessageBox.information(
+        parent, "Экспорт", f"Выгружено строк: {count}\n{path}"))
+    worker.failed.connect(lambda error: QMessageBox.critical(
+        parent, "Ошибка", f"Не удалось выгрузить данные: {error}"))
+    parent.export_worker = worker  # Храним ссылку, пока поток работает
+    worker.start()
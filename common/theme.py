@@ -0,0 +1,67 @@
+import os
+
+from PyQt5.QtCore import QFile, QTextStream
+from PyQt5.QtGui import QIcon
+
+try:
+    # Скомпилированный пакет ресурсов: pyrcc5 resources.qrc -o resources_rc.py
+    import resources_rc  # noqa: F401
+    HAS_RESOURCES = True
+except ImportError:
+    HAS_RESOURCES = False
+
+# Корень проекта: файлы ищутся относительно него, а не текущего каталога
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Таблицы стилей: имя ресурса -> путь к исходному файлу
+STYLESHEETS = {
+    "app": "styles/styles.css",
+    "management": "management/styles.css",
+    "operational": "operational/styles.css",
+}
+
+_stylesheets = {}
+_icons = {}
+
+
+def _read_text(path):
+    file = QFile(path)
+    if not file.open(QFile.ReadOnly | QFile.Text):
+        print(f"Не удалось открыть файл стилей: {path}")
+        return ""
+    try:
+        return QTextStream(file).readAll()
+    finally:
+        file.close()
+
+
+def stylesheet(name):
+    """Возвращает таблицу стилей по имени. Файл читается только при первом обращении."""
+    if name not in _stylesheets:
+        if HAS_RESOURCES:
+            path = f":/styles/{name}.css"
+        else:
+            path = os.path.join(BASE_DIR, STYLESHEETS[name])
+        _stylesheets[name] = _read_text(path)
+    return _stylesheets[name]
+
+
+def icon(file_name):
+    """Возвращает иконку из кэша, создавая ее при первом обращении"""
+    if file_name not in _icons:
+        resource_path = f":/icons/{file_name}"
+        if HAS_RESOURCES and QFile.exists(resource_path):
+            _icons[file_name] = QIcon(resource_path)
+        else:
+            _icons[file_name] = QIcon(os.path.join(BASE_DIR, "icons", file_name))
+    return _icons[file_name]
+
+
+def apply_application_theme(app):
+    """Применяет общую таблицу стилей ко всему приложению один раз"""
+    app.setStyleSheet(stylesheet("app"))
+
+
+def apply_window_theme(window, name):
+    """Применяет стили конкретного окна (они действуют только внутри него)"""
+    window.setStyleSheet(stylesheet(name))
@@ -0,0 +1,29 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class TaskWorker(QThread):
+    """Выполняет функцию в отдельном потоке, чтобы не блокировать интерфейс.
+
+    При progress=True функция получает аргумент progress - функцию
+    обратного вызова progress(выполнено, всего), которая передает
+    ход выполнения в поток интерфейса через сигнал progress.
+    """
+    succeeded = pyqtSignal(object)  # Результат функции
+    failed = pyqtSignal(str)  # Текст ошибки
+    progress = pyqtSignal(int, int)  # Выполнено, всего
+
+    def __init__(self, func, *args, progress=False, **kwargs):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        if progress:
+            self.kwargs["progress"] = self.progress.emit
+
+    def run(self):
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
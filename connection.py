@@ -1,10 +1,200 @@
+import os
+import threading
+import time
+
 import psycopg2
 
+DB_NAME = "test3"
+DB_USER = "postgres"
+DB_PASSWORD = "1234"
+DB_HOST = "localhost"
+
+# Реплики для чтения через запятую, например "replica1,replica2:5433".
+# Если не заданы, все запросы идут на основной сервер.
+REPLICA_HOSTS = [h.strip() for h in os.environ.get("AQUAFARM_DB_REPLICAS", "").split(",") if h.strip()]
+# Допустимое отставание реплики, секунды. Реплики с большим отставанием не используются.
+MAX_REPLICA_LAG = float(os.environ.get("AQUAFARM_MAX_REPLICA_LAG", 5))
+# Как часто перепроверять отставание и доступность реплик, секунды
+REPLICA_CHECK_INTERVAL = 5
+# Предельный интервал между попытками подключиться к недоступной реплике, секунды
+REPLICA_MAX_BACKOFF = 300
+
+
 def get_db_connection():
+    """Соединение с основным сервером (для записи и чтения)"""
     conn = psycopg2.connect(
-        dbname="test3",
-        user="postgres",
-        password="1234",
-        host="localhost"
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST
     )
-    return conn
\ No newline at end of file
+    return conn
+
+
+def _connect_replica(address, autocommit=True):
+    host, _, port = address.partition(":")
+    conn = psycopg2.connect(
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=host,
+        port=port or None,
+        connect_timeout=3
+    )
+    # Запись на реплике невозможна; для коротких чтений транзакции не открываются
+    conn.set_session(readonly=True, autocommit=autocommit)
+    return conn
+
+
+def _parse_lsn(lsn):
+    """Переводит позицию журнала вида 16/B374D848 в число для сравнения"""
+    high, _, low = lsn.partition("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+class ReplicaState:
+    """Состояние одной реплики: соединение, отставание и воспроизведенная позиция журнала"""
+
+    def __init__(self, address):
+        self.address = address
+        self.conn = None
+        self.lag = None
+        self.replay_lsn = 0
+        self.checked_at = 0.0
+        self.failures = 0
+        self.healthy = False
+
+    def refresh(self):
+        """Перепроверяет реплику не чаще REPLICA_CHECK_INTERVAL секунд.
+
+        После неудачных попыток интервал удваивается до REPLICA_MAX_BACKOFF,
+        чтобы недоступная реплика не задерживала каждое чтение на время
+        таймаута подключения.
+        """
+        interval = min(REPLICA_CHECK_INTERVAL * 2 ** self.failures, REPLICA_MAX_BACKOFF)
+        if time.monotonic() - self.checked_at < interval:
+            return
+        self.checked_at = time.monotonic()
+        try:
+            if self.conn is None or self.conn.closed:
+                self.conn = _connect_replica(self.address)
+            self._update_replay_position()
+            self.healthy = self.lag is not None and self.lag <= MAX_REPLICA_LAG
+            self.failures = 0
+        except psycopg2.Error as e:
+            print(f"Реплика {self.address} недоступна: {e}")
+            self.healthy = False
+            self.failures = min(self.failures + 1, 16)
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+
+    def _update_replay_position(self):
+        with self.conn.cursor() as cursor:
+            # Если все полученное уже применено, реплика не отстает, даже если
+            # основной сервер давно ничего не записывал
+            cursor.execute("""
+                SELECT CASE
+                           WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                           ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+                       END,
+                       pg_last_wal_replay_lsn()::text
+            """)
+            lag, replay_lsn = cursor.fetchone()
+        self.lag = float(lag) if lag is not None else None
+        self.replay_lsn = _parse_lsn(replay_lsn) if replay_lsn else 0
+
+    def has_replayed(self, lsn):
+        """Проверяет, что реплика уже содержит запись с позицией lsn"""
+        if self.replay_lsn >= lsn:
+            return True
+        try:
+            self._update_replay_position()
+        except psycopg2.Error:
+            self.healthy = False
+            return False
+        return self.replay_lsn >= lsn
+
+
+class ReadRouter:
+    """Направляет чтение на реплики, а запись - на основной сервер.
+
+    После записи запоминается позиция журнала основного сервера. Пока
+    реплика ее не воспроизвела, чтение этого сеанса идет на основной
+    сервер, поэтому пользователь всегда видит свои изменения.
+    """
+
+    def __init__(self, addresses):
+        self.replicas = [ReplicaState(address) for address in addresses]
+        self.last_write_lsn = 0
+        self.next_index = 0
+        self.lock = threading.Lock()
+
+    def note_write(self, primary_conn):
+        """Запоминает позицию журнала после зафиксированной записи"""
+        if not self.replicas:
+            return
+        try:
+            with primary_conn.cursor() as cursor:
+                cursor.execute("SELECT pg_current_wal_lsn()::text")
+                lsn = _parse_lsn(cursor.fetchone()[0])
+            primary_conn.commit()
+        except psycopg2.Error as e:
+            # Запись уже зафиксирована; без позиции журнала чтение может кратко отставать
+            print(f"Не удалось получить позицию журнала: {e}")
+            primary_conn.rollback()
+            return
+        with self.lock:
+            self.last_write_lsn = max(self.last_write_lsn, lsn)
+
+    def _pick_replica(self):
+        """Выбирает по кругу исправную реплику, видящую последние записи сеанса"""
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self.next_index]
+            self.next_index = (self.next_index + 1) % len(self.replicas)
+            replica.refresh()
+            if replica.healthy and replica.has_replayed(self.last_write_lsn):
+                return replica
+        return None
+
+    def read_connection(self, primary_conn):
+        """Возвращает соединение для чтения: реплику или основной сервер"""
+        if not self.replicas:
+            return primary_conn
+        with self.lock:
+            replica = self._pick_replica()
+            return replica.conn if replica else primary_conn
+
+    def reporting_address(self):
+        """Адрес исправной реплики для фоновых выгрузок или None"""
+        if not self.replicas:
+            return None
+        with self.lock:
+            replica = self._pick_replica()
+            return replica.address if replica else None
+
+
+_router = ReadRouter(REPLICA_HOSTS)
+
+
+def get_read_connection(primary_conn):
+    """Соединение для запросов только на чтение (история, графики, списки)"""
+    return _router.read_connection(primary_conn)
+
+
+def note_write(primary_conn):
+    """Вызывается после commit() на основном сервере для чтения своих записей"""
+    _router.note_write(primary_conn)
+
+
+def get_reporting_connection():
+    """Новое соединение для долгих выгрузок и отчетов: с реплики, если она исправна.
+
+    В отличие от get_read_connection соединение принадлежит вызывающему
+    и должно быть закрыто им.
+    """
+    address = _router.reporting_address()
+    if address is None:
+        return get_db_connection()
+    # Серверным (именованным) курсорам нужна транзакция
+    return _connect_replica(address, autocommit=False)
@@ -1,5 +1,8 @@
+import argparse
+import sys
+
 import psycopg2
-from psycopg2 import sql
+from psycopg2 import errors, sql
 
 # Параметры подключения к базе данных
 DB_NAME = "aquarium_db"
@@ -8,9 +11,10 @@ DB_PASSWORD = "1234"  # Замените на ваш пароль
 DB_HOST = "localhost"
 DB_PORT = "5432"
 
-def create_database():
-    """Создает базу данных и все таблицы"""
+def create_database(dbname=DB_NAME):
+    """Создает базу данных и все таблицы. Возвращает True при успехе."""
     
+    conn = None
     try:
         # Подключаемся к серверу PostgreSQL (без указания конкретной базы)
         conn = psycopg2.connect(
@@ -23,17 +27,20 @@ def create_database():
         cursor = conn.cursor()
         
         # Создаем базу данных, если она не существует
-        cursor.execute(sql.SQL("CREATE DATABASE {}").format(
-            sql.Identifier(DB_NAME))
-        )
-        print(f"База данных {DB_NAME} успешно создана")
+        try:
+            cursor.execute(sql.SQL("CREATE DATABASE {}").format(
+                sql.Identifier(dbname))
+            )
+            print(f"База данных {dbname} успешно создана")
+        except errors.DuplicateDatabase:
+            print(f"База данных {dbname} уже существует")
         
         cursor.close()
         conn.close()
         
         # Теперь подключаемся к созданной базе данных
         conn = psycopg2.connect(
-            dbname=DB_NAME,
+            dbname=dbname,
             user=DB_USER,
             password=DB_PASSWORD,
             host=DB_HOST,
@@ -46,9 +53,11 @@ def create_database():
         create_tables(cursor)
         
         print("Все таблицы успешно созданы")
+        return True
         
     except Exception as e:
         print(f"Ошибка при создании базы данных: {e}")
+        return False
     finally:
         if conn:
             cursor.close()
@@ -64,11 +73,16 @@ def create_tables(cursor):
         имя_пользователя VARCHAR(50),
         роль_пользователя VARCHAR(20),
         логин VARCHAR(50),
-        пароль_пользователя VARCHAR(100),
+        пароль_пользователя VARCHAR(255),
         is_оперативный BOOLEAN DEFAULT FALSE,
         is_менеджмент BOOLEAN DEFAULT FALSE
     )
     """)
+
+    # Уникальный индекс для поиска пользователя по логину при входе
+    cursor.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS пользователи_логин_idx ON пользователи (логин)
+    """)
     
     # Таблица аквариумов
     cursor.execute("""
@@ -181,9 +195,381 @@ def create_tables(cursor):
         срок_хранения INT,
         количество INT,
         состояние_холодильника VARCHAR(50) DEFAULT 'Рабочее',
-        дата_последней_проверки DATE
+        дата_последней_проверки DATE,
+        вместимость INT
+    )
+    """)
+    # Вместимость добавлена для распределения партий (services/fridges.py)
+    cursor.execute("ALTER TABLE холодильники ADD COLUMN IF NOT EXISTS вместимость INT")
+
+    # Архивные копии истории, переносимой при выводе аквариумов и видов из эксплуатации
+    for table in ("параметры_воды", "кормления", "состояние_аквариума", "состояние_особей"):
+        cursor.execute(sql.SQL("""
+        CREATE TABLE IF NOT EXISTS {} (
+            дата_архивации TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            LIKE {}
+        )
+        """).format(sql.Identifier(f"архив_{table}"), sql.Identifier(table)))
+        cursor.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} (aquarium_id)").format(
+            sql.Identifier(f"архив_{table}_aquarium_idx"), sql.Identifier(f"архив_{table}")))
+
+    # Найденные аномалии параметров воды и сохраненное состояние детектора
+    # (экспоненциальные среднее и дисперсия по каждому аквариуму)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS аномалии_параметров_воды (
+        parameter_id INT,
+        aquarium_id INT,
+        параметр VARCHAR(30),
+        значение DECIMAL(6,2),
+        ожидаемое DECIMAL(6,2),
+        отклонение_сигм DECIMAL(6,2),
+        PRIMARY KEY (parameter_id, параметр)
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS состояние_детектора_аномалий (
+        aquarium_id INT PRIMARY KEY,
+        последний_parameter_id INT NOT NULL DEFAULT 0,
+        статистика JSONB NOT NULL DEFAULT '{}'
+    )
+    """)
+
+    # Суточные сводки, пополняемые по отметке последней учтенной строки (services/rollups.py).
+    # Суммы хранятся вместе с количеством, чтобы средние за любой период складывались из суток.
+    # Строки без аквариума или вида учитываются с ключом 0.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS отметки_сводок (
+        таблица VARCHAR(50) PRIMARY KEY,
+        последний_id BIGINT NOT NULL DEFAULT 0
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS сводка_параметров_воды (
+        aquarium_id INT,
+        день DATE,
+        количество INT NOT NULL,
+        сумма_температуры DECIMAL(14,2) NOT NULL,
+        мин_температура DECIMAL(5,2),
+        макс_температура DECIMAL(5,2),
+        сумма_ph DECIMAL(14,2) NOT NULL,
+        мин_ph DECIMAL(3,2),
+        макс_ph DECIMAL(3,2),
+        сумма_кислорода DECIMAL(14,2) NOT NULL,
+        мин_кислород DECIMAL(4,2),
+        макс_кислород DECIMAL(4,2),
+        PRIMARY KEY (aquarium_id, день)
+    )
+    """)
+    # Число показаний с заданным значением каждого параметра: суммы не учитывают
+    # NULL, поэтому средние делятся на них, а не на общее количество. В уже
+    # накопленных сутках таких отдельных счетчиков нет - берется количество
+    for column in ("количество_температуры", "количество_ph", "количество_кислорода"):
+        cursor.execute(sql.SQL("ALTER TABLE сводка_параметров_воды ADD COLUMN IF NOT EXISTS {} INT").format(
+            sql.Identifier(column)))
+        cursor.execute(sql.SQL("UPDATE сводка_параметров_воды SET {0} = количество WHERE {0} IS NULL").format(
+            sql.Identifier(column)))
+        cursor.execute(sql.SQL("ALTER TABLE сводка_параметров_воды ALTER COLUMN {} SET NOT NULL").format(
+            sql.Identifier(column)))
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS сводка_кормлений (
+        aquarium_id INT,
+        seafood_id INT,
+        день DATE,
+        количество_кормлений INT NOT NULL,
+        объем_корма DECIMAL(14,2) NOT NULL,
+        PRIMARY KEY (aquarium_id, seafood_id, день)
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS сводка_состояния_особей (
+        aquarium_id INT,
+        seafood_id INT,
+        день DATE,
+        количество_замеров INT NOT NULL,
+        умерших BIGINT NOT NULL,
+        с_повреждениями BIGINT NOT NULL,
+        с_аномальным_поведением BIGINT NOT NULL,
+        сумма_количества BIGINT NOT NULL,
+        сумма_веса DECIMAL(14,2) NOT NULL,
+        сумма_размера DECIMAL(14,2) NOT NULL,
+        PRIMARY KEY (aquarium_id, seafood_id, день)
+    )
+    """)
+
+    # Кэш коэффициента конверсии корма (services/fcr.py): результат расчета за период
+    # и отметки данных, по которым он получен
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS периоды_fcr (
+        начало_периода DATE,
+        конец_периода DATE,
+        отметка_кормлений BIGINT NOT NULL,
+        отметка_замеров BIGINT NOT NULL,
+        рассчитано TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (начало_периода, конец_периода)
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS кэш_fcr (
+        начало_периода DATE,
+        конец_периода DATE,
+        aquarium_id INT,
+        seafood_id INT,
+        корм DECIMAL(14,2) NOT NULL,
+        биомасса_начало DECIMAL(14,2),
+        биомасса_конец DECIMAL(14,2),
+        PRIMARY KEY (начало_периода, конец_периода, aquarium_id, seafood_id),
+        FOREIGN KEY (начало_периода, конец_периода)
+            REFERENCES периоды_fcr (начало_периода, конец_периода) ON DELETE CASCADE
+    )
+    """)
+    # Число замеров периода: вместе с отметкой замеров выявляет удаление и правку строк.
+    # У периодов, рассчитанных до его появления, значения нет - они пересчитываются
+    cursor.execute("ALTER TABLE периоды_fcr ADD COLUMN IF NOT EXISTS замеров BIGINT")
+
+    # Каталог холодного архива: файлы Parquet со старой историей (services/cold_storage.py)
+    # и диапазоны дат каждого аквариума в них
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS холодный_архив (
+        таблица VARCHAR(50),
+        файл VARCHAR(255),
+        aquarium_id INT,
+        мин_дата TIMESTAMP NOT NULL,
+        макс_дата TIMESTAMP NOT NULL,
+        строк INT NOT NULL,
+        PRIMARY KEY (таблица, файл, aquarium_id)
+    )
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS холодный_архив_aquarium_idx ON холодный_архив (таблица, aquarium_id, мин_дата)
+    """)
+
+    # Задачи обслуживания по результатам проверок состояния аквариумов (services/maintenance.py).
+    # Открытая задача (выполнено IS NULL) каждого вида работ у аквариума одна
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS задачи_обслуживания (
+        task_id SERIAL PRIMARY KEY,
+        aquarium_id INT REFERENCES аквариумы(aquarium_id),
+        вид_работ VARCHAR(20) NOT NULL,
+        описание VARCHAR(100) NOT NULL,
+        приоритет INT NOT NULL,
+        срок TIMESTAMP NOT NULL,
+        aquarium_state_id INT,
+        создано TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        выполнено TIMESTAMP,
+        выполнил INT REFERENCES пользователи(user_id)
+    )
+    """)
+    cursor.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS задачи_обслуживания_открытые_idx
+        ON задачи_обслуживания (aquarium_id, вид_работ) WHERE выполнено IS NULL
+    """)
+
+    # Оценка готовности к сбору по последнему замеру каждого вида в аквариуме (services/harvest.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS оценка_готовности (
+        aquarium_id INT REFERENCES аквариумы(aquarium_id),
+        seafood_id INT REFERENCES морепродукты(seafood_id),
+        health_id INT NOT NULL,
+        дата_замера TIMESTAMP,
+        живых_особей INT NOT NULL,
+        средний_вес DECIMAL(6,2),
+        средний_размер DECIMAL(5,2),
+        требуемый_вес DECIMAL(6,2),
+        требуемый_размер DECIMAL(5,2),
+        готовность DECIMAL(12,3),
+        ожидаемый_выход DECIMAL(14,2),
+        рассчитано TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (aquarium_id, seafood_id)
     )
     """)
 
+    # Журнал изменений (services/audit.py): только добавление, секции по месяцам.
+    # Секции создает фоновый писатель журнала; секция по умолчанию принимает
+    # записи, если секцию месяца создать не удалось
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS журнал_изменений (
+        audit_id BIGSERIAL,
+        время TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        user_id INT,
+        пользователь VARCHAR(50),
+        сущность VARCHAR(50) NOT NULL,
+        запись_id INT,
+        действие VARCHAR(10) NOT NULL,
+        до JSONB,
+        после JSONB,
+        PRIMARY KEY (audit_id, время)
+    ) PARTITION BY RANGE (время)
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS журнал_изменений_прочее PARTITION OF журнал_изменений DEFAULT
+    """)
+    cursor.execute("""
+    CREATE OR REPLACE FUNCTION запретить_изменение_журнала() RETURNS trigger AS $$
+    BEGIN
+        RAISE EXCEPTION 'Журнал изменений доступен только для добавления записей';
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    # Строчный триггер копируется во все секции, поэтому запрещает изменение
+    # и через обращение к секции напрямую. TRUNCATE строчные триггеры не
+    # вызывает: для него отдельный триггер на каждой таблице (секциям месяцев
+    # его ставит services/audit.py при создании)
+    cursor.execute("DROP TRIGGER IF EXISTS журнал_изменений_только_добавление ON журнал_изменений")
+    cursor.execute("""
+    CREATE TRIGGER журнал_изменений_только_добавление
+        BEFORE UPDATE OR DELETE ON журнал_изменений
+        FOR EACH ROW EXECUTE FUNCTION запретить_изменение_журнала()
+    """)
+    for table in ("журнал_изменений", "журнал_изменений_прочее"):
+        cursor.execute(sql.SQL("DROP TRIGGER IF EXISTS журнал_изменений_без_очистки ON {}").format(
+            sql.Identifier(table)))
+        cursor.execute(sql.SQL("""
+        CREATE TRIGGER журнал_изменений_без_очистки
+            BEFORE TRUNCATE ON {}
+            FOR EACH STATEMENT EXECUTE FUNCTION запретить_изменение_журнала()
+        """).format(sql.Identifier(table)))
+        cursor.execute(sql.SQL("REVOKE UPDATE, DELETE, TRUNCATE ON {} FROM PUBLIC").format(
+            sql.Identifier(table)))
+
+    # Уведомление о новых показаниях для графиков в реальном времени (services/live_readings.py).
+    # Одно уведомление на команду INSERT/COPY со списком затронутых аквариумов;
+    # пустой список (слишком много аквариумов для уведомления) означает "любые"
+    cursor.execute("""
+    CREATE OR REPLACE FUNCTION уведомить_о_показаниях() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('water_parameters', CASE
+            WHEN count(DISTINCT aquarium_id) <= 1000 THEN string_agg(DISTINCT aquarium_id::text, ',')
+            ELSE '' END)
+        FROM новые_показания
+        HAVING count(*) > 0;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    cursor.execute("DROP TRIGGER IF EXISTS параметры_воды_уведомление ON параметры_воды")
+    cursor.execute("""
+    CREATE TRIGGER параметры_воды_уведомление
+        AFTER INSERT ON параметры_воды
+        REFERENCING NEW TABLE AS новые_показания
+        FOR EACH STATEMENT EXECUTE FUNCTION уведомить_о_показаниях()
+    """)
+
+    create_indexes(cursor)
+
+def create_indexes(cursor):
+    """Создает индексы для выборки истории и поиска на вкладках управления"""
+    history_tables = {
+        "состояние_аквариума": "дата_проверки",
+        "состояние_особей": "дата_замера",
+        "параметры_воды": "дата_измерения",
+        "кормления": "дата_кормления",
+    }
+    for table, date_column in history_tables.items():
+        cursor.execute(sql.SQL("""
+        CREATE INDEX IF NOT EXISTS {} ON {} (aquarium_id, {})
+        """).format(
+            sql.Identifier(f"{table}_aquarium_дата_idx"),
+            sql.Identifier(table),
+            sql.Identifier(date_column))
+        )
+
+    # Индексы для поиска и фильтрации на вкладках управления.
+    # Триграммные индексы ускоряют поиск по подстроке (ILIKE '%...%')
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS морепродукты_название_trgm_idx
+        ON морепродукты USING gin (название_вида gin_trgm_ops)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS пользователи_имя_trgm_idx
+        ON пользователи USING gin (имя_пользователя gin_trgm_ops)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS пользователи_логин_trgm_idx
+        ON пользователи USING gin (логин gin_trgm_ops)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS морепродукты_aquarium_idx ON морепродукты (aquarium_id)")
+    # Перенос истории вида в архив (services/decommission.py) выбирает строки по seafood_id
+    cursor.execute("CREATE INDEX IF NOT EXISTS состояние_особей_seafood_idx ON состояние_особей (seafood_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS кормления_seafood_idx ON кормления (seafood_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS аквариумы_статус_idx ON аквариумы (статус)")
+    # Индексы для сортировки списка аквариумов на стороне сервера
+    cursor.execute("CREATE INDEX IF NOT EXISTS аквариумы_объем_idx ON аквариумы (объем, aquarium_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS аквариумы_тип_idx ON аквариумы (тип_аквариума, aquarium_id)")
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS аквариумы_ответственный_idx ON аквариумы (ответственный_пользователь)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS морепродукты_тип_корма_idx ON морепродукты (тип_корма)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS пользователи_роль_idx ON пользователи (роль_пользователя)")
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS холодильники_состояние_idx ON холодильники (состояние_холодильника)
+    """)
+    # Детектор аномалий читает новые показания по номеру, а не по дате
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS параметры_воды_aquarium_parameter_idx ON параметры_воды (aquarium_id, parameter_id)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS аномалии_aquarium_idx ON аномалии_параметров_воды (aquarium_id, parameter_id)
+    """)
+    # Выборки сводок за период по всей ферме
+    cursor.execute("CREATE INDEX IF NOT EXISTS сводка_кормлений_день_idx ON сводка_кормлений (день)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS сводка_состояния_особей_день_idx ON сводка_состояния_особей (день)")
+    # Замеры за период для расчета FCR по всем аквариумам сразу
+    cursor.execute("CREATE INDEX IF NOT EXISTS состояние_особей_дата_idx ON состояние_особей (дата_замера)")
+    # Просмотр журнала изменений по записи и по всей сущности
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS журнал_изменений_запись_idx
+        ON журнал_изменений (сущность, запись_id, время DESC)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS журнал_изменений_сущность_idx ON журнал_изменений (сущность, время DESC)
+    """)
+    # Очередь открытых задач обслуживания по сроку
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS задачи_обслуживания_срок_idx
+        ON задачи_обслуживания (срок, приоритет DESC) WHERE выполнено IS NULL
+    """)
+
+def migrate(conn):
+    """Приводит схему существующей базы к текущей версии одной транзакцией.
+
+    Все объекты схемы создаются идемпотентно (IF NOT EXISTS, OR REPLACE),
+    поэтому повторный запуск ничего не меняет.
+    """
+    try:
+        with conn.cursor() as cursor:
+            create_tables(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def main(argv=None):
+    import connection
+
+    parser = argparse.ArgumentParser(description="Создание базы данных и всех таблиц")
+    # По умолчанию создается та база, к которой подключается приложение
+    parser.add_argument("--dbname", default=connection.DB_NAME,
+                        help=f"имя базы (по умолчанию {connection.DB_NAME})")
+    args = parser.parse_args(argv)
+    return 0 if create_database(args.dbname) else 1
+
+
+def migrate_main(argv=None):
+    from connection import get_db_connection
+
+    parser = argparse.ArgumentParser(description="Обновление схемы рабочей базы данных")
+    parser.parse_args(argv)
+
+    conn = get_db_connection()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+    print("Схема базы данных обновлена")
+    return 0
+
+
 if __name__ == "__main__":
-    create_database()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -1,47 +1,17 @@
 import sys
-import os
 from PyQt5.QtWidgets import (QApplication, QWidget, QLabel, QLineEdit, 
                             QPushButton, QVBoxLayout, QMessageBox, QDesktopWidget, QFileDialog)
-from PyQt5.QtCore import Qt, QFile, QTextStream
+from PyQt5.QtCore import Qt
 from connection import get_db_connection
-
-def load_stylesheet():
-    """Загружает CSS стили из файла"""
-    try:
-        # Определяем путь к файлу стилей относительно расположения скрипта
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        style_path = os.path.join(base_dir, "styles", "style.css")
-        
-        file = QFile(style_path)
-        if not file.open(QFile.ReadOnly | QFile.Text):
-            print(f"Не удалось открыть файл стилей: {style_path}")
-            return ""
-            
-        stream = QTextStream(file)
-        return stream.readAll()
-    except Exception as e:
-        print(f"Ошибка загрузки стилей: {str(e)}")
-        return ""
-
+from services.auth import authenticate
+from common.workers import TaskWorker
+from common.theme import apply_application_theme
 
 class LoginWindow(QWidget):
     def __init__(self):
         super().__init__()
         self.initUI()
 
-                # Применяем стили после инициализации UI
-        self.apply_styles()
-
-    def apply_styles(self):
-        """Применяет CSS стили к окну"""
-        stylesheet = load_stylesheet()
-        if stylesheet:
-            self.setStyleSheet(stylesheet)
-            # Применяем стили также к дочерним виджетам
-            for child in self.findChildren(QWidget):
-                child.setStyleSheet(stylesheet)
-
-
     def initUI(self):
         self.setWindowTitle('Авторизация')
         self.resize(500, 250)  # Увеличиваем размер окна
@@ -104,23 +74,45 @@ class LoginWindow(QWidget):
         login = self.login_input.text()
         password = self.password_input.text()
 
-        conn = get_db_connection()
-        cur = conn.cursor()
-        self.db_connection = get_db_connection()  # Сохраняем соединение в атрибуте класса
-        cur = self.db_connection.cursor()
+        # Проверка хеша пароля занимает заметное время, поэтому выполняется в отдельном потоке
+        self.login_button.setEnabled(False)
+        self.auth_worker = TaskWorker(self.authenticate_user, login, password)
+        self.auth_worker.succeeded.connect(self.on_login_finished)
+        self.auth_worker.failed.connect(self.on_login_failed)
+        self.auth_worker.start()
 
-        cur.execute("SELECT * FROM пользователи WHERE логин = %s AND пароль_пользователя = %s", (login, password))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
+    @staticmethod
+    def authenticate_user(login, password):
+        """Открывает соединение и проверяет учетные данные (выполняется вне потока интерфейса)"""
+        conn = get_db_connection()
+        try:
+            session = authenticate(conn, login, password)
+        except Exception:
+            conn.close()
+            raise
+        if session is None:
+            conn.close()
+            return None
+        return session, conn
+
+    def on_login_finished(self, result):
+        self.login_button.setEnabled(True)
+        if result is None:
+            QMessageBox.warning(self, 'Ошибка', 'Неверный логин или пароль')
+            return
 
-        if user:
-            if user[5]:  # is_operational
-                self.open_operational_window()
-            elif user[6]:  # is_management
-                self.open_management_window()
+        session, self.db_connection = result  # Сохраняем соединение в атрибуте класса
+        if session.is_operational:
+            self.open_operational_window()
+        elif session.is_management:
+            self.open_management_window()
         else:
-            QMessageBox.warning(self, 'Ошибка', 'Неверный логин или пароль')
+            self.db_connection.close()
+            QMessageBox.warning(self, 'Ошибка', 'У пользователя нет доступа к системе')
+
+    def on_login_failed(self, error):
+        self.login_button.setEnabled(True)
+        QMessageBox.critical(self, 'Ошибка', f'Не удалось выполнить вход: {error}')
 
     def open_operational_window(self):
         from operational.mainOperational import OperationalWindow
@@ -137,8 +129,8 @@ class LoginWindow(QWidget):
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     
-    # Загружаем и применяем глобальные стили
-    app.setStyleSheet(load_stylesheet())
+    # Общие стили применяются один раз ко всему приложению
+    apply_application_theme(app)
     
     login_window = LoginWindow()
     login_window.show()
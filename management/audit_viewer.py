@@ -0,0 +1,102 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QLineEdit, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+)
+from PyQt5.QtGui import QIntValidator
+import psycopg2
+from connection import get_read_connection
+from services.audit import history
+
+ENTITIES = {
+    "аквариумы": "Аквариумы",
+    "морепродукты": "Морепродукты",
+    "пользователи": "Пользователи",
+    "холодильники": "Холодильники",
+    "параметры_воды": "Параметры воды",
+    "кормления": "Кормления",
+    "состояние_аквариума": "Состояние аквариумов",
+    "состояние_особей": "Состояние особей",
+}
+ACTIONS = {"INSERT": "Добавление", "UPDATE": "Изменение", "DELETE": "Удаление"}
+
+
+def format_changes(action, before, after):
+    """Текст изменений записи: поле: было -> стало"""
+    before = before or {}
+    after = after or {}
+    if action == "INSERT":
+        return "; ".join(f"{key}: {value}" for key, value in after.items())
+    if action == "DELETE":
+        return "; ".join(f"{key}: {value}" for key, value in before.items())
+    keys = list(after) + [key for key in before if key not in after]
+    return "; ".join(f"{key}: {before.get(key, '')} → {after.get(key, '')}" for key in keys)
+
+
+class AuditViewer(QDialog):
+    """Журнал изменений записей одной сущности или одной записи"""
+
+    def __init__(self, db_connection, entity=None, record_id=None, parent=None):
+        super().__init__(parent)
+        self.db_connection = db_connection
+        self.setWindowTitle("Журнал изменений")
+        self.resize(1000, 600)
+        self.initUI()
+        if entity in ENTITIES:
+            self.entity_combo.setCurrentIndex(self.entity_combo.findData(entity))
+        if record_id:
+            self.record_edit.setText(str(record_id))
+        self.load()
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.entity_combo = QComboBox(self)
+        for entity, title in ENTITIES.items():
+            self.entity_combo.addItem(title, entity)
+        self.record_edit = QLineEdit(self)
+        self.record_edit.setPlaceholderText("все записи")
+        self.record_edit.setValidator(QIntValidator(1, 2 ** 31 - 1, self))
+        self.record_edit.returnPressed.connect(self.load)
+        show_button = QPushButton("Показать", self)
+        show_button.clicked.connect(self.load)
+        controls.addWidget(QLabel("Таблица:", self))
+        controls.addWidget(self.entity_combo)
+        controls.addWidget(QLabel("ID записи:", self))
+        controls.addWidget(self.record_edit)
+        controls.addWidget(show_button)
+        controls.addStretch()
+
+        self.table = QTableWidget(self)
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels(["Время", "Пользователь", "ID записи", "Действие", "Изменения"])
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+
+        layout.addLayout(controls)
+        layout.addWidget(self.table)
+
+    def load(self):
+        entity = self.entity_combo.currentData()
+        record_id = int(self.record_edit.text()) if self.record_edit.text() else None
+        try:
+            rows = history(get_read_connection(self.db_connection), entity, record_id)
+        except psycopg2.Error as e:
+            QMessageBox.critical(self, "Ошибка базы данных", f"Не удалось загрузить журнал: {e}")
+            return
+
+        self.table.setRowCount(len(rows))
+        for i, (moment, user, row_id, action, before, after) in enumerate(rows):
+            values = [
+                moment.strftime("%Y-%m-%d %H:%M:%S"),
+                user or "—",
+                str(row_id) if row_id is not None else "",
+                ACTIONS.get(action, action),
+                format_changes(action, before, after),
+            ]
+            for j, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if j == 4:
+                    item.setToolTip(value.replace("; ", "\n"))
+                self.table.setItem(i, j, item)
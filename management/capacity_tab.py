@@ -0,0 +1,129 @@
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QSpinBox, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+)
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+from connection import get_reporting_connection
+from common.workers import TaskWorker
+from services.capacity import load_plan
+
+OVERSTOCK_COLOR = QColor(255, 200, 200)
+CANDIDATE_COLOR = QColor(200, 240, 200)
+
+
+def _load_plan():
+    conn = get_reporting_connection()
+    try:
+        return load_plan(conn)
+    finally:
+        conn.close()
+
+
+class CapacityTab(QWidget):
+    """Вкладка плотности посадки: заполненность аквариумов и подбор аквариума под партию"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.plan = None
+        self.worker = None
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.refresh_button = QPushButton("Рассчитать", self)
+        self.refresh_button.clicked.connect(self.refresh)
+        self.species_combo = QComboBox(self)
+        self.count_spin = QSpinBox(self)
+        self.count_spin.setRange(1, 1000000)
+        self.count_spin.setValue(100)
+        self.place_button = QPushButton("Подобрать аквариумы", self)
+        self.place_button.clicked.connect(self.place)
+        self.place_button.setEnabled(False)
+
+        controls.addWidget(self.refresh_button)
+        controls.addStretch()
+        controls.addWidget(QLabel("Вид:", self))
+        controls.addWidget(self.species_combo)
+        controls.addWidget(QLabel("Особей:", self))
+        controls.addWidget(self.count_spin)
+        controls.addWidget(self.place_button)
+
+        self.table = QTableWidget(self)
+        self.table.setColumnCount(7)
+        self.table.setHorizontalHeaderLabels([
+            "Аквариум", "Тип", "Статус", "Объем", "Требуется по нормам", "Свободно", "Плотность"
+        ])
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        self.status_label = QLabel(self)
+        layout.addLayout(controls)
+        layout.addWidget(self.table)
+        layout.addWidget(self.status_label)
+
+    def refresh(self):
+        self.refresh_button.setEnabled(False)
+        self.worker = TaskWorker(_load_plan)
+        self.worker.succeeded.connect(self.show_plan)
+        self.worker.failed.connect(lambda error: QMessageBox.critical(
+            self, "Ошибка", f"Не удалось рассчитать заполненность: {error}"))
+        self.worker.finished.connect(lambda: self.refresh_button.setEnabled(True))
+        self.worker.start()
+
+    def show_plan(self, plan, candidates=()):
+        self.plan = plan
+        selected = {tank.aquarium_id for tank in candidates}
+        self.table.setRowCount(len(plan.tanks))
+        for i, tank in enumerate(plan.tanks):
+            density = f"{tank.density:.0%}" if tank.density is not None else "—"
+            if tank.without_norm:
+                density += f" (без нормы: {tank.without_norm} особей)"
+            values = [str(tank.aquarium_id), tank.aquarium_type or "", tank.status or "",
+                      f"{tank.volume:.2f}", f"{tank.required:.2f}", f"{tank.free:.2f}", density]
+            if tank.overstocked:
+                color = OVERSTOCK_COLOR
+            elif tank.aquarium_id in selected:
+                color = CANDIDATE_COLOR
+            else:
+                color = None
+            for j, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if 3 <= j <= 5:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                if color is not None:
+                    item.setBackground(color)
+                self.table.setItem(i, j, item)
+
+        if not candidates:
+            current = self.species_combo.currentData()
+            self.species_combo.clear()
+            for seafood_id, (name, norm) in plan.norms.items():
+                suffix = "" if norm is not None else " - норма не задана"
+                self.species_combo.addItem(f"{name or 'Без названия'} (ID {seafood_id}){suffix}", seafood_id)
+            if current is not None:
+                self.species_combo.setCurrentIndex(max(self.species_combo.findData(current), 0))
+            self.place_button.setEnabled(bool(plan.norms))
+            self.status_label.setText(f"Аквариумов: {len(plan.tanks)}, перенаселено: {len(plan.overstocked)}")
+
+    def place(self):
+        if self.plan is None:
+            return
+        seafood_id = self.species_combo.currentData()
+        count = self.count_spin.value()
+        required, tanks = self.plan.place(seafood_id, count)
+        if required is None:
+            QMessageBox.warning(self, "Ошибка", "Для вида не задан требуемый объем воды на особь.")
+            return
+
+        self.show_plan(self.plan, tanks)
+        if tanks:
+            listed = ", ".join(str(tank.aquarium_id) for tank in tanks[:10])
+            more = f" и еще {len(tanks) - 10}" if len(tanks) > 10 else ""
+            self.status_label.setText(f"Нужно {required:.2f} объема. Подходят аквариумы: {listed}{more} "
+                                      "(сначала - где вид уже содержится, затем - с наименьшим запасом)")
+        else:
+            self.status_label.setText(f"Нужно {required:.2f} объема. Подходящих аквариумов нет.")
@@ -0,0 +1,72 @@
+from PyQt5.QtWidgets import QStyledItemDelegate, QUndoCommand, QUndoStack
+from PyQt5.QtCore import Qt
+
+UNDO_LIMIT = 200  # Сколько правок ячеек помнит история одной таблицы
+CELL_EDIT_ID = 1  # Идентификатор команды для объединения правок одной ячейки
+
+
+class CellEditCommand(QUndoCommand):
+    """Правка одной ячейки: хранит только адрес ячейки и два значения"""
+
+    def __init__(self, table, row, column, old, new):
+        header = table.horizontalHeaderItem(column)
+        super().__init__(f"{header.text() if header else column}: {old} → {new}")
+        self.table = table
+        self.row = row
+        self.column = column
+        self.old = old
+        self.new = new
+
+    def id(self):
+        return CELL_EDIT_ID
+
+    def mergeWith(self, other):
+        # Повторные правки той же ячейки подряд хранятся одной командой
+        if (other.table is not self.table or other.row != self.row
+                or other.column != self.column):
+            return False
+        self.new = other.new
+        self.setText(other.text())
+        self.setObsolete(self.old == self.new)
+        return True
+
+    def set_value(self, value):
+        item = self.table.item(self.row, self.column)
+        if item is not None:
+            item.setText(value)
+            self.table.setCurrentCell(self.row, self.column)
+
+    def undo(self):
+        self.set_value(self.old)
+
+    def redo(self):
+        self.set_value(self.new)
+
+
+class UndoDelegate(QStyledItemDelegate):
+    """Делегат таблицы, записывающий правки пользователя в историю.
+
+    Правки из кода (загрузка, сохранение, отмена) идут мимо делегата и в
+    историю не попадают.
+    """
+
+    def __init__(self, table, stack):
+        super().__init__(table)
+        self.table = table
+        self.stack = stack
+
+    def setModelData(self, editor, model, index):
+        old = index.data(Qt.DisplayRole) or ""
+        super().setModelData(editor, model, index)
+        new = index.data(Qt.DisplayRole) or ""
+        if new != old:
+            self.stack.push(CellEditCommand(self.table, index.row(), index.column(), old, new))
+
+
+def attach_undo_stack(table, group):
+    """Создает историю правок таблицы в группе и подключает ее к таблице"""
+    stack = QUndoStack(table)
+    stack.setUndoLimit(UNDO_LIMIT)
+    group.addStack(stack)
+    table.setItemDelegate(UndoDelegate(table, stack))
+    return stack
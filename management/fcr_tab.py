@@ -0,0 +1,98 @@
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QDateEdit, QComboBox, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+)
+from PyQt5.QtCore import Qt, QDate
+from connection import get_db_connection
+from common.workers import TaskWorker
+from services.fcr import fcr_by_aquarium, fcr_by_species
+
+RANKINGS = {
+    "По аквариумам": (fcr_by_aquarium, "Аквариум", "Тип"),
+    "По видам": (fcr_by_species, "ID вида", "Вид"),
+}
+
+
+def _load_ranking(ranking, start, end):
+    # Расчет пополняет кэш, поэтому выполняется на основном сервере
+    conn = get_db_connection()
+    try:
+        return ranking(conn, start, end)
+    finally:
+        conn.close()
+
+
+class FeedEfficiencyTab(QWidget):
+    """Вкладка рейтинга аквариумов и видов по коэффициенту конверсии корма"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.worker = None
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.start_edit = QDateEdit(QDate.currentDate().addDays(-30), self)
+        self.end_edit = QDateEdit(QDate.currentDate(), self)
+        for edit in (self.start_edit, self.end_edit):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("yyyy-MM-dd")
+        self.mode_combo = QComboBox(self)
+        self.mode_combo.addItems(RANKINGS)
+        self.calculate_button = QPushButton("Рассчитать", self)
+        self.calculate_button.clicked.connect(self.calculate)
+
+        controls.addWidget(QLabel("С:", self))
+        controls.addWidget(self.start_edit)
+        controls.addWidget(QLabel("по:", self))
+        controls.addWidget(self.end_edit)
+        controls.addWidget(self.mode_combo)
+        controls.addWidget(self.calculate_button)
+        controls.addStretch()
+
+        self.table = QTableWidget(self)
+        self.table.setColumnCount(5)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        layout.addLayout(controls)
+        layout.addWidget(QLabel("FCR - сколько корма расходуется на единицу прироста биомассы "
+                                "(чем меньше, тем лучше)", self))
+        layout.addWidget(self.table)
+
+    def calculate(self):
+        start = self.start_edit.date().toPyDate()
+        end = self.end_edit.date().toPyDate()
+        if start > end:
+            QMessageBox.warning(self, "Ошибка", "Начало периода позже его конца.")
+            return
+
+        ranking, id_title, name_title = RANKINGS[self.mode_combo.currentText()]
+        self.table.setHorizontalHeaderLabels([id_title, name_title, "Корм", "Прирост биомассы", "FCR"])
+        self.calculate_button.setEnabled(False)
+
+        self.worker = TaskWorker(_load_ranking, ranking, start, end)
+        self.worker.succeeded.connect(self.show_ranking)
+        self.worker.failed.connect(lambda error: QMessageBox.critical(
+            self, "Ошибка", f"Не удалось рассчитать FCR: {error}"))
+        self.worker.finished.connect(lambda: self.calculate_button.setEnabled(True))
+        self.worker.start()
+
+    def show_ranking(self, rows):
+        self.table.setRowCount(len(rows))
+        for i, (record_id, name, feed, gain, fcr) in enumerate(rows):
+            values = [
+                str(record_id) if record_id else "Не указан",
+                name or "Нет данных",
+                f"{feed:.2f}",
+                f"{gain:.2f}" if gain is not None else "Нет замеров",
+                f"{fcr:.2f}" if fcr is not None else "—",
+            ]
+            for j, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if j >= 2:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(i, j, item)
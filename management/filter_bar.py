@@ -0,0 +1,87 @@
+from PyQt5.QtWidgets import (
+    QWidget, QHBoxLayout, QLineEdit, QComboBox, QPushButton, QLabel
+)
+from PyQt5.QtCore import QTimer, pyqtSignal
+from services.table_search import PAGE_SIZE
+
+
+class TableFilterBar(QWidget):
+    """Строка поиска, фильтр по столбцу и переключение страниц для вкладки"""
+    changed = pyqtSignal()  # Изменились условия выборки или страница
+
+    def __init__(self, filter_title, parent=None):
+        super().__init__(parent)
+        self.filter_title = filter_title
+        self.page = 0
+        self.total = 0
+        self.values_loaded = False
+        self.initUI()
+
+    def initUI(self):
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.search_input = QLineEdit(self)
+        self.search_input.setPlaceholderText("Поиск...")
+        self.search_input.setClearButtonEnabled(True)
+
+        self.filter_combo = QComboBox(self)
+        self.filter_combo.addItem(f"{self.filter_title}: все", None)
+
+        self.prev_button = QPushButton("◀", self)
+        self.next_button = QPushButton("▶", self)
+        self.page_label = QLabel(self)
+
+        # Запрос отправляется после паузы в наборе, а не на каждый символ
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(self.reset_page)
+
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.filter_combo.currentIndexChanged.connect(self.reset_page)
+        self.prev_button.clicked.connect(lambda: self.go_to_page(self.page - 1))
+        self.next_button.clicked.connect(lambda: self.go_to_page(self.page + 1))
+
+        layout.addWidget(self.search_input, 2)
+        layout.addWidget(self.filter_combo, 1)
+        layout.addWidget(self.prev_button)
+        layout.addWidget(self.page_label)
+        layout.addWidget(self.next_button)
+
+    def search_text(self):
+        return self.search_input.text().strip() or None
+
+    def filter_value(self):
+        return self.filter_combo.currentData()
+
+    def set_filter_values(self, values):
+        """Заполняет список фильтра, сохраняя выбранное значение"""
+        current = self.filter_value()
+        self.filter_combo.blockSignals(True)
+        self.filter_combo.clear()
+        self.filter_combo.addItem(f"{self.filter_title}: все", None)
+        for value in values:
+            self.filter_combo.addItem(str(value), value)
+        index = self.filter_combo.findData(current)
+        self.filter_combo.setCurrentIndex(max(index, 0))
+        self.filter_combo.blockSignals(False)
+        self.values_loaded = True
+
+    def page_count(self):
+        return max(1, (self.total + PAGE_SIZE - 1) // PAGE_SIZE)
+
+    def set_total(self, total):
+        """Обновляет подпись и кнопки после загрузки страницы"""
+        self.total = total
+        self.page_label.setText(f"Стр. {self.page + 1} из {self.page_count()} (записей: {total})")
+        self.prev_button.setEnabled(self.page > 0)
+        self.next_button.setEnabled(self.page + 1 < self.page_count())
+
+    def go_to_page(self, page):
+        self.page = max(0, min(page, self.page_count() - 1))
+        self.changed.emit()
+
+    def reset_page(self):
+        self.page = 0
+        self.changed.emit()
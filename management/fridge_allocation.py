@@ -0,0 +1,114 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QFormLayout, QHBoxLayout, QLabel, QComboBox, QSpinBox, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+)
+import psycopg2
+from connection import get_read_connection, note_write
+from services.fridges import allocate_batch, plan_batch
+
+
+class FridgeAllocationDialog(QDialog):
+    """Размещение собранной партии по исправным холодильникам"""
+
+    def __init__(self, db_connection, parent=None):
+        super().__init__(parent)
+        self.db_connection = db_connection
+        self.setWindowTitle("Размещение партии по холодильникам")
+        self.resize(500, 450)
+        self.initUI()
+        self.load_species()
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+
+        form = QFormLayout()
+        self.species_combo = QComboBox(self)
+        self.quantity_spin = QSpinBox(self)
+        self.quantity_spin.setRange(1, 10000000)
+        self.shelf_life_spin = QSpinBox(self)
+        self.shelf_life_spin.setRange(0, 3650)
+        self.shelf_life_spin.setValue(30)
+        form.addRow("Морепродукт:", self.species_combo)
+        form.addRow("Количество:", self.quantity_spin)
+        form.addRow("Срок хранения:", self.shelf_life_spin)
+
+        self.table = QTableWidget(self)
+        self.table.setColumnCount(2)
+        self.table.setHorizontalHeaderLabels(["Холодильник", "Разместить"])
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.status_label = QLabel(self)
+
+        buttons = QHBoxLayout()
+        self.plan_button = QPushButton("Рассчитать", self)
+        self.plan_button.clicked.connect(self.plan)
+        self.apply_button = QPushButton("Разместить", self)
+        self.apply_button.clicked.connect(self.apply)
+        close_button = QPushButton("Закрыть", self)
+        close_button.clicked.connect(self.reject)
+        buttons.addWidget(self.plan_button)
+        buttons.addWidget(self.apply_button)
+        buttons.addStretch()
+        buttons.addWidget(close_button)
+
+        layout.addLayout(form)
+        layout.addWidget(self.table)
+        layout.addWidget(self.status_label)
+        layout.addLayout(buttons)
+
+    def load_species(self):
+        try:
+            with get_read_connection(self.db_connection).cursor() as cursor:
+                cursor.execute("SELECT seafood_id, название_вида FROM морепродукты ORDER BY название_вида")
+                for seafood_id, name in cursor.fetchall():
+                    self.species_combo.addItem(f"{name or 'Без названия'} (ID {seafood_id})", seafood_id)
+        except psycopg2.Error as e:
+            QMessageBox.critical(self, "Ошибка базы данных", f"Не удалось загрузить виды: {e}")
+
+    def batch(self):
+        return self.species_combo.currentData(), self.quantity_spin.value(), self.shelf_life_spin.value()
+
+    def show_allocation(self, placed, remaining):
+        self.table.setRowCount(len(placed))
+        for i, (fridge_id, amount) in enumerate(placed):
+            self.table.setItem(i, 0, QTableWidgetItem(str(fridge_id)))
+            self.table.setItem(i, 1, QTableWidgetItem(str(amount)))
+        if remaining:
+            self.status_label.setText(f"Холодильников: {len(placed)}. Не помещается: {remaining}")
+        else:
+            self.status_label.setText(f"Партия помещается в холодильников: {len(placed)}")
+
+    def plan(self):
+        seafood_id, quantity, shelf_life = self.batch()
+        if seafood_id is None:
+            return
+        try:
+            # Расчет по основному серверу: реплика может не знать о последних размещениях
+            placed, remaining = plan_batch(self.db_connection, seafood_id, quantity, shelf_life)
+            self.db_connection.rollback()
+        except psycopg2.Error as e:
+            self.db_connection.rollback()
+            QMessageBox.critical(self, "Ошибка базы данных", f"Не удалось рассчитать размещение: {e}")
+            return
+        self.show_allocation(placed, remaining)
+
+    def apply(self):
+        seafood_id, quantity, shelf_life = self.batch()
+        if seafood_id is None:
+            return
+        try:
+            # Размещение пересчитывается под блокировкой холодильников и записывается целиком
+            placed, remaining = allocate_batch(self.db_connection, seafood_id, quantity, shelf_life)
+        except psycopg2.Error as e:
+            QMessageBox.critical(self, "Ошибка базы данных", f"Не удалось разместить партию: {e}")
+            return
+
+        self.show_allocation(placed, remaining)
+        if remaining:
+            QMessageBox.warning(self, "Недостаточно места",
+                                f"Партия не помещается в исправные холодильники (не хватает места "
+                                f"для {remaining}). Изменения не записаны.")
+            return
+        note_write(self.db_connection)
+        QMessageBox.information(self, "Успех", f"Партия размещена в холодильниках: {len(placed)}")
+        self.accept()
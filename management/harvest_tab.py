@@ -0,0 +1,102 @@
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+)
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+from connection import get_db_connection
+from common.workers import TaskWorker
+from services.harvest import evaluate_readiness, harvest_list
+
+READY_COLOR = QColor(200, 240, 200)
+
+
+def _load_harvest_list(full, ready_only):
+    # Пересчет оценок пишет в базу, поэтому выполняется на основном сервере
+    conn = get_db_connection()
+    try:
+        evaluate_readiness(conn, full)
+        return harvest_list(conn, ready_only)
+    finally:
+        conn.close()
+
+
+class HarvestTab(QWidget):
+    """Вкладка готовности к сбору: партии по последним замерам, готовые - первыми"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.worker = None
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.ready_only = QCheckBox("Только готовые к сбору", self)
+        self.refresh_button = QPushButton("Обновить", self)
+        self.refresh_button.clicked.connect(lambda: self.refresh(False))
+        self.full_button = QPushButton("Пересчитать все", self)
+        self.full_button.setToolTip("Нужно после изменения требований к продаже")
+        self.full_button.clicked.connect(lambda: self.refresh(True))
+        controls.addWidget(self.ready_only)
+        controls.addStretch()
+        controls.addWidget(self.refresh_button)
+        controls.addWidget(self.full_button)
+
+        self.table = QTableWidget(self)
+        self.table.setColumnCount(9)
+        self.table.setHorizontalHeaderLabels([
+            "Аквариум", "Вид", "Живых особей", "Вес (текущий / к продаже)",
+            "Размер (текущий / к продаже)", "Готовность", "Ожидаемый выход", "Дата замера", "ID вида"
+        ])
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        self.status_label = QLabel(self)
+        layout.addLayout(controls)
+        layout.addWidget(self.table)
+        layout.addWidget(self.status_label)
+
+    def refresh(self, full):
+        self.refresh_button.setEnabled(False)
+        self.full_button.setEnabled(False)
+        self.worker = TaskWorker(_load_harvest_list, full, self.ready_only.isChecked())
+        self.worker.succeeded.connect(self.show_list)
+        self.worker.failed.connect(lambda error: QMessageBox.critical(
+            self, "Ошибка", f"Не удалось оценить готовность: {error}"))
+        self.worker.finished.connect(lambda: self.refresh_button.setEnabled(True))
+        self.worker.finished.connect(lambda: self.full_button.setEnabled(True))
+        self.worker.start()
+
+    def show_list(self, rows):
+        ready = 0
+        total_yield = 0
+        self.table.setRowCount(len(rows))
+        for i, (aquarium_id, seafood_id, name, alive, weight, size, required_weight, required_size,
+                readiness, expected, measured_at) in enumerate(rows):
+            is_ready = readiness is not None and readiness >= 1
+            if is_ready:
+                ready += 1
+                total_yield += expected or 0
+            values = [
+                str(aquarium_id),
+                name or "Без названия",
+                str(alive),
+                f"{weight if weight is not None else '—'} / {required_weight if required_weight is not None else '—'}",
+                f"{size if size is not None else '—'} / {required_size if required_size is not None else '—'}",
+                f"{readiness:.0%}" if readiness is not None else "Нет требований",
+                f"{expected:.2f}" if expected is not None else "—",
+                measured_at.strftime("%Y-%m-%d %H:%M") if measured_at else "—",
+                str(seafood_id),
+            ]
+            for j, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if j in (2, 5, 6):
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                if is_ready:
+                    item.setBackground(READY_COLOR)
+                self.table.setItem(i, j, item)
+
+        self.status_label.setText(f"Готово к сбору партий: {ready}, ожидаемый выход: {total_yield:.2f}")
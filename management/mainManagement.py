@@ -1,22 +1,64 @@
 from PyQt5.QtWidgets import (
     QMainWindow, QTabWidget, QTableWidget, QTableWidgetItem,
     QVBoxLayout, QWidget, QPushButton, QHBoxLayout, QMessageBox,
-    QHeaderView, QAbstractItemView, QAction, QMenuBar
+    QHeaderView, QAbstractItemView, QAction, QMenuBar, QProgressDialog, QUndoGroup
 )
 from PyQt5.QtCore import Qt
 import psycopg2
-from PyQt5.QtGui import QFont, QIcon
+from PyQt5.QtGui import QFont, QBrush, QColor, QKeySequence
+from connection import get_db_connection, get_read_connection, note_write
+from services.auth import current_session
+from services import decommission
+from common.workers import TaskWorker
+from common import theme
+from common.theme import icon
+from services.export import EXPORT_TABLES
+from common.export_dialog import export_table_with_dialog
+from services import table_search
+from management.filter_bar import TableFilterBar
+from management.fcr_tab import FeedEfficiencyTab
+from management.capacity_tab import CapacityTab
+from management.harvest_tab import HarvestTab
+from management.fridge_allocation import FridgeAllocationDialog
+from management.audit_viewer import AuditViewer
+from management.report_dialog import ReportDialog
+from services.audit import log_change
+from management.cell_undo import attach_undo_stack
+
+# Роли данных ячейки ID: версия строки в базе и значения ячеек на момент загрузки
+ROW_VERSION_ROLE = Qt.UserRole
+ORIGINAL_VALUES_ROLE = Qt.UserRole + 1
+CONFLICT_COLOR = QColor("#f8d7da")
+
+# Столбцы вкладок, изменения которых пишутся в журнал: номер столбца -> поле
+AUDIT_COLUMNS = {
+    "аквариумы": {1: "тип_аквариума", 3: "объем", 4: "статус"},
+    "морепродукты": {
+        1: "название_вида", 2: "нормальный_вес", 3: "нормальный_размер", 4: "тип_корма",
+        5: "норма_корма_на_одну_особь", 6: "уровень_смертности_группы", 7: "aquarium_id",
+    },
+    "пользователи": {1: "имя_пользователя", 2: "роль_пользователя", 3: "логин"},
+    "холодильники": {
+        1: "морепродукт", 2: "количество", 3: "срок_хранения", 4: "состояние_холодильника",
+        5: "дата_последней_проверки", 6: "вместимость",
+    },
+}
 
 class ManagementWindow(QMainWindow):
     def __init__(self, db_connection):
         super().__init__()
         self.db_connection = db_connection
+        self.delete_jobs = []  # Фоновые задачи удаления, выполняющиеся сейчас
+        self.undo_group = QUndoGroup(self)  # История правок ячеек, по стеку на таблицу
+        self.undo_stacks = {}
         self.initUI()
         self.load_styles()
         self.setup_menu()
 
     def initUI(self):
-        self.setWindowTitle('Управление базой данных')
+        session = current_session()
+        title = 'Управление базой данных'
+        self.setWindowTitle(f'{title} — {session.name}' if session else title)
         self.setGeometry(100, 100, 1200, 800)
 
         # Основной виджет
@@ -36,16 +78,24 @@ class ManagementWindow(QMainWindow):
         self.create_seafood_tab()
         self.create_users_tab()
         self.create_refrigerators_tab()
+        self.fcr_tab = FeedEfficiencyTab(self)
+        self.tabs.addTab(self.fcr_tab, "Эффективность корма")
+        self.capacity_tab = CapacityTab(self)
+        self.tabs.addTab(self.capacity_tab, "Плотность посадки")
+        self.harvest_tab = HarvestTab(self)
+        self.tabs.addTab(self.harvest_tab, "Готовность к сбору")
+        self.tabs.currentChanged.connect(self.activate_undo_stack)
+        self.activate_undo_stack(self.tabs.currentIndex())
         
         # Кнопки управления
         button_layout = QHBoxLayout()
         
         self.save_button = QPushButton('Сохранить изменения')
-        self.save_button.setIcon(QIcon("icons/save.png"))
+        self.save_button.setIcon(icon("save.png"))
         self.save_button.clicked.connect(self.save_changes)
         
         self.refresh_button = QPushButton('Обновить данные')
-        self.refresh_button.setIcon(QIcon("icons/refresh.png"))
+        self.refresh_button.setIcon(icon("refresh.png"))
         self.refresh_button.clicked.connect(self.refresh_data)
         
         button_layout.addWidget(self.save_button)
@@ -55,11 +105,10 @@ class ManagementWindow(QMainWindow):
         main_layout.addLayout(button_layout)
 
     def load_styles(self):
-        # Загрузка стилей из CSS файла
-        try:
-            with open("management/styles.css", "r") as f:
-                self.setStyleSheet(f.read())
-        except:
+        # Стили окна берутся из общего кэша темы
+        if theme.stylesheet("management"):
+            theme.apply_window_theme(self, "management")
+        else:
             # Стандартные стили, если файл не найден
             self.setStyleSheet("""
                 QTableWidget {
@@ -85,6 +134,15 @@ class ManagementWindow(QMainWindow):
         exit_action = QAction('Выход', self)
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
+
+        # Меню Правка: отмена и повтор правок в таблице текущей вкладки
+        edit_menu = menubar.addMenu('Правка')
+        undo_action = self.undo_group.createUndoAction(self, 'Отменить')
+        undo_action.setShortcut(QKeySequence.Undo)
+        redo_action = self.undo_group.createRedoAction(self, 'Повторить')
+        redo_action.setShortcut(QKeySequence.Redo)
+        edit_menu.addAction(undo_action)
+        edit_menu.addAction(redo_action)
         
         # Меню Таблицы
         tables_menu = menubar.addMenu('Таблицы')
@@ -100,6 +158,25 @@ class ManagementWindow(QMainWindow):
             action.triggered.connect(lambda _, idx=index: self.tabs.setCurrentIndex(idx))
             tables_menu.addAction(action)
 
+        # Меню Экспорт
+        export_menu = menubar.addMenu('Экспорт')
+        for table in EXPORT_TABLES:
+            action = QAction(table.replace('_', ' ').capitalize(), self)
+            action.triggered.connect(lambda _, t=table: export_table_with_dialog(self, t))
+            export_menu.addAction(action)
+
+        # Меню Отчеты
+        reports_menu = menubar.addMenu('Отчеты')
+        report_action = QAction('Отчет по ферме...', self)
+        report_action.triggered.connect(lambda: ReportDialog(self).exec_())
+        reports_menu.addAction(report_action)
+
+        # Меню Журнал
+        audit_menu = menubar.addMenu('Журнал')
+        audit_action = QAction('Журнал изменений', self)
+        audit_action.triggered.connect(self.show_audit)
+        audit_menu.addAction(audit_action)
+
     def create_aquariums_tab(self):
         """Создает вкладку для управления аквариумами"""
         tab = QWidget()
@@ -108,23 +185,29 @@ class ManagementWindow(QMainWindow):
         self.aquariums_table = QTableWidget()
         self.aquariums_table.setEditTriggers(QTableWidget.DoubleClicked | QTableWidget.EditKeyPressed)
         self.aquariums_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.undo_stacks[self.aquariums_table] = attach_undo_stack(self.aquariums_table, self.undo_group)
         self.aquariums_table.setSelectionMode(QTableWidget.SingleSelection)
         
         # Кнопки для аквариумов
         btn_layout = QHBoxLayout()
         add_btn = QPushButton('Добавить')
-        add_btn.setIcon(QIcon("icons/add.png"))
+        add_btn.setIcon(icon("add.png"))
         add_btn.clicked.connect(self.add_aquarium)
         
         del_btn = QPushButton('Удалить')
-        del_btn.setIcon(QIcon("icons/delete.png"))
+        del_btn.setIcon(icon("delete.png"))
         del_btn.clicked.connect(self.delete_aquarium)
         
         btn_layout.addWidget(add_btn)
         btn_layout.addWidget(del_btn)
         btn_layout.addStretch()
         
+        # Поиск, фильтр и страницы выполняются на стороне сервера
+        self.aquariums_filter = TableFilterBar('Статус')
+        self.aquariums_filter.changed.connect(self.load_aquariums_data)
+
         layout.addLayout(btn_layout)
+        layout.addWidget(self.aquariums_filter)
         layout.addWidget(self.aquariums_table)
         
         self.tabs.addTab(tab, "Аквариумы")
@@ -138,22 +221,28 @@ class ManagementWindow(QMainWindow):
         self.seafood_table = QTableWidget()
         self.seafood_table.setEditTriggers(QTableWidget.DoubleClicked | QTableWidget.EditKeyPressed)
         self.seafood_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.undo_stacks[self.seafood_table] = attach_undo_stack(self.seafood_table, self.undo_group)
         
         # Кнопки для морепродуктов
         btn_layout = QHBoxLayout()
         add_btn = QPushButton('Добавить')
-        add_btn.setIcon(QIcon("icons/add.png"))
+        add_btn.setIcon(icon("add.png"))
         add_btn.clicked.connect(self.add_seafood)
         
         del_btn = QPushButton('Удалить')
-        del_btn.setIcon(QIcon("icons/delete.png"))
+        del_btn.setIcon(icon("delete.png"))
         del_btn.clicked.connect(self.delete_seafood)
         
         btn_layout.addWidget(add_btn)
         btn_layout.addWidget(del_btn)
         btn_layout.addStretch()
         
+        # Поиск, фильтр и страницы выполняются на стороне сервера
+        self.seafood_filter = TableFilterBar('Тип корма')
+        self.seafood_filter.changed.connect(self.load_seafood_data)
+
         layout.addLayout(btn_layout)
+        layout.addWidget(self.seafood_filter)
         layout.addWidget(self.seafood_table)
         
         self.tabs.addTab(tab, "Морепродукты")
@@ -167,22 +256,28 @@ class ManagementWindow(QMainWindow):
         self.users_table = QTableWidget()
         self.users_table.setEditTriggers(QTableWidget.DoubleClicked | QTableWidget.EditKeyPressed)
         self.users_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.undo_stacks[self.users_table] = attach_undo_stack(self.users_table, self.undo_group)
         
         # Кнопки для пользователей
         btn_layout = QHBoxLayout()
         add_btn = QPushButton('Добавить')
-        add_btn.setIcon(QIcon("icons/add.png"))
+        add_btn.setIcon(icon("add.png"))
         add_btn.clicked.connect(self.add_user)
         
         del_btn = QPushButton('Удалить')
-        del_btn.setIcon(QIcon("icons/delete.png"))
+        del_btn.setIcon(icon("delete.png"))
         del_btn.clicked.connect(self.delete_user)
         
         btn_layout.addWidget(add_btn)
         btn_layout.addWidget(del_btn)
         btn_layout.addStretch()
         
+        # Поиск, фильтр и страницы выполняются на стороне сервера
+        self.users_filter = TableFilterBar('Роль')
+        self.users_filter.changed.connect(self.load_users_data)
+
         layout.addLayout(btn_layout)
+        layout.addWidget(self.users_filter)
         layout.addWidget(self.users_table)
         
         self.tabs.addTab(tab, "Пользователи")
@@ -196,51 +291,91 @@ class ManagementWindow(QMainWindow):
         self.refrigerators_table = QTableWidget()
         self.refrigerators_table.setEditTriggers(QTableWidget.DoubleClicked | QTableWidget.EditKeyPressed)
         self.refrigerators_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.undo_stacks[self.refrigerators_table] = attach_undo_stack(self.refrigerators_table, self.undo_group)
         
         # Кнопки для холодильников
         btn_layout = QHBoxLayout()
         add_btn = QPushButton('Добавить')
-        add_btn.setIcon(QIcon("icons/add.png"))
+        add_btn.setIcon(icon("add.png"))
         add_btn.clicked.connect(self.add_refrigerator)
         
         del_btn = QPushButton('Удалить')
-        del_btn.setIcon(QIcon("icons/delete.png"))
+        del_btn.setIcon(icon("delete.png"))
         del_btn.clicked.connect(self.delete_refrigerator)
+
+        allocate_btn = QPushButton('Разместить партию')
+        allocate_btn.clicked.connect(self.allocate_batch)
         
         btn_layout.addWidget(add_btn)
         btn_layout.addWidget(del_btn)
+        btn_layout.addWidget(allocate_btn)
         btn_layout.addStretch()
         
+        # Поиск, фильтр и страницы выполняются на стороне сервера
+        self.refrigerators_filter = TableFilterBar('Состояние')
+        self.refrigerators_filter.changed.connect(self.load_refrigerators_data)
+
         layout.addLayout(btn_layout)
+        layout.addWidget(self.refrigerators_filter)
         layout.addWidget(self.refrigerators_table)
         
         self.tabs.addTab(tab, "Холодильники")
         self.load_refrigerators_data()
 
     # Методы загрузки данных
+    def fetch_tab_page(self, table_query, filter_bar):
+        """Загружает текущую страницу вкладки с учетом поиска и фильтра"""
+        conn = get_read_connection(self.db_connection)
+        if not filter_bar.values_loaded:
+            filter_bar.set_filter_values(table_search.filter_values(conn, table_query))
+        rows, total, filter_bar.page = table_search.fetch_page(
+            conn, table_query,
+            filter_bar.search_text(), filter_bar.filter_value(), filter_bar.page
+        )
+        filter_bar.set_total(total)
+        return rows
+
+    def fill_table(self, table, rows, read_only_columns=()):
+        """Заполняет таблицу строками выборки.
+
+        Последнее значение строки - версия записи (xmin). Версия и исходные
+        значения ячеек сохраняются в ячейке ID, чтобы при сохранении
+        записывать только измененные строки и обнаруживать чужие правки.
+        История правок таблицы сбрасывается: ее строки больше не существуют.
+        """
+        self.undo_stacks[table].clear()
+        table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            *values, version = row
+            for j, col in enumerate(values):
+                item = QTableWidgetItem(str(col) if col is not None else "")
+                if j in read_only_columns:
+                    item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+                table.setItem(i, j, item)
+            id_item = table.item(i, 0)
+            id_item.setData(ROW_VERSION_ROLE, version)
+            id_item.setData(ORIGINAL_VALUES_ROLE, self.row_values(table, i))
+
+    def row_values(self, table, row):
+        """Возвращает текущие значения ячеек строки"""
+        return [table.item(row, j).text() for j in range(table.columnCount())]
+
+    def changed_rows(self, table):
+        """Возвращает новые строки и строки, отличающиеся от загруженных"""
+        for row in range(table.rowCount()):
+            id_item = table.item(row, 0)
+            if not id_item.text() or self.row_values(table, row) != id_item.data(ORIGINAL_VALUES_ROLE):
+                yield row
+
     def load_aquariums_data(self):
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                SELECT a.aquarium_id, a.тип_аквариума, u.имя_пользователя, 
-                       a.объем, a.статус, m.название_вида
-                FROM аквариумы a
-                LEFT JOIN пользователи u ON a.ответственный_пользователь = u.user_id
-                LEFT JOIN морепродукты m ON a.aquarium_id = m.aquarium_id
-                ORDER BY a.aquarium_id
-            """)
-            
-            rows = cursor.fetchall()
-            self.aquariums_table.setRowCount(len(rows))
+            rows = self.fetch_tab_page(table_search.AQUARIUMS, self.aquariums_filter)
             self.aquariums_table.setColumnCount(6)
             self.aquariums_table.setHorizontalHeaderLabels([
                 'ID', 'Тип', 'Ответственный', 'Объем', 'Статус', 'Морепродукт'
             ])
             
-            for i, row in enumerate(rows):
-                for j, col in enumerate(row):
-                    item = QTableWidgetItem(str(col) if col is not None else "")
-                    self.aquariums_table.setItem(i, j, item)
+            self.fill_table(self.aquariums_table, rows)
             
             self.aquariums_table.hideColumn(0)  # Скрываем ID
             self.aquariums_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
@@ -250,28 +385,14 @@ class ManagementWindow(QMainWindow):
 
     def load_seafood_data(self):
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                SELECT m.seafood_id, m.название_вида, m.нормальный_вес, 
-                       m.нормальный_размер, m.тип_корма, m.норма_корма_на_одну_особь,
-                       m.уровень_смертности_группы, a.aquarium_id
-                FROM морепродукты m
-                LEFT JOIN аквариумы a ON m.aquarium_id = a.aquarium_id
-                ORDER BY m.seafood_id
-            """)
-            
-            rows = cursor.fetchall()
-            self.seafood_table.setRowCount(len(rows))
+            rows = self.fetch_tab_page(table_search.SEAFOOD, self.seafood_filter)
             self.seafood_table.setColumnCount(8)
             self.seafood_table.setHorizontalHeaderLabels([
                 'ID', 'Название', 'Норма веса', 'Норма размера', 
                 'Тип корма', 'Норма корма', 'Смертность', 'ID аквариума'
             ])
             
-            for i, row in enumerate(rows):
-                for j, col in enumerate(row):
-                    item = QTableWidgetItem(str(col) if col is not None else "")
-                    self.seafood_table.setItem(i, j, item)
+            self.fill_table(self.seafood_table, rows)
             
             self.seafood_table.hideColumn(0)  # Скрываем ID
             self.seafood_table.hideColumn(7)  # Скрываем ID аквариума
@@ -282,26 +403,13 @@ class ManagementWindow(QMainWindow):
 
     def load_users_data(self):
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                SELECT user_id, имя_пользователя, роль_пользователя, логин
-                FROM пользователи
-                ORDER BY user_id
-            """)
-            
-            rows = cursor.fetchall()
-            self.users_table.setRowCount(len(rows))
+            rows = self.fetch_tab_page(table_search.USERS, self.users_filter)
             self.users_table.setColumnCount(4)
             self.users_table.setHorizontalHeaderLabels([
                 'ID', 'Имя', 'Роль', 'Логин'
             ])
             
-            for i, row in enumerate(rows):
-                for j, col in enumerate(row):
-                    item = QTableWidgetItem(str(col))
-                    if j == 3:  # Логин - нередактируемый
-                        item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                    self.users_table.setItem(i, j, item)
+            self.fill_table(self.users_table, rows, read_only_columns=(3,))  # Логин - нередактируемый
             
             self.users_table.hideColumn(0)  # Скрываем ID
             self.users_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
@@ -311,27 +419,14 @@ class ManagementWindow(QMainWindow):
 
     def load_refrigerators_data(self):
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                SELECT f.fridge_id, m.название_вида, f.количество, 
-                       f.срок_хранения, f.состояние_холодильника, 
-                       f.дата_последней_проверки
-                FROM холодильники f
-                LEFT JOIN морепродукты m ON f.seafood_id = m.seafood_id
-                ORDER BY f.fridge_id
-            """)
-            
-            rows = cursor.fetchall()
-            self.refrigerators_table.setRowCount(len(rows))
-            self.refrigerators_table.setColumnCount(6)
+            rows = self.fetch_tab_page(table_search.REFRIGERATORS, self.refrigerators_filter)
+            self.refrigerators_table.setColumnCount(7)
             self.refrigerators_table.setHorizontalHeaderLabels([
-                'ID', 'Морепродукт', 'Количество', 'Срок хранения', 'Состояние', 'Последняя проверка'
+                'ID', 'Морепродукт', 'Количество', 'Срок хранения', 'Состояние', 'Последняя проверка',
+                'Вместимость'
             ])
             
-            for i, row in enumerate(rows):
-                for j, col in enumerate(row):
-                    item = QTableWidgetItem(str(col) if col is not None else "")
-                    self.refrigerators_table.setItem(i, j, item)
+            self.fill_table(self.refrigerators_table, rows)
             
             self.refrigerators_table.hideColumn(0)  # Скрываем ID
             self.refrigerators_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
@@ -364,6 +459,28 @@ class ManagementWindow(QMainWindow):
         for i in range(self.refrigerators_table.columnCount()):
             self.refrigerators_table.setItem(row, i, QTableWidgetItem(""))
 
+    def allocate_batch(self):
+        """Размещает собранную партию по холодильникам"""
+        dialog = FridgeAllocationDialog(self.db_connection, self)
+        if dialog.exec_() == FridgeAllocationDialog.Accepted:
+            self.load_refrigerators_data()
+
+    def show_audit(self):
+        """Открывает журнал изменений выбранной записи текущей вкладки"""
+        tabs = {
+            0: ("аквариумы", self.aquariums_table),
+            1: ("морепродукты", self.seafood_table),
+            2: ("пользователи", self.users_table),
+            3: ("холодильники", self.refrigerators_table),
+        }
+        entity, record_id = None, None
+        if self.tabs.currentIndex() in tabs:
+            entity, table = tabs[self.tabs.currentIndex()]
+            row = table.currentRow()
+            if row >= 0 and table.item(row, 0) is not None:
+                record_id = table.item(row, 0).text() or None
+        AuditViewer(self.db_connection, entity, record_id, self).exec_()
+
     # Методы для удаления записей
     def delete_aquarium(self):
         row = self.aquariums_table.currentRow()
@@ -372,7 +489,8 @@ class ManagementWindow(QMainWindow):
             if QMessageBox.question(self, "Подтверждение", 
                                   f"Удалить аквариум ID {aquarium_id}?",
                                   QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
-                self.aquariums_table.removeRow(row)
+                self.run_delete_job(self.aquariums_table, row, decommission.decommission_aquarium,
+                                    f"Вывод аквариума {aquarium_id} из эксплуатации")
 
     def delete_seafood(self):
         row = self.seafood_table.currentRow()
@@ -381,7 +499,8 @@ class ManagementWindow(QMainWindow):
             if QMessageBox.question(self, "Подтверждение", 
                                   f"Удалить морепродукт ID {seafood_id}?",
                                   QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
-                self.seafood_table.removeRow(row)
+                self.run_delete_job(self.seafood_table, row, decommission.decommission_seafood,
+                                    f"Удаление морепродукта {seafood_id}")
 
     def delete_user(self):
         row = self.users_table.currentRow()
@@ -390,7 +509,8 @@ class ManagementWindow(QMainWindow):
             if QMessageBox.question(self, "Подтверждение", 
                                   f"Удалить пользователя ID {user_id}?",
                                   QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
-                self.users_table.removeRow(row)
+                self.run_delete_job(self.users_table, row, decommission.delete_user,
+                                    f"Удаление пользователя {user_id}")
 
     def delete_refrigerator(self):
         row = self.refrigerators_table.currentRow()
@@ -399,142 +519,287 @@ class ManagementWindow(QMainWindow):
             if QMessageBox.question(self, "Подтверждение", 
                                   f"Удалить холодильник ID {fridge_id}?",
                                   QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
-                self.refrigerators_table.removeRow(row)
+                self.run_delete_job(self.refrigerators_table, row, decommission.delete_refrigerator,
+                                    f"Удаление холодильника {fridge_id}")
+
+    def run_delete_job(self, table, row, job, title):
+        """Удаляет запись в фоновом потоке с отображением хода выполнения.
+
+        История переносится в архив небольшими пачками на отдельном
+        соединении, поэтому окно остается отзывчивым, а горячие таблицы
+        не блокируются на все время удаления.
+        """
+        record_id = table.item(row, 0).text()
+        if not record_id:  # Строка еще не сохранена в базе
+            self.remove_row(table, row)
+            return
+
+        dialog = QProgressDialog(title, None, 0, 0, self)
+        dialog.setWindowTitle("Удаление")
+        dialog.setMinimumDuration(0)
+
+        worker = TaskWorker(self.run_with_own_connection, job, int(record_id), progress=True)
+        def show_progress(done, total):
+            dialog.setMaximum(max(total, 1))
+            dialog.setValue(done)
+
+        worker.progress.connect(show_progress)
+        worker.succeeded.connect(lambda archived: self.on_delete_finished(table, record_id, archived))
+        worker.failed.connect(lambda error: QMessageBox.critical(
+            self, "Ошибка", f"Не удалось удалить запись ID {record_id}: {error}"))
+        worker.finished.connect(dialog.close)
+        worker.finished.connect(lambda: self.delete_jobs.remove(worker))
+        self.delete_jobs.append(worker)
+        worker.start()
+
+    def remove_row(self, table, row):
+        """Удаляет строку таблицы; история правок сбрасывается, так как строки сдвигаются"""
+        table.removeRow(row)
+        self.undo_stacks[table].clear()
+
+    def activate_undo_stack(self, index):
+        """Делает активной историю правок таблицы текущей вкладки"""
+        tables = [self.aquariums_table, self.seafood_table, self.users_table, self.refrigerators_table]
+        self.undo_group.setActiveStack(self.undo_stacks[tables[index]] if 0 <= index < len(tables) else None)
+
+    @staticmethod
+    def run_with_own_connection(job, record_id, progress):
+        conn = get_db_connection()
+        try:
+            result = job(conn, record_id, progress=progress)
+            note_write(conn)
+            return result
+        finally:
+            conn.close()
+
+    def on_delete_finished(self, table, record_id, archived):
+        # Ищем строку заново: за время удаления таблица могла измениться
+        for row in range(table.rowCount()):
+            if table.item(row, 0).text() == record_id:
+                self.remove_row(table, row)
+                break
+        message = f"Запись ID {record_id} удалена."
+        if archived:
+            message += f"\nПеренесено в архив строк истории: {archived}"
+        QMessageBox.information(self, "Удаление", message)
 
     def save_changes(self):
-        """Сохраняет все изменения в базе данных"""
+        """Сохраняет изменения в базе данных.
+
+        Записываются только строки, отличающиеся от загруженных после всех
+        правок, отмен и повторов, и только если их версия в базе
+        не изменилась с момента загрузки. Строки, измененные другим
+        пользователем, не перезаписываются и подсвечиваются как конфликтные.
+        """
+        saved = []  # (таблица, строка, новая версия, новый ID или None)
+        conflicts = []  # (название вкладки, таблица, строка)
+        cursor = self.db_connection.cursor()
         try:
-            cursor = self.db_connection.cursor()
-            
             # Сохраняем изменения для каждой таблицы
-            self.save_aquariums(cursor)
-            self.save_seafood(cursor)
-            self.save_users(cursor)
-            self.save_refrigerators(cursor)
-            
+            self.save_aquariums(cursor, saved, conflicts)
+            self.save_seafood(cursor, saved, conflicts)
+            self.save_users(cursor, saved, conflicts)
+            self.save_refrigerators(cursor, saved, conflicts)
+
             self.db_connection.commit()
-            QMessageBox.information(self, "Успех", "Все изменения сохранены!")
-            
         except psycopg2.Error as e:
             self.db_connection.rollback()
             QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить изменения: {e}")
+            return
         finally:
             cursor.close()
+        note_write(self.db_connection)
+
+        entities = {
+            self.aquariums_table: "аквариумы",
+            self.seafood_table: "морепродукты",
+            self.users_table: "пользователи",
+            self.refrigerators_table: "холодильники",
+        }
+        for table, row, version, new_id in saved:
+            self.audit_saved_row(entities[table], table, row, new_id)
+            self.mark_row_saved(table, row, version, new_id)
+        for _, table, row in conflicts:
+            self.mark_row_conflict(table, row)
+        for stack in self.undo_stacks.values():
+            stack.setClean()
+
+        if conflicts:
+            details = "\n".join(
+                f"{tab_name}: ID {table.item(row, 0).text()}" for tab_name, table, row in conflicts
+            )
+            QMessageBox.warning(
+                self, "Конфликт изменений",
+                f"Сохранено строк: {len(saved)}.\n"
+                f"Следующие записи были изменены другим пользователем и не сохранены:\n"
+                f"{details}\n\nОбновите данные и внесите изменения повторно."
+            )
+        else:
+            QMessageBox.information(self, "Успех", f"Все изменения сохранены! Строк: {len(saved)}")
+
+    def record_update(self, cursor, table, row, saved, conflicts, tab_name):
+        """Учитывает результат UPDATE ... RETURNING xmin с проверкой версии"""
+        result = cursor.fetchone()
+        if result is None:
+            conflicts.append((tab_name, table, row))
+        else:
+            saved.append((table, row, result[0], None))
+
+    def audit_saved_row(self, entity, table, row, new_id=None):
+        """Ставит сохраненную строку в очередь журнала изменений (запись идет в фоне)"""
+        columns = AUDIT_COLUMNS[entity]
+        after = {name: table.item(row, j).text() for j, name in columns.items()}
+        if new_id is not None:
+            log_change(entity, new_id, "INSERT", after=after)
+        else:
+            original = table.item(row, 0).data(ORIGINAL_VALUES_ROLE)
+            before = {name: original[j] for j, name in columns.items()}
+            log_change(entity, table.item(row, 0).text(), "UPDATE", before, after)
 
-    def save_aquariums(self, cursor):
+    def mark_row_saved(self, table, row, version, new_id=None):
+        """Запоминает новую версию и значения строки после сохранения"""
+        id_item = table.item(row, 0)
+        if new_id is not None:
+            id_item.setText(str(new_id))
+        id_item.setData(ROW_VERSION_ROLE, version)
+        id_item.setData(ORIGINAL_VALUES_ROLE, self.row_values(table, row))
+        for j in range(table.columnCount()):
+            table.item(row, j).setBackground(QBrush())
+            table.item(row, j).setToolTip("")
+
+    def mark_row_conflict(self, table, row):
+        """Подсвечивает строку, которую изменил другой пользователь"""
+        for j in range(table.columnCount()):
+            table.item(row, j).setBackground(CONFLICT_COLOR)
+            table.item(row, j).setToolTip("Запись изменена другим пользователем")
+
+    def save_aquariums(self, cursor, saved, conflicts):
         """Сохраняет изменения в таблице аквариумов"""
-        for row in range(self.aquariums_table.rowCount()):
-            aquarium_id = self.aquariums_table.item(row, 0).text()
-            aquarium_type = self.aquariums_table.item(row, 1).text()
-            responsible = self.aquariums_table.item(row, 2).text()
-            volume = self.aquariums_table.item(row, 3).text()
-            status = self.aquariums_table.item(row, 4).text()
-            
+        table = self.aquariums_table
+        for row in self.changed_rows(table):
+            aquarium_id = table.item(row, 0).text()
+            aquarium_type = table.item(row, 1).text()
+            volume = table.item(row, 3).text()
+            status = table.item(row, 4).text()
+
             if aquarium_id:  # Обновление существующей записи
                 cursor.execute("""
-                    UPDATE аквариумы 
+                    UPDATE аквариумы
                     SET тип_аквариума = %s, объем = %s, статус = %s
-                    WHERE aquarium_id = %s
-                """, (aquarium_type, volume, status, aquarium_id))
+                    WHERE aquarium_id = %s AND xmin = %s::xid
+                    RETURNING xmin::text
+                """, (aquarium_type, volume, status, aquarium_id, table.item(row, 0).data(ROW_VERSION_ROLE)))
+                self.record_update(cursor, table, row, saved, conflicts, "Аквариумы")
             else:  # Новая запись
                 cursor.execute("""
                     INSERT INTO аквариумы (тип_аквариума, объем, статус)
                     VALUES (%s, %s, %s)
-                    RETURNING aquarium_id
+                    RETURNING xmin::text, aquarium_id
                 """, (aquarium_type, volume, status))
-                new_id = cursor.fetchone()[0]
-                self.aquariums_table.item(row, 0).setText(str(new_id))
+                saved.append((table, row) + cursor.fetchone())
 
-    def save_seafood(self, cursor):
+    def save_seafood(self, cursor, saved, conflicts):
         """Сохраняет изменения в таблице морепродуктов"""
-        for row in range(self.seafood_table.rowCount()):
-            seafood_id = self.seafood_table.item(row, 0).text()
-            name = self.seafood_table.item(row, 1).text()
-            weight = self.seafood_table.item(row, 2).text()
-            size = self.seafood_table.item(row, 3).text()
-            food_type = self.seafood_table.item(row, 4).text()
-            food_rate = self.seafood_table.item(row, 5).text()
-            mortality = self.seafood_table.item(row, 6).text()
-            aquarium_id = self.seafood_table.item(row, 7).text()
-            
+        table = self.seafood_table
+        for row in self.changed_rows(table):
+            seafood_id = table.item(row, 0).text()
+            name = table.item(row, 1).text()
+            weight = table.item(row, 2).text()
+            size = table.item(row, 3).text()
+            food_type = table.item(row, 4).text()
+            food_rate = table.item(row, 5).text()
+            mortality = table.item(row, 6).text()
+            aquarium_id = table.item(row, 7).text() or None
+
             if seafood_id:  # Обновление существующей записи
                 cursor.execute("""
-                    UPDATE морепродукты 
+                    UPDATE морепродукты
                     SET название_вида = %s, нормальный_вес = %s, нормальный_размер = %s,
-                        тип_корма = %s, норма_корма_на_одну_особь = %s, 
+                        тип_корма = %s, норма_корма_на_одну_особь = %s,
                         уровень_смертности_группы = %s, aquarium_id = %s
-                    WHERE seafood_id = %s
-                """, (name, weight, size, food_type, food_rate, mortality, aquarium_id, seafood_id))
+                    WHERE seafood_id = %s AND xmin = %s::xid
+                    RETURNING xmin::text
+                """, (name, weight, size, food_type, food_rate, mortality, aquarium_id,
+                      seafood_id, table.item(row, 0).data(ROW_VERSION_ROLE)))
+                self.record_update(cursor, table, row, saved, conflicts, "Морепродукты")
             else:  # Новая запись
                 cursor.execute("""
                     INSERT INTO морепродукты (
                         название_вида, нормальный_вес, нормальный_размер,
-                        тип_корма, норма_корма_на_одну_особь, 
+                        тип_корма, норма_корма_на_одну_особь,
                         уровень_смертности_группы, aquarium_id
                     ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    RETURNING seafood_id
+                    RETURNING xmin::text, seafood_id
                 """, (name, weight, size, food_type, food_rate, mortality, aquarium_id))
-                new_id = cursor.fetchone()[0]
-                self.seafood_table.item(row, 0).setText(str(new_id))
+                saved.append((table, row) + cursor.fetchone())
 
-    def save_users(self, cursor):
+    def save_users(self, cursor, saved, conflicts):
         """Сохраняет изменения в таблице пользователей"""
-        for row in range(self.users_table.rowCount()):
-            user_id = self.users_table.item(row, 0).text()
-            username = self.users_table.item(row, 1).text()
-            role = self.users_table.item(row, 2).text()
-            login = self.users_table.item(row, 3).text()
-            
+        table = self.users_table
+        for row in self.changed_rows(table):
+            user_id = table.item(row, 0).text()
+            username = table.item(row, 1).text()
+            role = table.item(row, 2).text()
+            login = table.item(row, 3).text()
+
             if user_id:  # Обновление существующей записи
                 cursor.execute("""
-                    UPDATE пользователи 
+                    UPDATE пользователи
                     SET имя_пользователя = %s, роль_пользователя = %s
-                    WHERE user_id = %s
-                """, (username, role, user_id))
+                    WHERE user_id = %s AND xmin = %s::xid
+                    RETURNING xmin::text
+                """, (username, role, user_id, table.item(row, 0).data(ROW_VERSION_ROLE)))
+                self.record_update(cursor, table, row, saved, conflicts, "Пользователи")
             else:  # Новая запись
                 cursor.execute("""
                     INSERT INTO пользователи (имя_пользователя, роль_пользователя, логин)
                     VALUES (%s, %s, %s)
-                    RETURNING user_id
+                    RETURNING xmin::text, user_id
                 """, (username, role, login))
-                new_id = cursor.fetchone()[0]
-                self.users_table.item(row, 0).setText(str(new_id))
+                saved.append((table, row) + cursor.fetchone())
 
-    def save_refrigerators(self, cursor):
+    def save_refrigerators(self, cursor, saved, conflicts):
         """Сохраняет изменения в таблице холодильников"""
-        for row in range(self.refrigerators_table.rowCount()):
-            fridge_id = self.refrigerators_table.item(row, 0).text()
-            seafood_name = self.refrigerators_table.item(row, 1).text()
-            quantity = self.refrigerators_table.item(row, 2).text()
-            storage_time = self.refrigerators_table.item(row, 3).text()
-            condition = self.refrigerators_table.item(row, 4).text()
-            last_check = self.refrigerators_table.item(row, 5).text()
-            
+        table = self.refrigerators_table
+        for row in self.changed_rows(table):
+            fridge_id = table.item(row, 0).text()
+            seafood_name = table.item(row, 1).text()
+            quantity = table.item(row, 2).text()
+            storage_time = table.item(row, 3).text()
+            condition = table.item(row, 4).text()
+            last_check = table.item(row, 5).text() or None
+            capacity = table.item(row, 6).text() or None
+
             # Получаем seafood_id по названию
             cursor.execute("SELECT seafood_id FROM морепродукты WHERE название_вида = %s", (seafood_name,))
             result = cursor.fetchone()
             seafood_id = result[0] if result else None
-            
+
             if fridge_id:  # Обновление существующей записи
                 cursor.execute("""
-                    UPDATE холодильники 
+                    UPDATE холодильники
                     SET seafood_id = %s, количество = %s, срок_хранения = %s,
-                        состояние_холодильника = %s, дата_последней_проверки = %s
-                    WHERE fridge_id = %s
-                """, (seafood_id, quantity, storage_time, condition, last_check, fridge_id))
+                        состояние_холодильника = %s, дата_последней_проверки = %s, вместимость = %s
+                    WHERE fridge_id = %s AND xmin = %s::xid
+                    RETURNING xmin::text
+                """, (seafood_id, quantity, storage_time, condition, last_check, capacity,
+                      fridge_id, table.item(row, 0).data(ROW_VERSION_ROLE)))
+                self.record_update(cursor, table, row, saved, conflicts, "Холодильники")
             else:  # Новая запись
                 cursor.execute("""
                     INSERT INTO холодильники (
                         seafood_id, количество, срок_хранения,
-                        состояние_холодильника, дата_последней_проверки
-                    ) VALUES (%s, %s, %s, %s, %s)
-                    RETURNING fridge_id
-                """, (seafood_id, quantity, storage_time, condition, last_check))
-                new_id = cursor.fetchone()[0]
-                self.refrigerators_table.item(row, 0).setText(str(new_id))
+                        состояние_холодильника, дата_последней_проверки, вместимость
+                    ) VALUES (%s, %s, %s, %s, %s, %s)
+                    RETURNING xmin::text, fridge_id
+                """, (seafood_id, quantity, storage_time, condition, last_check, capacity))
+                saved.append((table, row) + cursor.fetchone())
 
     def refresh_data(self):
         """Обновляет все данные из базы"""
+        for filter_bar in (self.aquariums_filter, self.seafood_filter,
+                           self.users_filter, self.refrigerators_filter):
+            filter_bar.values_loaded = False  # Перечитываем и списки значений фильтров
         self.load_aquariums_data()
         self.load_seafood_data()
         self.load_users_data()
@@ -0,0 +1,104 @@
+from datetime import date, timedelta
+
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QFormLayout, QHBoxLayout, QDateEdit, QComboBox, QPushButton,
+    QProgressBar, QFileDialog, QMessageBox
+)
+from PyQt5.QtCore import QDate
+from connection import get_reporting_connection
+from common.workers import TaskWorker
+from services.reports import generate_report, previous_month, refresh_rollups
+
+FORMATS = {"HTML (*.html)": "html", "PDF (*.pdf)": "pdf"}
+
+
+def _run_report(start, end, path, fmt, progress):
+    """Отчет на отдельном соединении (по возможности с реплики) по свежим сводкам"""
+    refresh_rollups()
+    conn = get_reporting_connection()
+    try:
+        return generate_report(conn, start, end, path, fmt, progress=progress)
+    finally:
+        conn.close()
+
+
+class ReportDialog(QDialog):
+    """Формирование отчета по ферме за период"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.worker = None
+        self.setWindowTitle("Отчет по ферме")
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+
+        start, end = previous_month(date.today())
+        form = QFormLayout()
+        self.start_edit = QDateEdit(QDate(start), self)
+        self.end_edit = QDateEdit(QDate(end - timedelta(days=1)), self)
+        for edit in (self.start_edit, self.end_edit):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("dd.MM.yyyy")
+        self.format_combo = QComboBox(self)
+        self.format_combo.addItems(list(FORMATS))
+        form.addRow("С:", self.start_edit)
+        form.addRow("По:", self.end_edit)
+        form.addRow("Формат:", self.format_combo)
+
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setVisible(False)
+
+        buttons = QHBoxLayout()
+        self.generate_button = QPushButton("Сформировать", self)
+        self.generate_button.clicked.connect(self.generate)
+        close_button = QPushButton("Закрыть", self)
+        close_button.clicked.connect(self.reject)
+        buttons.addStretch()
+        buttons.addWidget(self.generate_button)
+        buttons.addWidget(close_button)
+
+        layout.addLayout(form)
+        layout.addWidget(self.progress_bar)
+        layout.addLayout(buttons)
+
+    def generate(self):
+        start = self.start_edit.date().toPyDate()
+        end = self.end_edit.date().addDays(1).toPyDate()
+        if start >= end:
+            QMessageBox.warning(self, "Ошибка", "Начало периода должно быть не позже конца")
+            return
+
+        file_filter = self.format_combo.currentText()
+        fmt = FORMATS[file_filter]
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Сохранить отчет", f"отчет_{start:%Y_%m_%d}.{fmt}", file_filter
+        )
+        if not path:
+            return
+        if not path.lower().endswith(f".{fmt}"):
+            path += f".{fmt}"
+
+        self.generate_button.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.worker = TaskWorker(_run_report, start, end, path, fmt, progress=True)
+        self.worker.progress.connect(self.show_progress)
+        self.worker.succeeded.connect(lambda count: QMessageBox.information(
+            self, "Отчет", f"Аквариумов в отчете: {count}\n{path}"))
+        self.worker.failed.connect(lambda error: QMessageBox.critical(
+            self, "Ошибка", f"Не удалось сформировать отчет: {error}"))
+        self.worker.finished.connect(lambda: self.generate_button.setEnabled(True))
+        self.worker.finished.connect(lambda: self.progress_bar.setVisible(False))
+        self.worker.start()
+
+    def show_progress(self, done, total):
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(done)
+
+    def reject(self):
+        # Окно не закрывается, пока отчет формируется: поток держит ссылку на диалог
+        if self.worker is not None and self.worker.isRunning():
+            return
+        super().reject()
@@ -4,7 +4,7 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt
 import psycopg2
-from PyQt5.QtGui import QIcon
+from common.theme import icon
 
 class SeafoodManager(QWidget):
     def __init__(self, db_connection):
@@ -25,11 +25,11 @@ class SeafoodManager(QWidget):
         btn_layout = QHBoxLayout()
         
         self.add_btn = QPushButton('Добавить', self)
-        self.add_btn.setIcon(QIcon("icons/add.png"))
+        self.add_btn.setIcon(icon("add.png"))
         self.add_btn.clicked.connect(self.add_record)
         
         self.delete_btn = QPushButton('Удалить', self)
-        self.delete_btn.setIcon(QIcon("icons/delete.png"))
+        self.delete_btn.setIcon(icon("delete.png"))
         self.delete_btn.clicked.connect(self.delete_record)
         
         btn_layout.addWidget(self.add_btn)
@@ -42,17 +42,16 @@ class SeafoodManager(QWidget):
     def refresh_data(self):
         """Загружает данные из базы"""
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                SELECT m.seafood_id, m.название_вида, m.нормальный_вес, 
-                       m.нормальный_размер, m.тип_корма, m.норма_корма_на_одну_особь,
-                       m.уровень_смертности_группы, a.aquarium_id
-                FROM морепродукты m
-                LEFT JOIN аквариумы a ON m.aquarium_id = a.aquarium_id
-                ORDER BY m.seafood_id
-            """)
-            
-            rows = cursor.fetchall()
+            with self.db_connection.cursor() as cursor:
+                cursor.execute("""
+                    SELECT m.seafood_id, m.название_вида, m.нормальный_вес, 
+                           m.нормальный_размер, m.тип_корма, m.норма_корма_на_одну_особь,
+                           m.уровень_смертности_группы, a.aquarium_id
+                    FROM морепродукты m
+                    LEFT JOIN аквариумы a ON m.aquarium_id = a.aquarium_id
+                    ORDER BY m.seafood_id
+                """)
+                rows = cursor.fetchall()
             self.table.setRowCount(len(rows))
             self.table.setColumnCount(8)
             self.table.setHorizontalHeaderLabels([
@@ -94,38 +93,37 @@ class SeafoodManager(QWidget):
     def save_changes(self):
         """Сохраняет изменения в базе данных"""
         try:
-            cursor = self.db_connection.cursor()
-            
-            for row in range(self.table.rowCount()):
-                seafood_id = self.table.item(row, 0).text()
-                name = self.table.item(row, 1).text()
-                weight = self.table.item(row, 2).text()
-                size = self.table.item(row, 3).text()
-                food_type = self.table.item(row, 4).text()
-                food_rate = self.table.item(row, 5).text()
-                mortality = self.table.item(row, 6).text()
-                aquarium_id = self.table.item(row, 7).text()
-                
-                if seafood_id:  # Обновление существующей записи
-                    cursor.execute("""
-                        UPDATE морепродукты 
-                        SET название_вида = %s, нормальный_вес = %s, нормальный_размер = %s,
-                            тип_корма = %s, норма_корма_на_одну_особь = %s, 
-                            уровень_смертности_группы = %s, aquarium_id = %s
-                        WHERE seafood_id = %s
-                    """, (name, weight, size, food_type, food_rate, mortality, aquarium_id, seafood_id))
-                else:  # Новая запись
-                    cursor.execute("""
-                        INSERT INTO морепродукты (
-                            название_вида, нормальный_вес, нормальный_размер,
-                            тип_корма, норма_корма_на_одну_особь, 
-                            уровень_смертности_группы, aquarium_id
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        RETURNING seafood_id
-                    """, (name, weight, size, food_type, food_rate, mortality, aquarium_id))
-                    new_id = cursor.fetchone()[0]
-                    self.table.item(row, 0).setText(str(new_id))
-            
+            with self.db_connection.cursor() as cursor:
+                for row in range(self.table.rowCount()):
+                    seafood_id = self.table.item(row, 0).text()
+                    name = self.table.item(row, 1).text()
+                    weight = self.table.item(row, 2).text()
+                    size = self.table.item(row, 3).text()
+                    food_type = self.table.item(row, 4).text()
+                    food_rate = self.table.item(row, 5).text()
+                    mortality = self.table.item(row, 6).text()
+                    aquarium_id = self.table.item(row, 7).text()
+
+                    if seafood_id:  # Обновление существующей записи
+                        cursor.execute("""
+                            UPDATE морепродукты 
+                            SET название_вида = %s, нормальный_вес = %s, нормальный_размер = %s,
+                                тип_корма = %s, норма_корма_на_одну_особь = %s, 
+                                уровень_смертности_группы = %s, aquarium_id = %s
+                            WHERE seafood_id = %s
+                        """, (name, weight, size, food_type, food_rate, mortality, aquarium_id, seafood_id))
+                    else:  # Новая запись
+                        cursor.execute("""
+                            INSERT INTO морепродукты (
+                                название_вида, нормальный_вес, нормальный_размер,
+                                тип_корма, норма_корма_на_одну_особь, 
+                                уровень_смертности_группы, aquarium_id
+                            ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+                            RETURNING seafood_id
+                        """, (name, weight, size, food_type, food_rate, mortality, aquarium_id))
+                        new_id = cursor.fetchone()[0]
+                        self.table.item(row, 0).setText(str(new_id))
+
             self.db_connection.commit()
         except psycopg2.Error as e:
             self.db_connection.rollback()
@@ -5,9 +5,28 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, pyqtSignal
 import psycopg2
+from connection import get_db_connection, get_read_connection, note_write
+from common.workers import TaskWorker
+from common.export_dialog import export_table_with_dialog
+from services.health import health_grade, health_score
+from services.maintenance import update_tasks
+from services.audit import log_change
 from datetime import datetime
 
 
+def _plan_maintenance():
+    # Пересчет задач блокирует таблицу проверок и отметку сводки, поэтому
+    # выполняется в фоне на отдельном соединении с основным сервером
+    conn = get_db_connection()
+    try:
+        changed = update_tasks(conn)
+        if changed:
+            note_write(conn)
+        return changed
+    finally:
+        conn.close()
+
+
 class AddAquariumStateWidget(QWidget):
     operation_completed = pyqtSignal()
 
@@ -15,6 +34,7 @@ class AddAquariumStateWidget(QWidget):
         super().__init__()
         self.db_connection = db_connection
         self.aquarium_id = None
+        self.maintenance_worker = None  # Фоновый пересчет задач обслуживания
         self.initUI()
 
     def initUI(self):
@@ -128,11 +148,23 @@ class AddAquariumStateWidget(QWidget):
         main_layout.addWidget(self.add_button)
         main_layout.addWidget(self.table)
 
+        # Кнопка для выгрузки истории аквариума
+        self.export_button = QPushButton('Экспорт истории', self)
+        self.export_button.clicked.connect(self.export_history)
+        main_layout.addWidget(self.export_button)
+
     def set_aquarium_id(self, aquarium_id):
         """Устанавливает ID аквариума и обновляет таблицу."""
         self.aquarium_id = aquarium_id
         self.update_table()
 
+    def export_history(self):
+        """Выгружает историю выбранного аквариума в файл."""
+        if self.aquarium_id is None:
+            QMessageBox.warning(self, "Ошибка", "Аквариум не выбран.")
+            return
+        export_table_with_dialog(self, "состояние_аквариума", self.aquarium_id)
+
     def add_state(self):
         """Добавляет данные о состоянии в базу данных."""
         if self.aquarium_id is None:
@@ -148,15 +180,24 @@ class AddAquariumStateWidget(QWidget):
         overall_state = self.calculate_overall_state(filter_state, glass_state, algae_level, water_clarity)
 
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                INSERT INTO состояние_аквариума 
-                (aquarium_id, состояние_фильтра, состояние_стекла, 
-                уровень_водорослей, прозрачность_воды)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (self.aquarium_id, filter_state, glass_state, 
-                str(algae_level), str(water_clarity)))  # Преобразуем в строку для Decimal
+            with self.db_connection.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO состояние_аквариума 
+                    (aquarium_id, состояние_фильтра, состояние_стекла, 
+                    уровень_водорослей, прозрачность_воды)
+                    VALUES (%s, %s, %s, %s, %s)
+                    RETURNING aquarium_state_id
+                """, (self.aquarium_id, filter_state, glass_state, 
+                    str(algae_level), str(water_clarity)))  # Преобразуем в строку для Decimal
+                state_id = cursor.fetchone()[0]
             self.db_connection.commit()
+            note_write(self.db_connection)
+            log_change("состояние_аквариума", state_id, "INSERT", after={
+                "aquarium_id": self.aquarium_id, "состояние_фильтра": filter_state,
+                "состояние_стекла": glass_state, "уровень_водорослей": algae_level,
+                "прозрачность_воды": water_clarity,
+            })
+            self.plan_maintenance()
 
             self.update_table()
             QMessageBox.information(self, "Успех", 
@@ -170,64 +211,50 @@ class AddAquariumStateWidget(QWidget):
 
 
 
+    def plan_maintenance(self):
+        """Создает или закрывает задачи обслуживания по новой проверке в фоновом потоке."""
+        if self.maintenance_worker is not None and self.maintenance_worker.isRunning():
+            return  # Идущий пересчет учтет и эту проверку либо следующее обновление очереди
+        self.maintenance_worker = TaskWorker(_plan_maintenance)
+        # Проверка уже сохранена; задачи пересчитаются при следующем обновлении очереди
+        self.maintenance_worker.failed.connect(
+            lambda error: print(f"Не удалось пересчитать задачи обслуживания: {error}"))
+        self.maintenance_worker.start()
+
     def calculate_overall_state(self, filter_state, glass_state, algae_level, water_clarity):
         """Рассчитывает общее состояние аквариума."""
         try:
-            # Преобразуем все значения к float для вычислений
-            filter_state = float(filter_state)
-            glass_state = float(glass_state)
-            algae_level = float(algae_level)
-            water_clarity = float(water_clarity)
-            
-            score = 0.0
-            
-            # Фильтр (макс 30 баллов)
-            score += filter_state * 10
-            
-            # Стекло (макс 20 баллов)
-            score += glass_state * 10
-            
-            # Водоросли (макс 20 баллов)
-            score += max(0.0, 20.0 - (algae_level / 5.0))
-            
-            # Прозрачность (макс 30 баллов)
-            score += water_clarity * 0.3
-            
-            # Определяем уровень состояния
-            if score >= 80.0:
-                return "Отличное"
-            elif score >= 60.0:
-                return "Хорошее"
-            elif score >= 40.0:
-                return "Удовлетворительное"
-            else:
-                return "Критическое"
-                
+            return health_grade(health_score(filter_state, glass_state, algae_level, water_clarity))
         except Exception as e:
             print(f"Ошибка расчета состояния: {e}")
             return "Не определено"
 
     def update_table(self):
-        """Обновляет таблицу данными из базы только для выбранного аквариума."""
+        """Обновляет таблицу последними записями выбранного аквариума.
+
+        Вся история доступна через экспорт, поэтому таблица не растет
+        при каждом открытии формы.
+        """
         if self.aquarium_id is None:
             self.table.setRowCount(0)
             return
 
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                SELECT 
-                    aquarium_state_id, 
-                    дата_проверки,
-                    состояние_фильтра,
-                    состояние_стекла,
-                    уровень_водорослей,
-                    прозрачность_воды
-                FROM состояние_аквариума
-                WHERE aquarium_id = %s
-                ORDER BY дата_проверки DESC
-            """, (self.aquarium_id,))
-            rows = cursor.fetchall()
+            with get_read_connection(self.db_connection).cursor() as cursor:
+                cursor.execute("""
+                    SELECT 
+                        aquarium_state_id, 
+                        дата_проверки,
+                        состояние_фильтра,
+                        состояние_стекла,
+                        уровень_водорослей,
+                        прозрачность_воды
+                    FROM состояние_аквариума
+                    WHERE aquarium_id = %s
+                    ORDER BY дата_проверки DESC
+                    LIMIT 50
+                """, (self.aquarium_id,))
+                rows = cursor.fetchall()
 
             self.table.setRowCount(len(rows))
             for i, row in enumerate(rows):
@@ -5,6 +5,9 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, QDate
 import psycopg2
+from connection import get_read_connection, note_write
+from common.export_dialog import export_table_with_dialog
+from services.audit import log_change
 from PyQt5.QtCore import pyqtSignal
 from datetime import datetime
 
@@ -66,26 +69,38 @@ class AddFeedingWidget(QWidget):
         main_layout.addWidget(self.add_button)
         main_layout.addWidget(self.table)
 
+        # Кнопка для выгрузки истории аквариума
+        self.export_button = QPushButton('Экспорт истории', self)
+        self.export_button.clicked.connect(self.export_history)
+        main_layout.addWidget(self.export_button)
+
     def set_aquarium_id(self, aquarium_id):
         """Устанавливает ID аквариума и обновляет таблицу."""
         self.aquarium_id = aquarium_id
         self.load_seafood_info()
         self.update_table()
 
+    def export_history(self):
+        """Выгружает историю выбранного аквариума в файл."""
+        if self.aquarium_id is None:
+            QMessageBox.warning(self, "Ошибка", "Аквариум не выбран.")
+            return
+        export_table_with_dialog(self, "кормления", self.aquarium_id)
+
     def load_seafood_info(self):
         """Загружает информацию о морепродукте в аквариуме"""
         if self.aquarium_id is None:
             return
 
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                SELECT seafood_id, название_вида 
-                FROM морепродукты 
-                WHERE aquarium_id = %s
-            """, (self.aquarium_id,))
+            with get_read_connection(self.db_connection).cursor() as cursor:
+                cursor.execute("""
+                    SELECT seafood_id, название_вида 
+                    FROM морепродукты 
+                    WHERE aquarium_id = %s
+                """, (self.aquarium_id,))
             
-            seafood_data = cursor.fetchone()
+                seafood_data = cursor.fetchone()
             if seafood_data:
                 self.seafood_id = seafood_data[0]
                 self.seafood_name = seafood_data[1]
@@ -115,13 +130,20 @@ class AddFeedingWidget(QWidget):
         total_feed = self.total_feed_spinbox.value()
 
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                INSERT INTO кормления 
-                (aquarium_id, seafood_id, дата_кормления, тип_корма, общий_объем_корма)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (self.aquarium_id, self.seafood_id, feed_date, food_type, total_feed))
+            with self.db_connection.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO кормления 
+                    (aquarium_id, seafood_id, дата_кормления, тип_корма, общий_объем_корма)
+                    VALUES (%s, %s, %s, %s, %s)
+                    RETURNING feeding_id
+                """, (self.aquarium_id, self.seafood_id, feed_date, food_type, total_feed))
+                feeding_id = cursor.fetchone()[0]
             self.db_connection.commit()
+            note_write(self.db_connection)
+            log_change("кормления", feeding_id, "INSERT", after={
+                "aquarium_id": self.aquarium_id, "seafood_id": self.seafood_id,
+                "дата_кормления": feed_date, "тип_корма": food_type, "общий_объем_корма": total_feed,
+            })
 
             # Обновляем таблицу
             self.update_table()
@@ -139,26 +161,31 @@ class AddFeedingWidget(QWidget):
             QMessageBox.critical(self, "Ошибка", f"Неизвестная ошибка: {e}")
 
     def update_table(self):
-        """Обновляет таблицу данными из базы только для выбранного аквариума."""
+        """Обновляет таблицу последними записями выбранного аквариума.
+
+        Вся история доступна через экспорт, поэтому таблица не растет
+        при каждом открытии формы.
+        """
         if self.aquarium_id is None:
             self.table.setRowCount(0)
             return
 
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                SELECT 
-                    k.feeding_id, 
-                    k.дата_кормления, 
-                    k.тип_корма, 
-                    k.общий_объем_корма,
-                    m.название_вида
-                FROM кормления k
-                JOIN морепродукты m ON k.seafood_id = m.seafood_id
-                WHERE k.aquarium_id = %s
-                ORDER BY k.дата_кормления DESC
-            """, (self.aquarium_id,))
-            rows = cursor.fetchall()
+            with get_read_connection(self.db_connection).cursor() as cursor:
+                cursor.execute("""
+                    SELECT 
+                        k.feeding_id, 
+                        k.дата_кормления, 
+                        k.тип_корма, 
+                        k.общий_объем_корма,
+                        m.название_вида
+                    FROM кормления k
+                    JOIN морепродукты m ON k.seafood_id = m.seafood_id
+                    WHERE k.aquarium_id = %s
+                    ORDER BY k.дата_кормления DESC
+                    LIMIT 50
+                """, (self.aquarium_id,))
+                rows = cursor.fetchall()
 
             self.table.setRowCount(len(rows))
             for i, row in enumerate(rows):
@@ -5,6 +5,9 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, pyqtSignal
 import psycopg2
+from connection import get_read_connection, note_write
+from common.export_dialog import export_table_with_dialog
+from services.audit import log_change
 from datetime import datetime
 
 
@@ -81,25 +84,37 @@ class AddSpeciesStateWidget(QWidget):
         main_layout.addWidget(self.add_button)
         main_layout.addWidget(self.table)
 
+        # Кнопка для выгрузки истории аквариума
+        self.export_button = QPushButton('Экспорт истории', self)
+        self.export_button.clicked.connect(self.export_history)
+        main_layout.addWidget(self.export_button)
+
     def set_aquarium_id(self, aquarium_id):
         """Устанавливает ID аквариума и загружает seafood_id"""
         self.aquarium_id = aquarium_id
         self.load_seafood_info()
         self.update_table()
 
+    def export_history(self):
+        """Выгружает историю выбранного аквариума в файл."""
+        if self.aquarium_id is None:
+            QMessageBox.warning(self, "Ошибка", "Аквариум не выбран.")
+            return
+        export_table_with_dialog(self, "состояние_особей", self.aquarium_id)
+
     def load_seafood_info(self):
         """Загружает информацию о морепродукте в аквариуме"""
         if self.aquarium_id is None:
             return
 
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                SELECT seafood_id FROM морепродукты 
-                WHERE aquarium_id = %s LIMIT 1
-            """, (self.aquarium_id,))
+            with get_read_connection(self.db_connection).cursor() as cursor:
+                cursor.execute("""
+                    SELECT seafood_id FROM морепродукты 
+                    WHERE aquarium_id = %s LIMIT 1
+                """, (self.aquarium_id,))
             
-            result = cursor.fetchone()
+                result = cursor.fetchone()
             if result:
                 self.seafood_id = result[0]
             else:
@@ -132,20 +147,29 @@ class AddSpeciesStateWidget(QWidget):
             return
 
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                INSERT INTO состояние_особей (
-                    aquarium_id, seafood_id, 
-                    общее_количество, количество_с_повреждениями,
-                    количество_с_аномальным_поведением, количество_умерших,
-                    средний_текущий_размер, средний_текущий_вес
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                self.aquarium_id, self.seafood_id,
-                total, damaged, abnormal, dead,
-                avg_size, avg_weight
-            ))
+            with self.db_connection.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO состояние_особей (
+                        aquarium_id, seafood_id, 
+                        общее_количество, количество_с_повреждениями,
+                        количество_с_аномальным_поведением, количество_умерших,
+                        средний_текущий_размер, средний_текущий_вес
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING health_id
+                """, (
+                    self.aquarium_id, self.seafood_id,
+                    total, damaged, abnormal, dead,
+                    avg_size, avg_weight
+                ))
+                health_id = cursor.fetchone()[0]
             self.db_connection.commit()
+            note_write(self.db_connection)
+            log_change("состояние_особей", health_id, "INSERT", after={
+                "aquarium_id": self.aquarium_id, "seafood_id": self.seafood_id,
+                "общее_количество": total, "количество_с_повреждениями": damaged,
+                "количество_с_аномальным_поведением": abnormal, "количество_умерших": dead,
+                "средний_текущий_размер": avg_size, "средний_текущий_вес": avg_weight,
+            })
 
             # Обновляем таблицу и очищаем поля
             self.update_table()
@@ -177,20 +201,20 @@ class AddSpeciesStateWidget(QWidget):
             return
 
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                SELECT 
-                    health_id, дата_замера,
-                    общее_количество, количество_с_повреждениями,
-                    количество_с_аномальным_поведением, количество_умерших,
-                    средний_текущий_размер, средний_текущий_вес
-                FROM состояние_особей
-                WHERE aquarium_id = %s AND seafood_id = %s
-                ORDER BY дата_замера DESC
-                LIMIT 50
-            """, (self.aquarium_id, self.seafood_id))
+            with get_read_connection(self.db_connection).cursor() as cursor:
+                cursor.execute("""
+                    SELECT 
+                        health_id, дата_замера,
+                        общее_количество, количество_с_повреждениями,
+                        количество_с_аномальным_поведением, количество_умерших,
+                        средний_текущий_размер, средний_текущий_вес
+                    FROM состояние_особей
+                    WHERE aquarium_id = %s AND seafood_id = %s
+                    ORDER BY дата_замера DESC
+                    LIMIT 50
+                """, (self.aquarium_id, self.seafood_id))
             
-            rows = cursor.fetchall()
+                rows = cursor.fetchall()
             self.table.setRowCount(len(rows))
 
             for i, row in enumerate(rows):
@@ -3,17 +3,61 @@ from PyQt5.QtWidgets import (
     QPushButton, QTableWidget, QTableWidgetItem, QMessageBox
 )
 from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
 import psycopg2
+from connection import get_db_connection, get_read_connection, note_write
+from common.workers import TaskWorker
+from common.export_dialog import export_table_with_dialog
+from services.anomaly import PARAMETERS, PARAMETER_TITLES, fetch_anomalies, process_new_readings
+from services.rollups import daily_water_parameters, refresh_rollup
+from services import cold_storage
+from operational.live_chart import LiveWaterChart
+from services.audit import log_change
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from datetime import datetime
 
+# Цвет ячеек с аномальными показаниями
+ANOMALY_COLOR = QColor(255, 200, 200)
+# Столбцы таблицы с отслеживаемыми параметрами
+PARAMETER_COLUMNS = {2: "температура", 3: "ph", 4: "уровень_кислорода"}
+# При большем числе показаний график строится по суточной сводке
+RAW_POINTS_LIMIT = 2000
+
+
+def _load_daily(aquarium_id):
+    # Обновление сводки ждет блокировку таблицы показаний (за записью датчиков)
+    # и в первый раз может свернуть всю историю, поэтому выполняется в фоне
+    # на отдельном соединении с основным сервером
+    conn = get_db_connection()
+    try:
+        refresh_rollup(conn, "параметры_воды")
+        return daily_water_parameters(conn, aquarium_id)
+    finally:
+        conn.close()
+
+
+def _detect_anomalies(aquarium_id):
+    # Детектор блокирует таблицу показаний (в режиме SHARE, за записью датчиков),
+    # поэтому работает в фоне на отдельном соединении с основным сервером
+    conn = get_db_connection()
+    try:
+        found = process_new_readings(conn, [aquarium_id])
+        if found:
+            note_write(conn)
+        return found
+    finally:
+        conn.close()
+
 
 class AddWaterParametersWidget(QWidget):
     def __init__(self, db_connection):
         super().__init__()
         self.db_connection = db_connection
         self.aquarium_id = None  # Инициализируем переменную для хранения ID аквариума
+        self.live_chart = None  # Окно графика в реальном времени
+        self.daily_worker = None  # Фоновая подготовка суточного графика
+        self.anomaly_worker = None  # Фоновая проверка новых показаний на аномалии
         self.initUI()
 
     def initUI(self):
@@ -45,6 +89,8 @@ class AddWaterParametersWidget(QWidget):
         # Кнопка для показа графика
         self.show_graph_button = QPushButton('Показать график', self)
         self.show_graph_button.clicked.connect(self.show_graph)
+        self.live_graph_button = QPushButton('График в реальном времени', self)
+        self.live_graph_button.clicked.connect(self.show_live_graph)
 
         # Добавляем виджеты в лейаут
         main_layout.addWidget(self.temperature_slider)
@@ -53,6 +99,12 @@ class AddWaterParametersWidget(QWidget):
         main_layout.addWidget(self.add_button)
         main_layout.addWidget(self.table)
         main_layout.addWidget(self.show_graph_button)
+        main_layout.addWidget(self.live_graph_button)
+
+        # Кнопка для выгрузки истории аквариума
+        self.export_button = QPushButton('Экспорт истории', self)
+        self.export_button.clicked.connect(self.export_history)
+        main_layout.addWidget(self.export_button)
 
     def create_slider(self, label_text, min_value, max_value, default_value):
         """Создает слайдер с меткой."""
@@ -85,6 +137,15 @@ class AddWaterParametersWidget(QWidget):
         """Устанавливает ID аквариума и обновляет таблицу."""
         self.aquarium_id = aquarium_id
         self.update_table()
+        if self.live_chart is not None and self.live_chart.isVisible():
+            self.live_chart.set_aquarium_id(aquarium_id)
+
+    def export_history(self):
+        """Выгружает историю выбранного аквариума в файл."""
+        if self.aquarium_id is None:
+            QMessageBox.warning(self, "Ошибка", "Аквариум не выбран.")
+            return
+        export_table_with_dialog(self, "параметры_воды", self.aquarium_id)
 
     def add_data(self):
         """Добавляет данные в таблицу и базу данных."""
@@ -97,16 +158,26 @@ class AddWaterParametersWidget(QWidget):
         oxygen = self.oxygen_slider.findChild(QDoubleSpinBox).value()
 
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                INSERT INTO параметры_воды 
-                (aquarium_id, температура, pH, уровень_кислорода)
-                VALUES (%s, %s, %s, %s)
-            """, (self.aquarium_id, temperature, ph, oxygen))
+            with self.db_connection.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO параметры_воды 
+                    (aquarium_id, температура, pH, уровень_кислорода)
+                    VALUES (%s, %s, %s, %s)
+                    RETURNING parameter_id
+                """, (self.aquarium_id, temperature, ph, oxygen))
+                parameter_id = cursor.fetchone()[0]
             self.db_connection.commit()
-
-            # Обновляем таблицу
+            note_write(self.db_connection)
+            log_change("параметры_воды", parameter_id, "INSERT", after={
+                "aquarium_id": self.aquarium_id, "температура": temperature,
+                "ph": ph, "уровень_кислорода": oxygen,
+            })
+            self.detect_anomalies()
+
+            # Обновляем таблицу и открытый график в реальном времени
             self.update_table()
+            if self.live_chart is not None and self.live_chart.isVisible():
+                self.live_chart.poll()
             QMessageBox.information(self, "Успех", "Данные успешно добавлены!")
         except psycopg2.Error as e:
             self.db_connection.rollback()
@@ -114,26 +185,46 @@ class AddWaterParametersWidget(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Неизвестная ошибка: {e}")
 
+    def detect_anomalies(self):
+        """Прогоняет новые показания аквариума через детектор аномалий в фоновом потоке."""
+        if self.anomaly_worker is not None and self.anomaly_worker.isRunning():
+            return  # Идущая проверка обработает и эти показания при следующем добавлении
+        aquarium_id = self.aquarium_id
+        self.anomaly_worker = TaskWorker(_detect_anomalies, aquarium_id)
+        # Найденные аномалии подсвечиваем, если аквариум все еще выбран
+        self.anomaly_worker.succeeded.connect(
+            lambda found: self.update_table() if found and self.aquarium_id == aquarium_id else None)
+        # Показания уже сохранены; аномалии будут найдены при следующем запуске
+        self.anomaly_worker.failed.connect(
+            lambda error: print(f"Не удалось проверить показания на аномалии: {error}"))
+        self.anomaly_worker.start()
+
     def update_table(self):
-        """Обновляет таблицу данными из базы только для выбранного аквариума."""
+        """Обновляет таблицу последними записями выбранного аквариума.
+
+        Вся история доступна через экспорт, поэтому таблица не растет
+        при каждом открытии формы.
+        """
         if self.aquarium_id is None:
             self.table.setRowCount(0)  # Очищаем таблицу, если аквариум не выбран
             return
 
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                SELECT 
-                    parameter_id, 
-                    дата_измерения, 
-                    температура, 
-                    pH, 
-                    уровень_кислорода
-                FROM параметры_воды
-                WHERE aquarium_id = %s
-                ORDER BY дата_измерения DESC
-            """, (self.aquarium_id,))
-            rows = cursor.fetchall()
+            with get_read_connection(self.db_connection).cursor() as cursor:
+                cursor.execute("""
+                    SELECT 
+                        parameter_id, 
+                        дата_измерения, 
+                        температура, 
+                        pH, 
+                        уровень_кислорода
+                    FROM параметры_воды
+                    WHERE aquarium_id = %s
+                    ORDER BY дата_измерения DESC
+                    LIMIT 200
+                """, (self.aquarium_id,))
+                rows = cursor.fetchall()
+            anomalies = fetch_anomalies(get_read_connection(self.db_connection), self.aquarium_id)
 
             self.table.setRowCount(len(rows))
             for i, row in enumerate(rows):
@@ -145,12 +236,27 @@ class AddWaterParametersWidget(QWidget):
                         item = QTableWidgetItem(str(col))
                     
                     item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+                    # Подсвечиваем аномальные показания
+                    sigmas = anomalies.get(row[0], {}).get(PARAMETER_COLUMNS.get(j))
+                    if sigmas is not None:
+                        item.setBackground(ANOMALY_COLOR)
+                        item.setToolTip(f"Аномалия: отклонение {sigmas:.1f}σ от ожидаемого")
                     self.table.setItem(i, j, item)
         except psycopg2.Error as e:
             QMessageBox.critical(self, "Ошибка базы данных", f"Не удалось загрузить данные: {e}")
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Неизвестная ошибка: {e}")
 
+    def show_daily_graph(self):
+        """Строит суточный график по сводке после ее обновления в фоновом потоке"""
+        if self.daily_worker is not None and self.daily_worker.isRunning():
+            return  # График уже готовится
+        self.daily_worker = TaskWorker(_load_daily, self.aquarium_id)
+        self.daily_worker.succeeded.connect(self.plot_daily)
+        self.daily_worker.failed.connect(lambda error: QMessageBox.critical(
+            self, "Ошибка базы данных", f"Не удалось получить данные: {error}"))
+        self.daily_worker.start()
+
     def show_graph(self):
         """Открывает окно с графиком изменения параметров для выбранного аквариума."""
         if self.aquarium_id is None:
@@ -158,18 +264,38 @@ class AddWaterParametersWidget(QWidget):
             return
 
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("""
-                SELECT 
-                    дата_измерения, 
-                    температура, 
-                    pH, 
-                    уровень_кислорода
-                FROM параметры_воды
-                WHERE aquarium_id = %s
-                ORDER BY дата_измерения
-            """, (self.aquarium_id,))
-            data = cursor.fetchall()
+            read_connection = get_read_connection(self.db_connection)
+            with read_connection.cursor() as cursor:
+                cursor.execute("SELECT count(*) FROM параметры_воды WHERE aquarium_id = %s", (self.aquarium_id,))
+                hot_count = cursor.fetchone()[0]
+            archived_count = cold_storage.archived_count(read_connection, "параметры_воды", self.aquarium_id)
+            if hot_count + archived_count > RAW_POINTS_LIMIT:
+                # Длинная история: строим суточные значения по сводке, а не по всем показаниям.
+                # Сводка содержит и дни, перенесенные в холодный архив.
+                self.show_daily_graph()
+                return
+
+            with read_connection.cursor() as cursor:
+                cursor.execute("""
+                    SELECT 
+                        дата_измерения, 
+                        температура, 
+                        pH, 
+                        уровень_кислорода,
+                        parameter_id
+                    FROM параметры_воды
+                    WHERE aquarium_id = %s
+                    ORDER BY дата_измерения
+                """, (self.aquarium_id,))
+                data = cursor.fetchall()
+            if archived_count:
+                # Старые показания читаем из файлов холодного архива
+                data = [*cold_storage.read_archived_rows(
+                    read_connection, "параметры_воды",
+                    ["дата_измерения", "температура", "ph", "уровень_кислорода", "parameter_id"],
+                    self.aquarium_id
+                ), *data]
+            anomalies = fetch_anomalies(read_connection, self.aquarium_id)
 
             if not data:
                 QMessageBox.information(self, "Информация", "Нет данных для построения графика.")
@@ -196,10 +322,55 @@ class AddWaterParametersWidget(QWidget):
             ax[2].set_ylabel("Уровень кислорода")
             ax[2].grid(True)
 
+            # Отмечаем аномальные показания
+            for k, name in enumerate(PARAMETERS):
+                points = [(row[0], row[k + 1]) for row in data if name in anomalies.get(row[4], {})]
+                if points:
+                    ax[k].scatter(*zip(*points), color="black", marker="x", zorder=3,
+                                  label=f"Аномалии ({PARAMETER_TITLES[name]})")
+                    ax[k].legend()
+
             plt.tight_layout()
             plt.show()
 
         except psycopg2.Error as e:
+            self.db_connection.rollback()
             QMessageBox.critical(self, "Ошибка базы данных", f"Не удалось получить данные: {e}")
         except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось построить график: {e}")
\ No newline at end of file
+            QMessageBox.critical(self, "Ошибка", f"Не удалось построить график: {e}")
+
+    def show_live_graph(self):
+        """Открывает график, дополняемый новыми показаниями без полной перерисовки."""
+        if self.aquarium_id is None:
+            QMessageBox.warning(self, "Ошибка", "Аквариум не выбран.")
+            return
+        if self.live_chart is None:
+            self.live_chart = LiveWaterChart(self.aquarium_id, self)
+        else:
+            self.live_chart.set_aquarium_id(self.aquarium_id)
+        self.live_chart.show()
+        self.live_chart.raise_()
+
+    def plot_daily(self, rows):
+        """График суточных средних с полосой от минимума до максимума."""
+        if not rows:
+            QMessageBox.information(self, "Информация", "Нет данных для построения графика.")
+            return
+
+        days = [row[0] for row in rows]
+        fig, ax = plt.subplots(3, 1, figsize=(10, 8))
+        fig.suptitle(f"Параметры воды для аквариума {self.aquarium_id} (по суткам)")
+
+        series = [("Температура", "red"), ("pH", "blue"), ("Уровень кислорода", "green")]
+        for k, (title, color) in enumerate(series):
+            average = [float(row[1 + 3 * k]) for row in rows]
+            low = [float(row[2 + 3 * k]) for row in rows]
+            high = [float(row[3 + 3 * k]) for row in rows]
+            ax[k].plot(days, average, color=color, label="Среднее за сутки")
+            ax[k].fill_between(days, low, high, color=color, alpha=0.2, label="Минимум - максимум")
+            ax[k].set_ylabel(title)
+            ax[k].grid(True)
+            ax[k].legend()
+
+        plt.tight_layout()
+        plt.show()
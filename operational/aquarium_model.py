@@ -0,0 +1,98 @@
+from datetime import datetime
+from decimal import Decimal
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+import psycopg2
+from connection import get_read_connection
+from services.aquariums import AQUARIUM_COLUMNS, fetch_aquariums
+
+
+class AquariumTableModel(QAbstractTableModel):
+    """Модель списка аквариумов с постраничной подгрузкой и сортировкой в базе данных.
+
+    Значения хранятся в исходных типах, поэтому объем и даты сравниваются
+    как числа и даты, а не как строки.
+    """
+    load_failed = pyqtSignal(str)
+    BATCH_SIZE = 200
+
+    def __init__(self, db_connection, parent=None):
+        super().__init__(parent)
+        self.db_connection = db_connection
+        self.rows = []
+        self.has_more = False
+        self.sort_column = 0
+        self.sort_order = Qt.AscendingOrder
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(AQUARIUM_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return AQUARIUM_COLUMNS[section][0]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self.rows[index.row()][index.column()]
+
+        if role == Qt.DisplayRole:
+            if value is None:
+                return "Нет данных"
+            if isinstance(value, datetime):
+                return value.strftime("%Y-%m-%d %H:%M")
+            return str(value)
+        if role == Qt.UserRole:
+            return value
+        if role == Qt.TextAlignmentRole and isinstance(value, (int, float, Decimal)):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def aquarium_id(self, row):
+        return self.rows[row][0]
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        """Подгружает следующую порцию строк при прокрутке"""
+        try:
+            batch = self._fetch(len(self.rows))
+        except psycopg2.Error as e:
+            self.has_more = False
+            self.load_failed.emit(str(e))
+            return
+        if batch:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(batch) - 1)
+            self.rows.extend(batch)
+            self.endInsertRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Сортировка выполняется запросом ORDER BY, а не на клиенте"""
+        self.sort_column = column
+        self.sort_order = order
+        self.refresh()
+
+    def refresh(self):
+        """Перечитывает первую порцию строк с текущей сортировкой"""
+        self.beginResetModel()
+        try:
+            self.rows = self._fetch(0)
+        except psycopg2.Error as e:
+            self.rows = []
+            self.has_more = False
+            self.load_failed.emit(str(e))
+        finally:
+            self.endResetModel()
+
+    def _fetch(self, offset):
+        batch = fetch_aquariums(
+            get_read_connection(self.db_connection), self.sort_column,
+            self.sort_order == Qt.DescendingOrder, self.BATCH_SIZE, offset
+        )
+        self.has_more = len(batch) == self.BATCH_SIZE
+        return batch
@@ -0,0 +1,168 @@
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QListWidget, QListWidgetItem, QComboBox,
+    QDateEdit, QPushButton, QRadioButton, QSplitter, QMessageBox
+)
+from PyQt5.QtCore import Qt, QDate
+import psycopg2
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from connection import get_db_connection, get_read_connection, get_reporting_connection, note_write
+from common.workers import TaskWorker
+from services.comparison import fetch_comparison, uses_rollup
+from services.rollups import refresh_rollup
+
+PLOTS = [("Температура (°C)", 1), ("pH", 2), ("Уровень кислорода (mg/L)", 3)]
+
+
+def _load_comparison(start, end, aquarium_ids, species):
+    if uses_rollup(start, end):
+        # Без обновления в сводке не было бы последних дней периода. Позиция
+        # журнала после обновления запоминается: сводка читается с реплики,
+        # только если та уже воспроизвела запись, иначе с основного сервера
+        primary = get_db_connection()
+        try:
+            refresh_rollup(primary, "параметры_воды")
+            note_write(primary)
+        finally:
+            primary.close()
+    conn = get_reporting_connection()
+    try:
+        return fetch_comparison(conn, start, end, aquarium_ids, species)
+    finally:
+        conn.close()
+
+
+class ComparisonWindow(QWidget):
+    """Сравнение параметров воды нескольких аквариумов на одном встроенном графике"""
+
+    def __init__(self, db_connection, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.db_connection = db_connection
+        self.worker = None
+        self.setWindowTitle("Сравнение аквариумов")
+        self.resize(1200, 800)
+        self.initUI()
+        self.load_choices()
+
+    def initUI(self):
+        main_layout = QHBoxLayout(self)
+        splitter = QSplitter(Qt.Horizontal, self)
+
+        # Выбор аквариумов и периода
+        controls = QWidget(self)
+        controls_layout = QVBoxLayout(controls)
+
+        self.by_aquarium = QRadioButton("Выбранные аквариумы", controls)
+        self.by_aquarium.setChecked(True)
+        self.aquarium_list = QListWidget(controls)
+        self.by_species = QRadioButton("Все аквариумы с видом", controls)
+        self.species_combo = QComboBox(controls)
+
+        self.start_edit = QDateEdit(QDate.currentDate().addDays(-7), controls)
+        self.end_edit = QDateEdit(QDate.currentDate(), controls)
+        for edit in (self.start_edit, self.end_edit):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("yyyy-MM-dd")
+
+        self.plot_button = QPushButton("Построить", controls)
+        self.plot_button.clicked.connect(self.plot)
+
+        controls_layout.addWidget(self.by_aquarium)
+        controls_layout.addWidget(self.aquarium_list)
+        controls_layout.addWidget(self.by_species)
+        controls_layout.addWidget(self.species_combo)
+        controls_layout.addWidget(QLabel("С:", controls))
+        controls_layout.addWidget(self.start_edit)
+        controls_layout.addWidget(QLabel("По (включительно):", controls))
+        controls_layout.addWidget(self.end_edit)
+        controls_layout.addWidget(self.plot_button)
+
+        # Холст создается один раз; при каждом построении перерисовываются только оси
+        self.figure = Figure(figsize=(10, 8))
+        self.canvas = FigureCanvas(self.figure)
+        self.axes = self.figure.subplots(3, 1, sharex=True)
+
+        splitter.addWidget(controls)
+        splitter.addWidget(self.canvas)
+        splitter.setStretchFactor(1, 1)
+        main_layout.addWidget(splitter)
+
+    def load_choices(self):
+        """Заполняет списки аквариумов и видов"""
+        try:
+            with get_read_connection(self.db_connection).cursor() as cursor:
+                cursor.execute("SELECT aquarium_id, тип_аквариума FROM аквариумы ORDER BY aquarium_id")
+                aquariums = cursor.fetchall()
+                cursor.execute("""
+                    SELECT DISTINCT название_вида FROM морепродукты
+                    WHERE название_вида IS NOT NULL AND aquarium_id IS NOT NULL
+                    ORDER BY 1
+                """)
+                species = [row[0] for row in cursor.fetchall()]
+        except psycopg2.Error as e:
+            QMessageBox.critical(self, "Ошибка базы данных", f"Не удалось загрузить данные: {e}")
+            return
+
+        for aquarium_id, aquarium_type in aquariums:
+            item = QListWidgetItem(f"Аквариум {aquarium_id} ({aquarium_type})")
+            item.setData(Qt.UserRole, aquarium_id)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Unchecked)
+            self.aquarium_list.addItem(item)
+        self.species_combo.addItems(species)
+
+    def checked_aquariums(self):
+        return [
+            self.aquarium_list.item(i).data(Qt.UserRole)
+            for i in range(self.aquarium_list.count())
+            if self.aquarium_list.item(i).checkState() == Qt.Checked
+        ]
+
+    def plot(self):
+        start = self.start_edit.date().toPyDate()
+        end = self.end_edit.date().addDays(1).toPyDate()
+        if start >= end:
+            QMessageBox.warning(self, "Ошибка", "Начало периода позже его конца.")
+            return
+
+        aquarium_ids, species = None, None
+        if self.by_species.isChecked():
+            species = self.species_combo.currentText()
+            if not species:
+                QMessageBox.warning(self, "Ошибка", "Выберите вид.")
+                return
+        else:
+            aquarium_ids = self.checked_aquariums()
+            if not aquarium_ids:
+                QMessageBox.warning(self, "Ошибка", "Отметьте хотя бы один аквариум.")
+                return
+
+        self.plot_button.setEnabled(False)
+        self.worker = TaskWorker(_load_comparison, start, end, aquarium_ids, species)
+        self.worker.succeeded.connect(self.draw)
+        self.worker.failed.connect(lambda error: QMessageBox.critical(
+            self, "Ошибка", f"Не удалось получить данные: {error}"))
+        self.worker.finished.connect(lambda: self.plot_button.setEnabled(True))
+        self.worker.start()
+
+    def draw(self, series):
+        for ax, (title, _) in zip(self.axes, PLOTS):
+            ax.clear()
+            ax.set_ylabel(title)
+            ax.grid(True)
+
+        if not series:
+            self.axes[0].set_title("Нет данных за выбранный период")
+        for aquarium_id, values in sorted(series.items()):
+            for ax, (_, index) in zip(self.axes, PLOTS):
+                ax.plot(values[0], values[index], label=f"Аквариум {aquarium_id}")
+        if series:
+            self.axes[0].legend(loc="upper left", fontsize="small", ncol=4)
+
+        self.figure.autofmt_xdate()
+        self.canvas.draw_idle()
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.wait()
+        super().closeEvent(event)
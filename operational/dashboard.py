@@ -0,0 +1,200 @@
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QFrame, QScrollArea, QShortcut
+)
+from PyQt5.QtCore import Qt, QTimer, QTime, QPointF
+from PyQt5.QtGui import QPainter, QPen, QColor, QPixmap, QPixmapCache, QPolygonF, QKeySequence
+from connection import get_reporting_connection
+from common.workers import TaskWorker
+from services.anomaly import PARAMETERS, PARAMETER_TITLES
+from services.dashboard import fetch_dashboard
+
+REFRESH_INTERVAL = 60 * 1000  # Обновление панели, миллисекунды
+TILE_COLUMNS = 4
+SPARKLINE_WIDTH = 160
+SPARKLINE_HEIGHT = 32
+
+SPARKLINE_COLORS = {
+    "температура": QColor("red"),
+    "ph": QColor("blue"),
+    "уровень_кислорода": QColor("green"),
+}
+GRADE_COLORS = {
+    "Отличное": "#2e7d32",
+    "Хорошее": "#558b2f",
+    "Удовлетворительное": "#f9a825",
+    "Критическое": "#c62828",
+}
+
+
+def sparkline_pixmap(values, color, width=SPARKLINE_WIDTH, height=SPARKLINE_HEIGHT):
+    """Рисует мини-график. Готовые изображения берутся из QPixmapCache,
+    поэтому при обновлении перерисовываются только изменившиеся ряды."""
+    key = f"sparkline:{color.name()}:{width}x{height}:{hash(values)}"
+    pixmap = QPixmapCache.find(key)
+    if pixmap is not None and not pixmap.isNull():
+        return pixmap
+
+    pixmap = QPixmap(width, height)
+    pixmap.fill(Qt.transparent)
+    if len(values) > 1:
+        low, high = min(values), max(values)
+        span = (high - low) or 1.0
+        step = (width - 4) / (len(values) - 1)
+        points = QPolygonF([
+            QPointF(2 + i * step, height - 2 - (value - low) / span * (height - 4))
+            for i, value in enumerate(values)
+        ])
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(color, 1.5))
+        painter.drawPolyline(points)
+        # Последнее показание выделяем точкой
+        painter.setBrush(color)
+        painter.drawEllipse(points[points.size() - 1], 2, 2)
+        painter.end()
+    QPixmapCache.insert(key, pixmap)
+    return pixmap
+
+
+def _load_dashboard():
+    """Читает сводку на отдельном соединении (по возможности с реплики)"""
+    conn = get_reporting_connection()
+    try:
+        return fetch_dashboard(conn)
+    finally:
+        conn.close()
+
+
+class AquariumTile(QFrame):
+    """Плитка аквариума: оценка состояния и мини-графики параметров воды"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setObjectName("aquarium_tile")
+        self.setFrameShape(QFrame.StyledPanel)
+        layout = QVBoxLayout(self)
+
+        self.title_label = QLabel(self)
+        self.title_label.setStyleSheet("font-weight: bold;")
+        self.species_label = QLabel(self)
+        self.grade_label = QLabel(self)
+        layout.addWidget(self.title_label)
+        layout.addWidget(self.species_label)
+        layout.addWidget(self.grade_label)
+
+        self.sparklines = {}
+        self.values = {}
+        for name in PARAMETERS:
+            row = QHBoxLayout()
+            row.addWidget(QLabel(PARAMETER_TITLES[name], self))
+            sparkline = QLabel(self)
+            sparkline.setFixedSize(SPARKLINE_WIDTH, SPARKLINE_HEIGHT)
+            value_label = QLabel(self)
+            value_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            row.addWidget(sparkline)
+            row.addWidget(value_label)
+            layout.addLayout(row)
+            self.sparklines[name] = sparkline
+            self.values[name] = value_label
+
+    def update_snapshot(self, snapshot):
+        self.title_label.setText(
+            f"Аквариум {snapshot.aquarium_id} — {snapshot.aquarium_type} ({snapshot.status})")
+        self.species_label.setText(snapshot.species or "Без морепродуктов")
+        if snapshot.score is None:
+            self.grade_label.setText(snapshot.grade)
+            self.grade_label.setStyleSheet("")
+        else:
+            self.grade_label.setText(f"Состояние: {snapshot.grade} ({snapshot.score:.0f} баллов)")
+            self.grade_label.setStyleSheet(f"color: {GRADE_COLORS[snapshot.grade]};")
+
+        for name, values in snapshot.series.items():
+            self.sparklines[name].setPixmap(sparkline_pixmap(values, SPARKLINE_COLORS[name]))
+            self.values[name].setText(f"{values[-1]:.2f}" if values else "—")
+
+
+class FarmDashboard(QWidget):
+    """Панель всей фермы для настенного экрана. Обновляется раз в минуту одним запросом."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle("Панель фермы")
+        self.resize(1400, 900)
+        self.tiles = {}
+        self.placed = set()  # Аквариумы, плитки которых уже размещены в сетке
+        self.worker = None
+
+        main_layout = QVBoxLayout(self)
+        self.status_label = QLabel("Загрузка...", self)
+        main_layout.addWidget(self.status_label)
+
+        scroll = QScrollArea(self)
+        scroll.setWidgetResizable(True)
+        container = QWidget(scroll)
+        self.grid = QGridLayout(container)
+        self.grid.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        scroll.setWidget(container)
+        main_layout.addWidget(scroll)
+
+        # F11 - полноэкранный режим для киоска
+        QShortcut(QKeySequence("F11"), self, self.toggle_full_screen)
+
+        # Таймер запускается при показе окна и останавливается при закрытии
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL)
+        self.timer.timeout.connect(self.refresh)
+
+    def toggle_full_screen(self):
+        if self.isFullScreen():
+            self.showNormal()
+        else:
+            self.showFullScreen()
+
+    def refresh(self):
+        if self.worker is not None and self.worker.isRunning():
+            return  # Предыдущее обновление еще не завершилось
+        self.worker = TaskWorker(_load_dashboard)
+        self.worker.succeeded.connect(self.on_loaded)
+        self.worker.failed.connect(self.on_failed)
+        self.worker.start()
+
+    def on_loaded(self, snapshots):
+        seen = set()
+        for snapshot in snapshots:
+            tile = self.tiles.get(snapshot.aquarium_id)
+            if tile is None:
+                tile = self.tiles[snapshot.aquarium_id] = AquariumTile(self)
+            tile.update_snapshot(snapshot)
+            seen.add(snapshot.aquarium_id)
+
+        if seen != self.placed:
+            # Состав аквариумов изменился: раскладываем плитки заново по порядку номеров
+            for aquarium_id in set(self.tiles) - seen:
+                tile = self.tiles.pop(aquarium_id)
+                self.grid.removeWidget(tile)
+                tile.deleteLater()
+            for tile in self.tiles.values():
+                self.grid.removeWidget(tile)
+            for i, aquarium_id in enumerate(sorted(self.tiles)):
+                self.grid.addWidget(self.tiles[aquarium_id], i // TILE_COLUMNS, i % TILE_COLUMNS)
+            self.placed = seen
+
+        self.status_label.setText(f"Аквариумов: {len(snapshots)}. "
+                                  f"Обновлено: {QTime.currentTime().toString('HH:mm:ss')}")
+
+    def on_failed(self, error):
+        # На настенном экране не показываем модальных окон: ошибка видна в строке состояния
+        self.status_label.setText(f"Не удалось обновить данные: {error}")
+
+    def showEvent(self, event):
+        # Окно открывается повторно тем же экземпляром: возобновляем обновление
+        if not self.timer.isActive():
+            self.timer.start()
+            self.refresh()
+        super().showEvent(event)
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        if self.worker is not None:
+            self.worker.wait()
+        super().closeEvent(event)
@@ -0,0 +1,193 @@
+from collections import deque
+
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QMessageBox
+from PyQt5.QtCore import Qt, QSocketNotifier, QTime, QTimer
+import psycopg2
+import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from connection import get_db_connection
+from services.live_readings import listen, notified_aquariums, fetch_since
+
+# Сколько последних показаний держит график: стоимость перерисовки от времени работы не зависит
+LIVE_POINTS = 500
+# Запас по оси времени при расширении, доля видимого интервала
+TIME_HEADROOM = 0.25
+
+SERIES = [("Температура (°C)", "red"), ("pH", "blue"), ("Уровень кислорода (mg/L)", "green")]
+
+
+class LiveWaterChart(QWidget):
+    """График параметров воды, дополняемый по мере поступления показаний.
+
+    Показания приходят по уведомлению базы (LISTEN) и хранятся в кольцевом
+    буфере из LIVE_POINTS точек. Пока новые точки помещаются в пределы осей,
+    перерисовываются только линии поверх сохраненного фона (blitting);
+    оси и сетка перерисовываются лишь при выходе точки за пределы.
+    """
+
+    def __init__(self, aquarium_id, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.aquarium_id = None
+        self.last_id = None
+        self.times = deque(maxlen=LIVE_POINTS)
+        self.values = [deque(maxlen=LIVE_POINTS) for _ in SERIES]
+        self.background = None
+        self.listen_connection = None
+        self.notifier = None
+        self.resize(1000, 800)
+        self.initUI()
+        self.start_listening()
+        self.set_aquarium_id(aquarium_id)
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+
+        self.figure = Figure(figsize=(10, 8))
+        self.canvas = FigureCanvas(self.figure)
+        self.axes = self.figure.subplots(3, 1, sharex=True)
+        self.lines = []
+        for ax, (title, color) in zip(self.axes, SERIES):
+            ax.set_ylabel(title)
+            ax.grid(True)
+            ax.xaxis_date()
+            line, = ax.plot([], [], color=color, animated=True)
+            self.lines.append(line)
+        self.axes[-1].xaxis.set_major_formatter(mdates.DateFormatter("%d.%m %H:%M"))
+        self.figure.tight_layout()
+        # После каждой полной перерисовки запоминаем фон без линий
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+
+        self.status_label = QLabel(self)
+        layout.addWidget(self.canvas)
+        layout.addWidget(self.status_label)
+
+    def start_listening(self):
+        """Открывает отдельное соединение для уведомлений о новых показаниях"""
+        try:
+            self.listen_connection = get_db_connection()
+            listen(self.listen_connection)
+        except psycopg2.Error as e:
+            QMessageBox.critical(self, "Ошибка базы данных", f"Не удалось подписаться на показания: {e}")
+            return
+        self.notifier = QSocketNotifier(self.listen_connection.fileno(), QSocketNotifier.Read, self)
+        self.notifier.activated.connect(self.on_notification)
+
+    def stop_listening(self):
+        if self.notifier is not None:
+            self.notifier.setEnabled(False)
+            self.notifier.deleteLater()
+            self.notifier = None
+        if self.listen_connection is not None:
+            self.listen_connection.close()
+            self.listen_connection = None
+
+    def set_aquarium_id(self, aquarium_id):
+        """Переключает график на другой аквариум и загружает его последние показания"""
+        if aquarium_id == self.aquarium_id:
+            return
+        self.aquarium_id = aquarium_id
+        self.last_id = None
+        self.times.clear()
+        for values in self.values:
+            values.clear()
+        self.setWindowTitle(f"Параметры воды аквариума {aquarium_id} в реальном времени")
+        self.poll()
+
+    def on_notification(self):
+        if self.listen_connection is None:
+            return
+        try:
+            aquariums = notified_aquariums(self.listen_connection)
+        except psycopg2.Error as e:
+            self.notifier.setEnabled(False)
+            self.status_label.setText(f"Соединение для уведомлений потеряно: {e}")
+            return
+        if aquariums is None or self.aquarium_id in aquariums:
+            self.poll()
+        # Уведомления, пришедшие во время запроса, уже прочитаны из сокета
+        if self.listen_connection.notifies:
+            QTimer.singleShot(0, self.on_notification)
+
+    def poll(self):
+        """Догружает показания, появившиеся после последней точки графика"""
+        if self.listen_connection is None:
+            return
+        try:
+            rows = fetch_since(self.listen_connection, self.aquarium_id, self.last_id, LIVE_POINTS)
+        except psycopg2.Error as e:
+            self.status_label.setText(f"Не удалось получить показания: {e}")
+            return
+        if not rows:
+            return
+
+        for parameter_id, measured_at, *values in rows:
+            self.times.append(mdates.date2num(measured_at))
+            for series, value in zip(self.values, values):
+                series.append(float(value))
+        self.last_id = rows[-1][0]
+        self.status_label.setText(
+            f"Последнее показание: {rows[-1][1]:%Y-%m-%d %H:%M:%S}; "
+            f"обновлено в {QTime.currentTime().toString('HH:mm:ss')}")
+        self.update_lines()
+
+    def update_lines(self):
+        times = list(self.times)
+        for line, values in zip(self.lines, self.values):
+            line.set_data(times, list(values))
+
+        if self.background is None or self.rescale_needed():
+            self.rescale()
+            self.canvas.draw_idle()
+        else:
+            self.blit()
+
+    def rescale_needed(self):
+        """Вышла ли последняя точка за пределы осей"""
+        left, right = self.axes[0].get_xlim()
+        if not left <= self.times[-1] <= right:
+            return True
+        for ax, values in zip(self.axes, self.values):
+            bottom, top = ax.get_ylim()
+            if not bottom <= values[-1] <= top:
+                return True
+        return False
+
+    def rescale(self):
+        """Подбирает пределы осей по буферу с запасом, чтобы расширять их редко"""
+        left, right = self.times[0], self.times[-1]
+        span = max(right - left, 1 / 24)  # Не меньше часа
+        self.axes[0].set_xlim(left, right + span * TIME_HEADROOM)
+        for ax, values in zip(self.axes, self.values):
+            low, high = min(values), max(values)
+            margin = max((high - low) * 0.2, 0.5)
+            ax.set_ylim(low - margin, high + margin)
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_lines()
+
+    def blit(self):
+        self.canvas.restore_region(self.background)
+        self.draw_lines()
+        self.canvas.blit(self.figure.bbox)
+
+    def draw_lines(self):
+        for ax, line in zip(self.axes, self.lines):
+            ax.draw_artist(line)
+
+    def resizeEvent(self, event):
+        # Сохраненный фон соответствует старому размеру холста
+        self.background = None
+        super().resizeEvent(event)
+
+    def showEvent(self, event):
+        # Закрытое окно не держит соединение; при повторном открытии догружаем пропущенное
+        if self.listen_connection is None:
+            self.start_listening()
+            self.poll()
+        super().showEvent(event)
+
+    def closeEvent(self, event):
+        self.stop_listening()
+        super().closeEvent(event)
@@ -1,15 +1,23 @@
 from PyQt5.QtWidgets import (
     QMainWindow, QTableWidget, QTableWidgetItem, QVBoxLayout, QHBoxLayout,
     QWidget, QPushButton, QLabel, QFrame, QSplitter, QStackedWidget, QMessageBox,
-    QTabWidget, QGroupBox, QFormLayout, QComboBox
+    QTabWidget, QGroupBox, QFormLayout, QComboBox, QTableView
 )
 from PyQt5.QtCore import Qt, pyqtSignal, QPropertyAnimation, QEasingCurve
-from PyQt5.QtGui import QFont, QIcon
+from PyQt5.QtGui import QFont
 import psycopg2
+from connection import get_read_connection
 from operational.add_water_parameters import AddWaterParametersWidget
 from operational.add_feeding import AddFeedingWidget
 from operational.add_aquarium_state import AddAquariumStateWidget
 from operational.add_species_state import AddSpeciesStateWidget
+from operational.aquarium_model import AquariumTableModel
+from operational.dashboard import FarmDashboard
+from operational.comparison import ComparisonWindow
+from operational.maintenance import MaintenanceWorklist
+from services.auth import current_session
+from common import theme
+from common.theme import icon
 
 class OperationalWindow(QMainWindow):
     aquarium_selected = pyqtSignal(int)  # Сигнал о выборе аквариума
@@ -18,16 +26,20 @@ class OperationalWindow(QMainWindow):
         super().__init__()
         self.db_connection = db_connection
         self.current_aquarium_id = None  # Текущий выбранный аквариум
+        self.dashboard = None  # Окно панели фермы, создается при первом открытии
+        self.comparison = None  # Окно сравнения аквариумов
+        self.maintenance = None  # Очередь задач обслуживания
         self.initUI()
         self.setup_connections()
 
     def initUI(self):
-        self.setWindowTitle('Оперативный персонал')
+        session = current_session()
+        title = 'Оперативный персонал'
+        self.setWindowTitle(f'{title} — {session.name}' if session else title)
         self.setGeometry(100, 100, 1200, 800)
 
-        # Загрузка стилей из CSS файла
-        with open("operational/styles.css", "r") as f:
-            self.setStyleSheet(f.read())
+        # Стили окна берутся из общего кэша темы
+        theme.apply_window_theme(self, "operational")
 
         # Основной виджет
         central_widget = QWidget(self)
@@ -41,16 +53,16 @@ class OperationalWindow(QMainWindow):
         # Горизонтальный разделитель (верхняя часть: таблица и кнопки)
         top_splitter = QSplitter(Qt.Horizontal)
 
-        # Таблица аквариумов
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(7)
-        self.table.setHorizontalHeaderLabels([
-            'ID', 'Тип', 'Ответственный', 'Объем (л)', 'Статус', 
-            'Вид морепродукта', 'Последняя проверка'
-        ])
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setSelectionMode(QTableWidget.SingleSelection)
-        self.table.setSortingEnabled(True)
+        # Таблица аквариумов: данные подгружаются порциями, сортировка выполняется в базе
+        self.aquarium_model = AquariumTableModel(self.db_connection, self)
+        self.aquarium_model.load_failed.connect(self.on_load_failed)
+        self.table = QTableView(self)
+        self.table.setModel(self.aquarium_model)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
+        self.table.setSelectionMode(QTableView.SingleSelection)
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)  # Сразу запрашивает первую порцию данных через sort()
         self.table.hideColumn(0)  # Скрываем ID
         self.table.doubleClicked.connect(self.on_aquarium_double_click)
         top_splitter.addWidget(self.table)
@@ -70,25 +82,36 @@ class OperationalWindow(QMainWindow):
         
         self.button_add_feeding = QPushButton('Кормление', self)
         self.button_add_feeding.setFont(button_font)
-        self.button_add_feeding.setIcon(QIcon("icons/feeding.png"))
+        self.button_add_feeding.setIcon(icon("feeding.png"))
         action_layout.addWidget(self.button_add_feeding)
 
         self.button_add_water_parameters = QPushButton('Параметры воды', self)
         self.button_add_water_parameters.setFont(button_font)
-        self.button_add_water_parameters.setIcon(QIcon("icons/water.png"))
+        self.button_add_water_parameters.setIcon(icon("water.png"))
         action_layout.addWidget(self.button_add_water_parameters)
 
         self.button_add_aquarium_state = QPushButton('Состояние аквариума', self)
         self.button_add_aquarium_state.setFont(button_font)
-        self.button_add_aquarium_state.setIcon(QIcon("icons/aquarium_state.png"))
+        self.button_add_aquarium_state.setIcon(icon("aquarium_state.png"))
         action_layout.addWidget(self.button_add_aquarium_state)
 
         self.button_add_species_state = QPushButton('Состояние особей', self)
         self.button_add_species_state.setFont(button_font)
-        self.button_add_species_state.setIcon(QIcon("icons/species_state.png"))
+        self.button_add_species_state.setIcon(icon("species_state.png"))
         action_layout.addWidget(self.button_add_species_state)
 
         button_layout.addWidget(action_group)
+
+        # Панель всей фермы с мини-графиками для настенного экрана
+        self.button_dashboard = QPushButton('Панель фермы', self)
+        self.button_dashboard.setFont(button_font)
+        button_layout.addWidget(self.button_dashboard)
+        self.button_comparison = QPushButton('Сравнение аквариумов', self)
+        self.button_comparison.setFont(button_font)
+        button_layout.addWidget(self.button_comparison)
+        self.button_maintenance = QPushButton('Обслуживание', self)
+        self.button_maintenance.setFont(button_font)
+        button_layout.addWidget(self.button_maintenance)
         button_layout.addStretch()
         top_splitter.addWidget(button_widget)
         top_splitter.setStretchFactor(0, 3)
@@ -155,63 +178,30 @@ class OperationalWindow(QMainWindow):
         
         main_layout.addWidget(self.stacked_widget)
 
-        self.load_data()
-
     def setup_connections(self):
         self.aquarium_selected.connect(self.on_aquarium_selected)
         self.button_add_feeding.clicked.connect(self.add_feeding)
         self.button_add_water_parameters.clicked.connect(self.add_water_parameters)
         self.button_add_aquarium_state.clicked.connect(self.add_aquarium_state)
         self.button_add_species_state.clicked.connect(self.add_species_state)
+        self.button_dashboard.clicked.connect(self.show_dashboard)
+        self.button_comparison.clicked.connect(self.show_comparison)
+        self.button_maintenance.clicked.connect(self.show_maintenance)
 
     def load_data(self):
         """Загружает данные об аквариумах из базы данных"""
-        cursor = self.db_connection.cursor()
+        self.aquarium_model.refresh()
 
-        try:
-            # Загружаем основную информацию об аквариумах
-            cursor.execute("""
-                SELECT 
-                    a.aquarium_id, 
-                    a.тип_аквариума,
-                    u.имя_пользователя, 
-                    a.объем,
-                    a.статус,
-                    COALESCE(m.название_вида, 'Нет данных'),
-                    COALESCE(MAX(sa.дата_проверки)::text, 'Нет данных')
-                FROM аквариумы a
-                JOIN пользователи u ON a.ответственный_пользователь = u.user_id
-                LEFT JOIN морепродукты m ON a.aquarium_id = m.aquarium_id
-                LEFT JOIN состояние_аквариума sa ON a.aquarium_id = sa.aquarium_id
-                GROUP BY a.aquarium_id, u.имя_пользователя, m.название_вида
-                ORDER BY a.aquarium_id
-            """)
-            rows = cursor.fetchall()
-            
-            self.table.setRowCount(len(rows))
-            self.table.setSortingEnabled(False)
-            
-            for i, row in enumerate(rows):
-                for j, col in enumerate(row):
-                    item = QTableWidgetItem(str(col))
-                    item.setFlags(item.flags() ^ Qt.ItemIsEditable)
-                    self.table.setItem(i, j, item)
-            
-            self.table.setSortingEnabled(True)
-            
-        except psycopg2.Error as e:
-            QMessageBox.critical(self, "Ошибка базы данных", f"Не удалось загрузить данные: {str(e)}")
-        finally:
-            cursor.close()
+    def on_load_failed(self, error):
+        QMessageBox.critical(self, "Ошибка базы данных", f"Не удалось загрузить данные: {error}")
 
     def on_aquarium_double_click(self, index):
-        row = index.row()
-        self.current_aquarium_id = int(self.table.item(row, 0).text())
+        self.current_aquarium_id = self.aquarium_model.aquarium_id(index.row())
         self.aquarium_selected.emit(self.current_aquarium_id)
 
     def on_aquarium_selected(self, aquarium_id):
         """Обновляет информацию о выбранном аквариуме"""
-        cursor = self.db_connection.cursor()
+        cursor = get_read_connection(self.db_connection).cursor()
         
         try:
             # Получаем основную информацию об аквариуме
@@ -224,7 +214,7 @@ class OperationalWindow(QMainWindow):
                     COALESCE(MAX(sa.дата_проверки)::text, 'Нет данных') as last_check,
                     COALESCE(m.название_вида, 'Нет данных') as species_name
                 FROM аквариумы a
-                JOIN пользователи u ON a.ответственный_пользователь = u.user_id
+                LEFT JOIN пользователи u ON a.ответственный_пользователь = u.user_id
                 LEFT JOIN состояние_аквариума sa ON a.aquarium_id = sa.aquarium_id
                 LEFT JOIN морепродукты m ON a.aquarium_id = m.aquarium_id
                 WHERE a.aquarium_id = %s
@@ -235,7 +225,7 @@ class OperationalWindow(QMainWindow):
             
             if aquarium_data:
                 self.aquarium_type_label.setText(aquarium_data[0])
-                self.responsible_label.setText(aquarium_data[1])
+                self.responsible_label.setText(aquarium_data[1] or "Не назначен")
                 self.volume_label.setText(str(aquarium_data[2]))
                 self.status_label.setText(aquarium_data[3])
                 self.last_check_label.setText(aquarium_data[4] if aquarium_data[4] else "Нет данных")
@@ -269,6 +259,29 @@ class OperationalWindow(QMainWindow):
         finally:
             cursor.close()
 
+    def show_dashboard(self):
+        """Открывает панель фермы (одно окно на сеанс)"""
+        if self.dashboard is None:
+            self.dashboard = FarmDashboard(self)
+        self.dashboard.show()
+        self.dashboard.raise_()
+
+    def show_comparison(self):
+        """Открывает окно сравнения параметров воды нескольких аквариумов"""
+        if self.comparison is None:
+            self.comparison = ComparisonWindow(self.db_connection, self)
+        self.comparison.show()
+        self.comparison.raise_()
+
+    def show_maintenance(self):
+        """Открывает очередь задач обслуживания по результатам проверок"""
+        if self.maintenance is None:
+            self.maintenance = MaintenanceWorklist(self.db_connection, self)
+            self.maintenance.set_aquarium_id(self.current_aquarium_id)
+            self.aquarium_selected.connect(self.maintenance.set_aquarium_id)
+        self.maintenance.show()
+        self.maintenance.raise_()
+
     def get_selected_aquarium_id(self):
         if self.current_aquarium_id is None:
             QMessageBox.warning(self, "Ошибка", 
@@ -0,0 +1,143 @@
+from datetime import datetime
+
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QCheckBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+)
+from PyQt5.QtCore import Qt, QTimer, QTime
+from PyQt5.QtGui import QColor
+import psycopg2
+from connection import get_db_connection, note_write
+from common.workers import TaskWorker
+from services.auth import current_session
+from services.maintenance import PRIORITY_TITLES, URGENT, complete_task, update_tasks, worklist
+
+REFRESH_INTERVAL = 5 * 60 * 1000  # Обновление очереди, миллисекунды
+OVERDUE_COLOR = QColor(255, 200, 200)
+URGENT_COLOR = QColor(255, 235, 200)
+
+
+def _load_worklist(aquarium_id):
+    # Пересчет задач пишет в базу, поэтому выполняется на основном сервере
+    conn = get_db_connection()
+    try:
+        update_tasks(conn)
+        return worklist(conn, aquarium_id)
+    finally:
+        conn.close()
+
+
+class MaintenanceWorklist(QWidget):
+    """Очередь работ по обслуживанию аквариумов: сначала ближайшие сроки"""
+
+    def __init__(self, db_connection, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.db_connection = db_connection
+        self.aquarium_id = None  # Аквариум для фильтра "только выбранный"
+        self.worker = None
+        self.setWindowTitle("Обслуживание аквариумов")
+        self.resize(900, 600)
+        self.initUI()
+
+        # Таймер запускается при показе окна и останавливается при закрытии
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL)
+        self.timer.timeout.connect(self.refresh)
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(self)
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels(['Срок', 'Аквариум', 'Работа', 'Приоритет', 'ID'])
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.table.setColumnHidden(4, True)
+
+        controls = QHBoxLayout()
+        self.only_selected = QCheckBox("Только выбранный аквариум", self)
+        self.only_selected.toggled.connect(self.refresh)
+        self.refresh_button = QPushButton("Обновить", self)
+        self.refresh_button.clicked.connect(self.refresh)
+        self.done_button = QPushButton("Отметить выполненной", self)
+        self.done_button.clicked.connect(self.complete_selected)
+        controls.addWidget(self.only_selected)
+        controls.addStretch()
+        controls.addWidget(self.refresh_button)
+        controls.addWidget(self.done_button)
+
+        self.status_label = QLabel(self)
+        layout.addLayout(controls)
+        layout.addWidget(self.table)
+        layout.addWidget(self.status_label)
+
+    def set_aquarium_id(self, aquarium_id):
+        self.aquarium_id = aquarium_id
+        if self.only_selected.isChecked():
+            self.refresh()
+
+    def refresh(self):
+        if self.worker is not None and self.worker.isRunning():
+            return  # Предыдущее обновление еще не завершилось
+        aquarium_id = self.aquarium_id if self.only_selected.isChecked() else None
+        self.worker = TaskWorker(_load_worklist, aquarium_id)
+        self.worker.succeeded.connect(self.show_worklist)
+        self.worker.failed.connect(lambda error: self.status_label.setText(
+            f"Не удалось обновить очередь: {error}"))
+        self.worker.start()
+
+    def show_worklist(self, rows):
+        now = datetime.now()
+        overdue = 0
+        self.table.setRowCount(len(rows))
+        for i, (task_id, aquarium_id, aquarium_type, description, priority, due) in enumerate(rows):
+            values = [
+                due.strftime("%Y-%m-%d %H:%M"),
+                f"{aquarium_id} ({aquarium_type})",
+                description,
+                PRIORITY_TITLES.get(priority, str(priority)),
+                str(task_id),
+            ]
+            if due < now:
+                color = OVERDUE_COLOR
+                overdue += 1
+            else:
+                color = URGENT_COLOR if priority >= URGENT else None
+            for j, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if color is not None:
+                    item.setBackground(color)
+                self.table.setItem(i, j, item)
+
+        self.status_label.setText(f"Открытых задач: {len(rows)}, просрочено: {overdue}. "
+                                  f"Обновлено: {QTime.currentTime().toString('HH:mm:ss')}")
+
+    def complete_selected(self):
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+        if not rows:
+            QMessageBox.warning(self, "Ошибка", "Выберите задачи в списке.")
+            return
+
+        session = current_session()
+        user_id = session.user_id if session is not None else None
+        try:
+            for row in rows:
+                complete_task(self.db_connection, int(self.table.item(row, 4).text()), user_id)
+            note_write(self.db_connection)
+        except psycopg2.Error as e:
+            QMessageBox.critical(self, "Ошибка базы данных", f"Не удалось отметить задачу: {e}")
+        self.refresh()
+
+    def showEvent(self, event):
+        # Окно открывается повторно тем же экземпляром: возобновляем обновление
+        if not self.timer.isActive():
+            self.timer.start()
+            self.refresh()
+        super().showEvent(event)
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        if self.worker is not None:
+            self.worker.wait()
+        super().closeEvent(event)
@@ -0,0 +1 @@
+"""Сервисы предметной области без зависимости от Qt (используются GUI и скриптами)"""
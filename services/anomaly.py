@@ -0,0 +1,212 @@
+import argparse
+import json
+import math
+import sys
+
+from psycopg2.extras import execute_values
+
+# Параметры детектора
+ALPHA = 0.1  # Вес нового показания в экспоненциальном среднем
+K_SIGMA = 3.0  # Порог отклонения в сигмах
+WARMUP = 10  # Сколько показаний накопить, прежде чем отмечать аномалии
+# Класс рекомендательных блокировок детектора: (LOCK_CLASS, aquarium_id) - аквариум,
+# (LOCK_CLASS, 0) - обработка всех аквариумов сразу
+LOCK_CLASS = 35
+
+# Столбцы таблицы параметры_воды, за которыми следит детектор
+PARAMETERS = ("температура", "ph", "уровень_кислорода")
+PARAMETER_TITLES = {
+    "температура": "Температура",
+    "ph": "pH",
+    "уровень_кислорода": "Уровень кислорода",
+}
+
+
+class ParameterState:
+    """Экспоненциально взвешенные среднее и дисперсия одного параметра"""
+
+    def __init__(self, mean=0.0, variance=0.0, count=0):
+        self.mean = mean
+        self.variance = variance
+        self.count = count
+
+    def update(self, value, alpha=ALPHA, k=K_SIGMA):
+        """Учитывает показание за O(1). Возвращает (ожидаемое значение, отклонение в сигмах),
+        если показание аномально, иначе None."""
+        anomaly = None
+        if self.count == 0:
+            self.mean = value
+        else:
+            std = math.sqrt(self.variance)
+            if self.count >= WARMUP and std > 0:
+                sigmas = abs(value - self.mean) / std
+                if sigmas > k:
+                    anomaly = (self.mean, sigmas)
+            diff = value - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.variance = (1 - alpha) * (self.variance + diff * increment)
+        self.count += 1
+        return anomaly
+
+    def to_list(self):
+        return [self.mean, self.variance, self.count]
+
+
+class AquariumState:
+    """Состояние детектора для аквариума и номер последнего учтенного показания"""
+
+    def __init__(self, last_parameter_id=0, stats=None):
+        self.last_parameter_id = last_parameter_id
+        self.parameters = {
+            name: ParameterState(*(stats or {}).get(name, ())) for name in PARAMETERS
+        }
+
+    def to_json(self):
+        return json.dumps({name: state.to_list() for name, state in self.parameters.items()})
+
+
+def _load_states(cursor, aquarium_ids):
+    if aquarium_ids is None:
+        cursor.execute("SELECT aquarium_id, последний_parameter_id, статистика FROM состояние_детектора_аномалий")
+    else:
+        cursor.execute("""
+            SELECT aquarium_id, последний_parameter_id, статистика
+            FROM состояние_детектора_аномалий
+            WHERE aquarium_id = ANY(%s)
+        """, (list(aquarium_ids),))
+    return {row[0]: AquariumState(row[1], row[2]) for row in cursor.fetchall()}
+
+
+def _lock_aquariums(cursor, aquarium_ids):
+    # Обработка одних аквариумов исключает параллельную обработку тех же
+    # аквариумов и всей фермы; блокировки снимаются в конце транзакции
+    if aquarium_ids is None:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s, 0)", (LOCK_CLASS,))
+        return
+    cursor.execute("SELECT pg_advisory_xact_lock_shared(%s, 0)", (LOCK_CLASS,))
+    for aquarium_id in sorted(set(aquarium_ids)):  # Один порядок - без взаимоблокировок
+        cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", (LOCK_CLASS, aquarium_id))
+
+
+def process_new_readings(conn, aquarium_ids=None, alpha=ALPHA, k=K_SIGMA):
+    """Обрабатывает показания, поступившие после последнего запуска.
+
+    Состояние детектора хранится в базе, поэтому после перезапуска история
+    заново не просматривается: читаются только показания с номером больше
+    сохраненного. Возвращает число найденных аномалий.
+
+    Номера показаний выдаются до фиксации вставки, поэтому просмотр
+    ограничен максимумом, прочитанным под блокировкой SHARE (как в
+    services/rollups.py): отметка не перескочит через показания еще не
+    завершенной записи. Состояние аквариума читается и записывается под
+    его рекомендательной блокировкой.
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("LOCK TABLE параметры_воды IN SHARE MODE")
+            cursor.execute("SELECT COALESCE(MAX(parameter_id), 0) FROM параметры_воды")
+            upper = cursor.fetchone()[0]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    try:
+        return _process_until(conn, upper, aquarium_ids, alpha, k)
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _process_until(conn, upper, aquarium_ids, alpha, k):
+    with conn.cursor() as cursor:
+        _lock_aquariums(cursor, aquarium_ids)
+        states = _load_states(cursor, aquarium_ids)
+
+    query = """
+        SELECT p.parameter_id, p.aquarium_id, p.температура, p.pH, p.уровень_кислорода
+        FROM параметры_воды p
+        LEFT JOIN состояние_детектора_аномалий s ON s.aquarium_id = p.aquarium_id
+        WHERE p.parameter_id > COALESCE(s.последний_parameter_id, 0) AND p.parameter_id <= %s
+    """
+    params = (upper,)
+    if aquarium_ids is not None:
+        query += " AND p.aquarium_id = ANY(%s)"
+        params = (upper, list(aquarium_ids))
+
+    anomalies = []
+    touched = set()
+    # Серверный курсор: при первом запуске по всей истории строки читаются порциями
+    with conn.cursor(name="anomaly_scan") as scan:
+        scan.itersize = 10000
+        scan.execute(query + " ORDER BY p.parameter_id", params)
+        for parameter_id, aquarium_id, *values in scan:
+            state = states.setdefault(aquarium_id, AquariumState())
+            for name, value in zip(PARAMETERS, values):
+                if value is None:
+                    continue
+                result = state.parameters[name].update(float(value), alpha, k)
+                if result is not None:
+                    expected, sigmas = result
+                    anomalies.append((parameter_id, aquarium_id, name, value,
+                                      round(expected, 2), round(sigmas, 2)))
+            state.last_parameter_id = parameter_id
+            touched.add(aquarium_id)
+
+    with conn.cursor() as cursor:
+        if anomalies:
+            execute_values(cursor, """
+                INSERT INTO аномалии_параметров_воды
+                    (parameter_id, aquarium_id, параметр, значение, ожидаемое, отклонение_сигм)
+                VALUES %s
+                ON CONFLICT DO NOTHING
+            """, anomalies)
+
+        if touched:
+            execute_values(cursor, """
+                INSERT INTO состояние_детектора_аномалий (aquarium_id, последний_parameter_id, статистика)
+                VALUES %s
+                ON CONFLICT (aquarium_id) DO UPDATE
+                SET последний_parameter_id = EXCLUDED.последний_parameter_id,
+                    статистика = EXCLUDED.статистика
+            """, [(aquarium_id, states[aquarium_id].last_parameter_id, states[aquarium_id].to_json())
+                  for aquarium_id in touched])
+    conn.commit()
+    return len(anomalies)
+
+
+def fetch_anomalies(conn, aquarium_id):
+    """Возвращает {parameter_id: {параметр: отклонение_сигм}} для аквариума"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT parameter_id, параметр, отклонение_сигм
+            FROM аномалии_параметров_воды
+            WHERE aquarium_id = %s
+        """, (aquarium_id,))
+        result = {}
+        for parameter_id, name, sigmas in cursor.fetchall():
+            result.setdefault(parameter_id, {})[name] = float(sigmas)
+        return result
+
+
+def main(argv=None):
+    from connection import get_db_connection
+
+    parser = argparse.ArgumentParser(description="Поиск аномалий в новых показаниях параметров воды")
+    parser.add_argument("--aquarium", type=int, action="append", help="обработать только этот аквариум")
+    parser.add_argument("--alpha", type=float, default=ALPHA)
+    parser.add_argument("-k", type=float, default=K_SIGMA, help="порог в сигмах")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    try:
+        count = process_new_readings(conn, args.aquarium, args.alpha, args.k)
+    finally:
+        conn.close()
+    print(f"Найдено аномалий: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
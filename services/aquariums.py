@@ -0,0 +1,47 @@
+from psycopg2 import sql
+
+# Столбцы списка аквариумов и типизированные выражения для сортировки на сервере
+AQUARIUM_COLUMNS = [
+    ("ID", "a.aquarium_id"),
+    ("Тип", "a.тип_аквариума"),
+    ("Ответственный", "u.имя_пользователя"),
+    ("Объем (л)", "a.объем"),
+    ("Статус", "a.статус"),
+    ("Вид морепродукта", "m.название_вида"),
+    ("Последняя проверка", "sa.последняя_проверка"),
+]
+
+
+def fetch_aquariums(conn, sort_column=0, descending=False, limit=200, offset=0):
+    """Возвращает страницу списка аквариумов, отсортированную на стороне сервера"""
+    sort_expression = AQUARIUM_COLUMNS[sort_column][1]
+    direction = "DESC" if descending else "ASC"
+    query = sql.SQL("""
+        SELECT
+            a.aquarium_id,
+            a.тип_аквариума,
+            u.имя_пользователя,
+            a.объем,
+            a.статус,
+            m.название_вида,
+            sa.последняя_проверка
+        FROM аквариумы a
+        LEFT JOIN пользователи u ON a.ответственный_пользователь = u.user_id
+        -- Виды аквариума одной строкой, чтобы aquarium_id оставался уникальным для OFFSET
+        LEFT JOIN LATERAL (
+            SELECT string_agg(название_вида, ', ' ORDER BY seafood_id) AS название_вида
+            FROM морепродукты
+            WHERE aquarium_id = a.aquarium_id
+        ) m ON true
+        LEFT JOIN LATERAL (
+            SELECT MAX(дата_проверки) AS последняя_проверка
+            FROM состояние_аквариума
+            WHERE aquarium_id = a.aquarium_id
+        ) sa ON true
+        ORDER BY {sort} {direction} NULLS LAST, a.aquarium_id
+        LIMIT %s OFFSET %s
+    """).format(sort=sql.SQL(sort_expression), direction=sql.SQL(direction))
+
+    with conn.cursor() as cursor:
+        cursor.execute(query, (limit, offset))
+        return cursor.fetchall()
@@ -0,0 +1,209 @@
+import atexit
+import json
+import queue
+import threading
+import time
+from datetime import date, datetime
+from functools import partial
+
+import psycopg2
+from psycopg2 import errors, sql
+from psycopg2.extras import Json, execute_values
+
+from services.auth import current_session
+
+BATCH_SIZE = 500  # Сколько записей журнала вставлять за один запрос
+FLUSH_INTERVAL = 1.0  # Максимальная задержка записи, секунды
+RETRY_INTERVAL = 5.0  # Пауза после ошибки записи, секунды
+SHUTDOWN_TIMEOUT = 5.0  # Сколько ждать записи оставшегося при выходе из приложения
+
+_dumps = partial(json.dumps, default=str, ensure_ascii=False)
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def ensure_partition(cursor, month):
+    """Создает секцию журнала за месяц, если ее еще нет.
+
+    Запрет UPDATE и DELETE секция наследует от строчного триггера журнала,
+    а запрет TRUNCATE ставится на нее отдельно (см. create_db.py).
+    """
+    start = _month_start(month)
+    partition = sql.Identifier(f"журнал_изменений_{start:%Y_%m}")
+    cursor.execute(sql.SQL("""
+        CREATE TABLE IF NOT EXISTS {} PARTITION OF журнал_изменений
+        FOR VALUES FROM (%s) TO (%s)
+    """).format(partition), (start, _next_month(start)))
+    cursor.execute(sql.SQL("DROP TRIGGER IF EXISTS журнал_изменений_без_очистки ON {}").format(partition))
+    cursor.execute(sql.SQL("""
+        CREATE TRIGGER журнал_изменений_без_очистки
+            BEFORE TRUNCATE ON {}
+            FOR EACH STATEMENT EXECUTE FUNCTION запретить_изменение_журнала()
+    """).format(partition))
+    cursor.execute(sql.SQL("REVOKE UPDATE, DELETE, TRUNCATE ON {} FROM PUBLIC").format(partition))
+
+
+def diff(before, after):
+    """Оставляет только изменившиеся поля: (было, стало)"""
+    before = before or {}
+    after = after or {}
+    changed = [key for key in after if before.get(key) != after.get(key)]
+    changed += [key for key in before if key not in after]
+    return ({key: before.get(key) for key in changed if key in before},
+            {key: after.get(key) for key in changed if key in after})
+
+
+class AuditWriter:
+    """Записывает журнал изменений в фоновом потоке пачками.
+
+    record() только кладет запись в очередь, поэтому сохранение форм не
+    ждет базы. Поток вставляет накопившиеся записи одним запросом не реже
+    раза в FLUSH_INTERVAL секунд; при ошибке базы пачка сохраняется и запись
+    повторяется, пока база не станет доступна.
+    """
+
+    def __init__(self, connect=None, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.connect = connect
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.conn = None
+        self.partitions = set()  # Месяцы, для которых секция уже проверена
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self.thread.start()
+
+    def record(self, entity, record_id, action, before=None, after=None):
+        """Ставит изменение записи в очередь журнала"""
+        session = current_session()
+        self.queue.put((
+            datetime.now(),
+            session.user_id if session else None,
+            session.login if session else None,
+            entity,
+            int(record_id) if record_id not in (None, "") else None,
+            action,
+            Json(before, dumps=_dumps) if before is not None else None,
+            Json(after, dumps=_dumps) if after is not None else None,
+        ))
+
+    def _take_batch(self, batch):
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or (self.stopping.is_set() and self.queue.empty()):
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+    def _run(self):
+        batch = []
+        while not (self.stopping.is_set() and self.queue.empty() and not batch):
+            self._take_batch(batch)
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+                batch = []
+            except psycopg2.Error as e:
+                print(f"Не удалось записать журнал изменений ({len(batch)} записей): {e}")
+                if self.conn is not None:
+                    self.conn.close()
+                self.conn = None
+                if self.stopping.wait(RETRY_INTERVAL):
+                    return  # Приложение закрывается, база недоступна
+            except Exception as e:
+                # Ошибка не базы, а самих записей: повтор не поможет, а поток
+                # должен продолжать работать, иначе очередь будет расти бесконечно
+                print(f"Записи журнала изменений отброшены ({len(batch)} записей): {e!r}")
+                batch = []
+
+    def _write(self, batch):
+        if self.conn is None or self.conn.closed:
+            if self.connect is None:
+                from connection import get_db_connection
+                self.connect = get_db_connection
+            self.conn = self.connect()
+
+        with self.conn.cursor() as cursor:
+            for month in {_month_start(entry[0]) for entry in batch} - self.partitions:
+                # Ошибка создания секции прерывает запись пачки: она
+                # повторится позже, а не уйдет в секцию по умолчанию, откуда
+                # записи месяца уже не дали бы создать его секцию
+                try:
+                    ensure_partition(cursor, month)
+                    self.conn.commit()
+                except errors.CheckViolation as e:
+                    # В секции по умолчанию уже есть записи месяца: пишем туда же
+                    self.conn.rollback()
+                    print(f"Секция журнала за {month:%Y-%m} не создана, записи идут "
+                          f"в секцию по умолчанию: {e}")
+                self.partitions.add(month)
+            execute_values(cursor, """
+                INSERT INTO журнал_изменений
+                    (время, user_id, пользователь, сущность, запись_id, действие, до, после)
+                VALUES %s
+            """, batch)
+        self.conn.commit()
+
+    def close(self, timeout=SHUTDOWN_TIMEOUT):
+        """Дописывает очередь и останавливает поток"""
+        self.stopping.set()
+        self.thread.join(timeout)
+        if self.conn is not None:
+            self.conn.close()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Общий для приложения фоновый писатель журнала (создается при первом обращении)"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = AuditWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+
+def log_change(entity, record_id, action, before=None, after=None):
+    """Записывает в журнал изменение строки: action - INSERT, UPDATE или DELETE"""
+    if action == "UPDATE":
+        before, after = diff(before, after)
+        if not before and not after:
+            return
+    get_writer().record(entity, record_id, action, before, after)
+
+
+def snapshot(cursor, table, id_column, record_id):
+    """Текущее содержимое строки в виде словаря (для журнала перед удалением)"""
+    cursor.execute(sql.SQL("SELECT to_jsonb(t) FROM {} t WHERE {} = %s").format(
+        sql.Identifier(table), sql.Identifier(id_column)), (record_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def history(conn, entity, record_id=None, limit=500):
+    """Записи журнала по сущности (или одной ее записи), новые первыми.
+
+    Строки: (время, пользователь, запись_id, действие, до, после).
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT время, пользователь, запись_id, действие, до, после
+            FROM журнал_изменений
+            WHERE сущность = %s AND (%s::int IS NULL OR запись_id = %s::int)
+            ORDER BY время DESC
+            LIMIT %s
+        """, (entity, record_id, record_id, limit))
+        return cursor.fetchall()
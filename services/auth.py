@@ -0,0 +1,128 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+
+# Параметры хеширования паролей. Число итераций можно повышать со временем:
+# старые хеши проверяются со своим числом итераций и пересчитываются
+# при следующем успешном входе пользователя.
+HASH_ALGORITHM = "pbkdf2_sha256"
+HASH_ITERATIONS = int(os.environ.get("AQUAFARM_HASH_ITERATIONS", 390000))
+SALT_BYTES = 16
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class Session:
+    """Данные авторизованного пользователя, кэшируемые на время работы приложения"""
+
+    def __init__(self, user_id, name, role, login, is_operational, is_management):
+        self.user_id = user_id
+        self.name = name
+        self.role = role
+        self.login = login
+        self.is_operational = bool(is_operational)
+        self.is_management = bool(is_management)
+
+    def __repr__(self):
+        return f"Session(user_id={self.user_id}, login={self.login!r}, role={self.role!r})"
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def hash_password(password, iterations=None):
+    """Возвращает строку вида pbkdf2_sha256$итерации$соль$хеш"""
+    iterations = iterations or HASH_ITERATIONS
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{HASH_ALGORITHM}${iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password(password, stored):
+    """Проверяет пароль. Возвращает (совпадает, нужно_пересчитать_хеш)"""
+    if not stored:
+        return False, False
+
+    if not stored.startswith(HASH_ALGORITHM + "$"):
+        # Пароль из старой версии хранится открытым текстом
+        ok = hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+        return ok, ok
+
+    try:
+        _, iterations, salt, digest = stored.split("$")
+        iterations = int(iterations)
+        expected = _b64decode(digest)
+        actual = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"),
+                                     _b64decode(salt), iterations)
+    except ValueError:
+        return False, False
+
+    ok = hmac.compare_digest(actual, expected)
+    return ok, ok and iterations < HASH_ITERATIONS
+
+
+def set_password(conn, user_id, password):
+    """Сохраняет хеш нового пароля пользователя"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            UPDATE пользователи SET пароль_пользователя = %s WHERE user_id = %s
+        """, (hash_password(password), user_id))
+    conn.commit()
+
+
+def authenticate(conn, login, password):
+    """Проверяет логин и пароль. При успехе кэширует и возвращает сессию, иначе None.
+
+    Выполняется долго из-за стоимости хеширования, поэтому вызывать
+    её следует не из потока интерфейса.
+    """
+    with conn.cursor() as cursor:
+        # Поиск идет по уникальному индексу на логине
+        cursor.execute("""
+            SELECT user_id, имя_пользователя, роль_пользователя, пароль_пользователя,
+                   is_оперативный, is_менеджмент
+            FROM пользователи
+            WHERE логин = %s
+        """, (login,))
+        user = cursor.fetchone()
+
+    if user is None:
+        # Хешируем впустую, чтобы время ответа не выдавало существование логина
+        hash_password(password)
+        return None
+
+    user_id, name, role, stored, is_operational, is_management = user
+    ok, needs_rehash = verify_password(password, stored)
+    if not ok:
+        return None
+
+    if needs_rehash:
+        set_password(conn, user_id, password)
+
+    session = Session(user_id, name, role, login, is_operational, is_management)
+    set_current_session(session)
+    return session
+
+
+def set_current_session(session):
+    global _session
+    with _session_lock:
+        _session = session
+
+
+def current_session():
+    """Возвращает сессию текущего пользователя без обращения к базе"""
+    with _session_lock:
+        return _session
+
+
+def clear_session():
+    set_current_session(None)
@@ -0,0 +1,163 @@
+import argparse
+import sys
+from bisect import bisect_left
+
+# Плотность посадки: доля объема аквариума, требуемая его особям по нормам содержания.
+# При плотности выше 1 аквариум перенаселен
+OVERSTOCK_DENSITY = 1.0
+
+# Численность каждого вида в аквариуме - по последнему замеру состояния особей;
+# требуемый объем - по последней записи оптимальных параметров вида. Запись
+# морепродуктов относится к одному аквариуму, поэтому содержащиеся в аквариуме
+# виды перечисляются по названию: у того же вида в другом аквариуме свой seafood_id
+CAPACITY_QUERY = """
+    WITH численность AS (
+        SELECT DISTINCT ON (s.aquarium_id, s.seafood_id)
+               s.aquarium_id, s.seafood_id, m.название_вида, COALESCE(s.общее_количество, 0) AS особей
+        FROM состояние_особей s
+        JOIN морепродукты m ON m.seafood_id = s.seafood_id AND m.aquarium_id = s.aquarium_id
+        ORDER BY s.aquarium_id, s.seafood_id, s.дата_замера DESC, s.health_id DESC
+    ),
+    нормы AS (
+        SELECT DISTINCT ON (seafood_id) seafood_id, требуемый_объем_воды_на_особь AS норма
+        FROM оптимальные_параметры_содержания
+        WHERE требуемый_объем_воды_на_особь IS NOT NULL
+        ORDER BY seafood_id, optimal_params_id DESC
+    )
+    SELECT a.aquarium_id, a.тип_аквариума, a.статус, COALESCE(a.объем, 0),
+           COALESCE(SUM(c.особей * n.норма), 0) AS требуется,
+           COALESCE(SUM(c.особей) FILTER (WHERE n.норма IS NULL), 0) AS без_нормы,
+           COALESCE(array_agg(DISTINCT c.название_вида) FILTER (WHERE c.название_вида IS NOT NULL), '{}') AS виды
+    FROM аквариумы a
+    LEFT JOIN численность c ON c.aquarium_id = a.aquarium_id
+    LEFT JOIN нормы n ON n.seafood_id = c.seafood_id
+    GROUP BY a.aquarium_id
+    ORDER BY a.aquarium_id
+"""
+
+
+class TankCapacity:
+    """Заполненность одного аквариума"""
+
+    def __init__(self, aquarium_id, aquarium_type, status, volume, required, without_norm, species):
+        self.aquarium_id = aquarium_id
+        self.aquarium_type = aquarium_type
+        self.status = status
+        self.volume = float(volume)
+        self.required = float(required)
+        self.without_norm = without_norm  # Особей видов, для которых норма объема не задана
+        self.species = set(species)  # Названия содержащихся видов
+
+    @property
+    def free(self):
+        return self.volume - self.required
+
+    @property
+    def density(self):
+        return self.required / self.volume if self.volume > 0 else None
+
+    @property
+    def overstocked(self):
+        if self.volume <= 0:
+            return self.required > 0
+        return self.density > OVERSTOCK_DENSITY
+
+
+class CapacityPlan:
+    """Заполненность всех аквариумов и индекс свободного объема.
+
+    Аквариумы, доступные для посадки, упорядочены по свободному объему,
+    поэтому подбор аквариумов под партию - двоичный поиск, а не перебор.
+    """
+
+    def __init__(self, tanks, norms):
+        self.tanks = tanks
+        self.norms = norms  # {seafood_id: (название вида, требуемый объем на особь или None)}
+        available = sorted((tank.free, tank.aquarium_id, tank) for tank in tanks
+                           if tank.status == "Активен" and tank.free > 0)
+        self._free = [item[0] for item in available]
+        self._by_free = [item[2] for item in available]
+
+    @property
+    def overstocked(self):
+        return [tank for tank in self.tanks if tank.overstocked]
+
+    def required_volume(self, seafood_id, count):
+        """Объем воды для count особей вида; None, если норма не задана"""
+        norm = self.norms.get(seafood_id, (None, None))[1]
+        return None if norm is None else float(norm) * count
+
+    def candidates(self, required):
+        """Активные аквариумы со свободным объемом не меньше required, от самого плотного подходящего"""
+        return self._by_free[bisect_left(self._free, required):]
+
+    def place(self, seafood_id, count):
+        """Куда посадить count особей вида: аквариумы, где вид уже содержится, идут первыми.
+
+        Возвращает (требуемый объем, список аквариумов) или (None, []), если норма вида не задана.
+        """
+        required = self.required_volume(seafood_id, count)
+        if required is None:
+            return None, []
+        name = self.norms[seafood_id][0]
+        found = self.candidates(required)
+        return required, [tank for tank in found if name in tank.species] + \
+                         [tank for tank in found if name not in tank.species]
+
+
+def load_plan(conn):
+    """Рассчитывает заполненность всех аквариумов одним запросом"""
+    with conn.cursor() as cursor:
+        cursor.execute(CAPACITY_QUERY)
+        tanks = [TankCapacity(*row) for row in cursor.fetchall()]
+        cursor.execute("""
+            SELECT m.seafood_id, m.название_вида, n.требуемый_объем_воды_на_особь
+            FROM морепродукты m
+            LEFT JOIN LATERAL (
+                SELECT требуемый_объем_воды_на_особь
+                FROM оптимальные_параметры_содержания
+                WHERE seafood_id = m.seafood_id AND требуемый_объем_воды_на_особь IS NOT NULL
+                ORDER BY optimal_params_id DESC
+                LIMIT 1
+            ) n ON TRUE
+            ORDER BY m.название_вида, m.seafood_id
+        """)
+        norms = {seafood_id: (name, norm) for seafood_id, name, norm in cursor.fetchall()}
+    return CapacityPlan(tanks, norms)
+
+
+def main(argv=None):
+    from connection import get_reporting_connection
+
+    parser = argparse.ArgumentParser(description="Плотность посадки и свободный объем аквариумов")
+    parser.add_argument("--place", nargs=2, type=int, metavar=("SEAFOOD_ID", "COUNT"),
+                        help="подобрать аквариумы для COUNT особей вида")
+    args = parser.parse_args(argv)
+
+    conn = get_reporting_connection()
+    try:
+        plan = load_plan(conn)
+    finally:
+        conn.close()
+
+    if args.place:
+        seafood_id, count = args.place
+        required, tanks = plan.place(seafood_id, count)
+        if required is None:
+            print(f"Для вида {seafood_id} не задан требуемый объем воды на особь")
+            return 1
+        print(f"Требуется {required:.2f} объема; подходящих аквариумов: {len(tanks)}")
+        for tank in tanks:
+            print(f"  аквариум {tank.aquarium_id} ({tank.aquarium_type}): свободно {tank.free:.2f}")
+        return 0
+
+    for tank in plan.tanks:
+        density = f"{tank.density:.0%}" if tank.density is not None else "—"
+        flag = "  ПЕРЕНАСЕЛЕН" if tank.overstocked else ""
+        print(f"{tank.aquarium_id:>5} {tank.aquarium_type or '':<12} объем {tank.volume:>9.2f} "
+              f"занято {tank.required:>9.2f} свободно {tank.free:>9.2f} плотность {density:>5}{flag}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
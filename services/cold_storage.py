@@ -0,0 +1,250 @@
+import argparse
+import os
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+
+from psycopg2 import sql
+
+from services.export import BATCH_SIZE, export_query
+from services.rollups import refresh_rollup
+
+# Каталог файлов холодного архива (по умолчанию cold_storage в корне проекта)
+COLD_STORAGE_DIR = os.environ.get(
+    "AQUAFARM_COLD_STORAGE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cold_storage"),
+)
+
+# Строки старше этого срока переносятся из горячих таблиц в файлы, дни
+DEFAULT_RETENTION_DAYS = 365
+
+LOCK_TIMEOUT = "5s"
+
+# Таблицы, история которых уходит в холодный архив: (номер строки, дата)
+COLD_TABLES = {
+    "параметры_воды": ("parameter_id", "дата_измерения"),
+    "кормления": ("feeding_id", "дата_кормления"),
+}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для работы с холодным архивом необходимо установить пакет pyarrow")
+    return pq
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def archive_table(conn, table, cutoff, progress=None):
+    """Переносит строки старше cutoff в файлы Parquet, по одному файлу на месяц.
+
+    Перед переносом обновляются суточные сводки, а переносятся только уже
+    учтенные в них строки, поэтому отчеты по сводкам охватывают всю историю.
+    Возвращает число перенесенных строк.
+    """
+    _require_pyarrow()
+    id_column, date_column = COLD_TABLES[table]
+    if table == "параметры_воды":
+        from services.anomaly import process_new_readings
+        process_new_readings(conn)
+    refresh_rollup(conn, table)
+
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT последний_id FROM отметки_сводок WHERE таблица = %s", (table,))
+        row = cursor.fetchone()
+        mark = row[0] if row else 0
+        cursor.execute(sql.SQL("SELECT MIN({}) FROM {} WHERE {} < %s").format(
+            sql.Identifier(date_column), sql.Identifier(table), sql.Identifier(date_column)), (cutoff,))
+        oldest = cursor.fetchone()[0]
+    conn.commit()
+    if oldest is None:
+        return 0
+
+    months = []
+    month = _month_start(oldest)
+    while month < cutoff:
+        months.append((month, min(_next_month(month), cutoff)))
+        month = _next_month(month)
+
+    total = 0
+    for done, (start, end) in enumerate(months):
+        total += archive_range(conn, table, start, end, mark)
+        if progress:
+            progress(done + 1, len(months))
+    return total
+
+
+def archive_range(conn, table, start, end, mark):
+    """Переносит строки за [start, end) с номером не больше mark в один файл.
+
+    Чтение, запись в каталог архива и удаление выполняются в одной
+    транзакции REPEATABLE READ: в файл и в DELETE попадает один и тот же
+    набор строк. Файл, не попавший в каталог, читателями не используется.
+    """
+    id_column, date_column = COLD_TABLES[table]
+    relative_path = os.path.join(table, f"{start:%Y-%m}-{uuid.uuid4().hex[:8]}.parquet")
+    path = os.path.join(COLD_STORAGE_DIR, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    condition = sql.SQL("{date} >= %s AND {date} < %s AND {id} <= %s").format(
+        date=sql.Identifier(date_column), id=sql.Identifier(id_column))
+    params = (start, end, mark)
+    tmp_path = path + ".tmp"
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cursor.execute(sql.SQL("SET LOCAL lock_timeout = {}").format(sql.Literal(LOCK_TIMEOUT)))
+            # Строки упорядочены по аквариуму, поэтому статистика групп строк
+            # позволяет читателю пропускать чужие аквариумы
+            query = sql.SQL("SELECT * FROM {} WHERE {} ORDER BY aquarium_id, {}").format(
+                sql.Identifier(table), condition, sql.Identifier(date_column))
+            count = export_query(conn, query, params, tmp_path, "parquet")
+            if count == 0:
+                os.remove(tmp_path)
+                conn.rollback()
+                return 0
+
+            cursor.execute(sql.SQL("""
+                INSERT INTO холодный_архив (таблица, файл, aquarium_id, мин_дата, макс_дата, строк)
+                SELECT %s, %s, COALESCE(aquarium_id, 0), MIN({date}), MAX({date}), count(*)
+                FROM {table}
+                WHERE {condition}
+                GROUP BY 3
+            """).format(date=sql.Identifier(date_column), table=sql.Identifier(table),
+                        condition=condition), (table, relative_path) + params)
+            cursor.execute(sql.SQL("DELETE FROM {} WHERE {}").format(sql.Identifier(table), condition), params)
+            os.replace(tmp_path, path)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        for leftover in (tmp_path, path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    return count
+
+
+def archived_files(conn, table, aquarium_id=None, start=None, end=None):
+    """Файлы архива с данными аквариума (или всей таблицы) за период, от старых к новым"""
+    if table not in COLD_TABLES:
+        return []
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT файл
+            FROM холодный_архив
+            WHERE таблица = %s
+              AND (%s::int IS NULL OR aquarium_id = %s::int)
+              AND (%s::timestamp IS NULL OR макс_дата >= %s::timestamp)
+              AND (%s::timestamp IS NULL OR мин_дата <= %s::timestamp)
+            GROUP BY файл
+            ORDER BY MIN(мин_дата)
+        """, (table, aquarium_id, aquarium_id, start, start, end, end))
+        return [row[0] for row in cursor.fetchall()]
+
+
+def archived_count(conn, table, aquarium_id):
+    """Число строк аквариума в холодном архиве"""
+    if table not in COLD_TABLES:
+        return 0
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT COALESCE(SUM(строк), 0) FROM холодный_архив
+            WHERE таблица = %s AND aquarium_id = %s
+        """, (table, aquarium_id))
+        return cursor.fetchone()[0]
+
+
+def _matching_row_groups(parquet_file, aquarium_id):
+    """Группы строк файла, в которых по статистике могут быть строки аквариума"""
+    groups = range(parquet_file.num_row_groups)
+    if aquarium_id is None:
+        return list(groups)
+    column = parquet_file.schema_arrow.get_field_index("aquarium_id")
+    matching = []
+    for i in groups:
+        statistics = parquet_file.metadata.row_group(i).column(column).statistics
+        if (statistics is None or not statistics.has_min_max
+                or statistics.min <= aquarium_id <= statistics.max):
+            matching.append(i)
+    return matching
+
+
+def read_archived(conn, table, aquarium_id=None, start=None, end=None):
+    """Читает архивные строки пачками, не загружая файл целиком. Возвращает генератор пачек pyarrow.
+
+    Строки в файле упорядочены по аквариуму и дате, поэтому строки одного
+    аквариума приходят по возрастанию даты.
+    """
+    files = archived_files(conn, table, aquarium_id, start, end)
+    if not files:
+        return
+    pq = _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    date_column = COLD_TABLES[table][1]
+    # Даты сравниваются со столбцом timestamp, поэтому приводятся к datetime
+    if isinstance(start, date) and not isinstance(start, datetime):
+        start = datetime.combine(start, datetime.min.time())
+    if isinstance(end, date) and not isinstance(end, datetime):
+        end = datetime.combine(end, datetime.max.time())
+    for relative_path in files:
+        parquet_file = pq.ParquetFile(os.path.join(COLD_STORAGE_DIR, relative_path))
+        row_groups = _matching_row_groups(parquet_file, aquarium_id)
+        if not row_groups:
+            continue
+        date_type = parquet_file.schema_arrow.field(date_column).type
+        for batch in parquet_file.iter_batches(batch_size=BATCH_SIZE, row_groups=row_groups):
+            conditions = []
+            if aquarium_id is not None:
+                conditions.append(pc.equal(batch.column("aquarium_id"), aquarium_id))
+            if start is not None:
+                conditions.append(pc.greater_equal(batch.column(date_column), pa.scalar(start, type=date_type)))
+            if end is not None:
+                conditions.append(pc.less_equal(batch.column(date_column), pa.scalar(end, type=date_type)))
+            if conditions:
+                mask = conditions[0]
+                for condition in conditions[1:]:
+                    mask = pc.and_(mask, condition)
+                batch = batch.filter(mask)
+            if batch.num_rows:
+                yield batch
+
+
+def read_archived_rows(conn, table, columns, aquarium_id=None, start=None, end=None):
+    """Архивные строки в виде кортежей из указанных столбцов. Возвращает генератор."""
+    for batch in read_archived(conn, table, aquarium_id, start, end):
+        yield from zip(*(batch.column(name).to_pylist() for name in columns))
+
+
+def main(argv=None):
+    from connection import get_db_connection
+
+    parser = argparse.ArgumentParser(description="Перенос старой истории в холодный архив (файлы Parquet)")
+    parser.add_argument("--table", choices=sorted(COLD_TABLES), action="append",
+                        help="архивировать только эту таблицу")
+    parser.add_argument("--older-than", type=int, default=DEFAULT_RETENTION_DAYS,
+                        help="возраст строк в днях (по умолчанию %(default)s)")
+    args = parser.parse_args(argv)
+
+    cutoff = _month_start(datetime.now().date() - timedelta(days=args.older_than))
+    conn = get_db_connection()
+    try:
+        for table in args.table or COLD_TABLES:
+            count = archive_table(conn, table, cutoff)
+            print(f"{table}: перенесено строк до {cutoff}: {count}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
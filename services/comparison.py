@@ -0,0 +1,86 @@
+from datetime import datetime, time
+
+# На сколько интервалов делится период: столько точек на линию аквариума
+BUCKETS = 200
+SECONDS_PER_DAY = 86400
+
+# Интервалы короче суток считаются по исходным показаниям
+RAW_QUERY = """
+    SELECT aquarium_id,
+           to_timestamp(floor(extract(epoch FROM дата_измерения) / %(width)s) * %(width)s)
+               AT TIME ZONE 'UTC' AS интервал,
+           AVG(температура), AVG(pH), AVG(уровень_кислорода)
+    FROM параметры_воды
+    WHERE дата_измерения >= %(start)s AND дата_измерения < %(end)s
+      AND {aquariums}
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+"""
+
+# Интервалы от суток - по суточной сводке (она охватывает и холодный архив)
+ROLLUP_QUERY = """
+    SELECT aquarium_id,
+           to_timestamp(floor(extract(epoch FROM день::timestamp) / %(width)s) * %(width)s)
+               AT TIME ZONE 'UTC' AS интервал,
+           SUM(сумма_температуры) / NULLIF(SUM(количество_температуры), 0),
+           SUM(сумма_ph) / NULLIF(SUM(количество_ph), 0),
+           SUM(сумма_кислорода) / NULLIF(SUM(количество_кислорода), 0)
+    FROM сводка_параметров_воды
+    WHERE день >= %(start)s::date AND день < %(end)s::date
+      AND {aquariums}
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+"""
+
+
+def _as_datetime(value):
+    return value if isinstance(value, datetime) else datetime.combine(value, time.min)
+
+
+def _bucket_width(start, end, buckets):
+    return max(int((end - start).total_seconds() // buckets), 1)
+
+
+def uses_rollup(start, end, buckets=BUCKETS):
+    """Строится ли сравнение за период по суточной сводке (ее нужно обновить заранее)"""
+    return _bucket_width(_as_datetime(start), _as_datetime(end), buckets) >= SECONDS_PER_DAY
+
+
+def fetch_comparison(conn, start, end, aquarium_ids=None, species=None, buckets=BUCKETS):
+    """Средние параметры воды нескольких аквариумов по интервалам периода одним запросом.
+
+    Период [start, end) - конец не включается. Аквариумы задаются списком
+    номеров или названием вида (все аквариумы с этим видом). Длинные периоды
+    читаются из суточной сводки: если uses_rollup(), ее нужно обновить заранее.
+    Возвращает {aquarium_id: (время, температура, pH, кислород)}.
+    """
+    start = _as_datetime(start)
+    end = _as_datetime(end)
+    width = _bucket_width(start, end, buckets)
+
+    params = {"start": start, "end": end}
+    if species is not None:
+        aquariums = "aquarium_id IN (SELECT aquarium_id FROM морепродукты WHERE название_вида = %(species)s)"
+        params["species"] = species
+    else:
+        aquariums = "aquarium_id = ANY(%(aquarium_ids)s)"
+        params["aquarium_ids"] = list(aquarium_ids or [])
+
+    if width >= SECONDS_PER_DAY:
+        query = ROLLUP_QUERY
+        # Суточную сводку можно делить только на целые сутки
+        width = width // SECONDS_PER_DAY * SECONDS_PER_DAY
+    else:
+        query = RAW_QUERY
+    params["width"] = width
+
+    series = {}
+    with conn.cursor() as cursor:
+        cursor.execute(query.format(aquariums=aquariums), params)
+        for aquarium_id, moment, temperature, ph, oxygen in cursor.fetchall():
+            times, temperatures, phs, oxygens = series.setdefault(aquarium_id, ([], [], [], []))
+            times.append(moment)
+            temperatures.append(float(temperature) if temperature is not None else None)
+            phs.append(float(ph) if ph is not None else None)
+            oxygens.append(float(oxygen) if oxygen is not None else None)
+    return series
@@ -0,0 +1,80 @@
+from services.health import health_grade, health_score
+
+# Сколько последних показаний показывать на мини-графиках
+SPARKLINE_POINTS = 24
+
+# Последние показания всех аквариумов и их последняя проверка одним запросом.
+# Подзапросы LATERAL читают по индексу (aquarium_id, дата) только нужные строки.
+DASHBOARD_QUERY = """
+    SELECT
+        a.aquarium_id,
+        a.тип_аквариума,
+        a.статус,
+        m.виды,
+        w.температура,
+        w.ph,
+        w.кислород,
+        w.последнее_измерение,
+        s.состояние_фильтра,
+        s.состояние_стекла,
+        s.уровень_водорослей,
+        s.прозрачность_воды
+    FROM аквариумы a
+    LEFT JOIN LATERAL (
+        SELECT string_agg(название_вида, ', ' ORDER BY название_вида) AS виды
+        FROM морепродукты
+        WHERE aquarium_id = a.aquarium_id
+    ) m ON true
+    LEFT JOIN LATERAL (
+        SELECT
+            array_agg(r.температура ORDER BY r.дата_измерения) AS температура,
+            array_agg(r.pH ORDER BY r.дата_измерения) AS ph,
+            array_agg(r.уровень_кислорода ORDER BY r.дата_измерения) AS кислород,
+            MAX(r.дата_измерения) AS последнее_измерение
+        FROM (
+            SELECT дата_измерения, температура, pH, уровень_кислорода
+            FROM параметры_воды
+            WHERE aquarium_id = a.aquarium_id
+            ORDER BY дата_измерения DESC
+            LIMIT %s
+        ) r
+    ) w ON true
+    LEFT JOIN LATERAL (
+        SELECT состояние_фильтра, состояние_стекла, уровень_водорослей, прозрачность_воды
+        FROM состояние_аквариума
+        WHERE aquarium_id = a.aquarium_id
+        ORDER BY дата_проверки DESC
+        LIMIT 1
+    ) s ON true
+    ORDER BY a.aquarium_id
+"""
+
+
+class AquariumSnapshot:
+    """Сводка по аквариуму для панели фермы"""
+
+    def __init__(self, row):
+        (self.aquarium_id, self.aquarium_type, self.status, self.species,
+         temperature, ph, oxygen, self.last_measured, *check) = row
+        self.series = {
+            "температура": _floats(temperature),
+            "ph": _floats(ph),
+            "уровень_кислорода": _floats(oxygen),
+        }
+        if check[0] is None:
+            self.score = None
+            self.grade = "Нет проверок"
+        else:
+            self.score = health_score(*check)
+            self.grade = health_grade(self.score)
+
+
+def _floats(values):
+    return tuple(float(v) for v in values or () if v is not None)
+
+
+def fetch_dashboard(conn, points=SPARKLINE_POINTS):
+    """Возвращает список AquariumSnapshot для всех аквариумов"""
+    with conn.cursor() as cursor:
+        cursor.execute(DASHBOARD_QUERY, (points,))
+        return [AquariumSnapshot(row) for row in cursor.fetchall()]
@@ -0,0 +1,180 @@
+from psycopg2 import sql
+
+from services.audit import log_change, snapshot
+
+# Сколько строк истории переносится в архив за одну транзакцию
+CHUNK_SIZE = 5000
+
+# Сколько ждать блокировку строки, прежде чем прервать пачку с ошибкой,
+# вместо того чтобы надолго повиснуть за чужой транзакцией
+LOCK_TIMEOUT = "5s"
+
+# Таблицы истории, которые перед удалением переносятся в архив_<таблица>
+ARCHIVED_TABLES = ["параметры_воды", "кормления", "состояние_аквариума", "состояние_особей"]
+
+
+def archive_table_name(table):
+    return f"архив_{table}"
+
+
+def _count(conn, table, column, value):
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("SELECT count(*) FROM {} WHERE {} = %s").format(
+            sql.Identifier(table), sql.Identifier(column)), (value,))
+        return cursor.fetchone()[0]
+
+
+def archive_rows(conn, table, column, value, chunk_size=CHUNK_SIZE, on_chunk=None):
+    """Переносит строки таблицы в архив и удаляет их пачками, каждая в своей транзакции.
+
+    Короткие транзакции держат блокировки только на строках текущей пачки,
+    поэтому вставки операторов в эту же таблицу не ждут окончания всей работы.
+    """
+    query = sql.SQL("""
+        WITH batch AS (
+            DELETE FROM {table}
+            WHERE ctid = ANY(ARRAY(
+                SELECT ctid FROM {table} WHERE {column} = %s LIMIT %s
+            ))
+            RETURNING *
+        )
+        INSERT INTO {archive} SELECT CURRENT_TIMESTAMP, * FROM batch
+    """).format(
+        table=sql.Identifier(table),
+        column=sql.Identifier(column),
+        archive=sql.Identifier(archive_table_name(table)),
+    )
+
+    total = 0
+    while True:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql.SQL("SET LOCAL lock_timeout = {}").format(sql.Literal(LOCK_TIMEOUT)))
+                cursor.execute(query, (value, chunk_size))
+                moved = cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        total += moved
+        if on_chunk:
+            on_chunk(moved)
+        if moved < chunk_size:
+            return total
+
+
+class _Progress:
+    """Сводит ход переноса нескольких таблиц к общему счетчику строк"""
+
+    def __init__(self, total, callback):
+        self.done = 0
+        self.total = total
+        self.callback = callback
+
+    def __call__(self, moved):
+        self.done += moved
+        if self.callback:
+            self.callback(min(self.done, self.total), self.total)
+
+
+def _archive_history(conn, sources, chunk_size, progress):
+    """Архивирует историю по списку (таблица, столбец, значение)"""
+    total = sum(_count(conn, table, column, value) for table, column, value in sources)
+    tracker = _Progress(total, progress)
+    tracker(0)
+    for table, column, value in sources:
+        archive_rows(conn, table, column, value, chunk_size, tracker)
+    return total
+
+
+def decommission_aquarium(conn, aquarium_id, chunk_size=CHUNK_SIZE, progress=None):
+    """Выводит аквариум из эксплуатации: архивирует историю и удаляет запись.
+
+    Возвращает число перенесенных в архив строк истории.
+    """
+    sources = [(table, "aquarium_id", aquarium_id) for table in ARCHIVED_TABLES]
+    archived = _archive_history(conn, sources, chunk_size, progress)
+
+    try:
+        with conn.cursor() as cursor:
+            before = snapshot(cursor, "аквариумы", "aquarium_id", aquarium_id)
+            cursor.execute("UPDATE морепродукты SET aquarium_id = NULL WHERE aquarium_id = %s",
+                           (aquarium_id,))
+            cursor.execute("DELETE FROM аномалии_параметров_воды WHERE aquarium_id = %s", (aquarium_id,))
+            cursor.execute("DELETE FROM состояние_детектора_аномалий WHERE aquarium_id = %s",
+                           (aquarium_id,))
+            cursor.execute("DELETE FROM задачи_обслуживания WHERE aquarium_id = %s", (aquarium_id,))
+            cursor.execute("DELETE FROM оценка_готовности WHERE aquarium_id = %s", (aquarium_id,))
+            cursor.execute("DELETE FROM аквариумы WHERE aquarium_id = %s", (aquarium_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    log_change("аквариумы", aquarium_id, "DELETE", before=before)
+    return archived
+
+
+def decommission_seafood(conn, seafood_id, chunk_size=CHUNK_SIZE, progress=None):
+    """Удаляет вид морепродукта, предварительно архивируя его историю"""
+    sources = [
+        ("состояние_особей", "seafood_id", seafood_id),
+        ("кормления", "seafood_id", seafood_id),
+    ]
+    archived = _archive_history(conn, sources, chunk_size, progress)
+
+    try:
+        with conn.cursor() as cursor:
+            before = snapshot(cursor, "морепродукты", "seafood_id", seafood_id)
+            cursor.execute("DELETE FROM оптимальные_параметры_содержания WHERE seafood_id = %s",
+                           (seafood_id,))
+            cursor.execute("DELETE FROM готовность_продукции WHERE seafood_id = %s", (seafood_id,))
+            cursor.execute("DELETE FROM оценка_готовности WHERE seafood_id = %s", (seafood_id,))
+            cursor.execute("UPDATE холодильники SET seafood_id = NULL WHERE seafood_id = %s",
+                           (seafood_id,))
+            cursor.execute("DELETE FROM морепродукты WHERE seafood_id = %s", (seafood_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    log_change("морепродукты", seafood_id, "DELETE", before=before)
+    return archived
+
+
+def delete_user(conn, user_id, progress=None):
+    """Удаляет пользователя, снимая с него ответственность за аквариумы"""
+    try:
+        with conn.cursor() as cursor:
+            before = snapshot(cursor, "пользователи", "user_id", user_id)
+            if before:
+                before.pop("пароль_пользователя", None)  # Хеш пароля в журнал не пишем
+            cursor.execute("""
+                UPDATE аквариумы SET ответственный_пользователь = NULL
+                WHERE ответственный_пользователь = %s
+            """, (user_id,))
+            cursor.execute("UPDATE задачи_обслуживания SET выполнил = NULL WHERE выполнил = %s", (user_id,))
+            cursor.execute("DELETE FROM пользователи WHERE user_id = %s", (user_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    log_change("пользователи", user_id, "DELETE", before=before)
+    if progress:
+        progress(1, 1)
+    return 0
+
+
+def delete_refrigerator(conn, fridge_id, progress=None):
+    """Удаляет холодильник"""
+    try:
+        with conn.cursor() as cursor:
+            before = snapshot(cursor, "холодильники", "fridge_id", fridge_id)
+            cursor.execute("DELETE FROM холодильники WHERE fridge_id = %s", (fridge_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    log_change("холодильники", fridge_id, "DELETE", before=before)
+    if progress:
+        progress(1, 1)
+    return 0
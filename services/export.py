@@ -0,0 +1,224 @@
+import argparse
+import csv
+import os
+import sys
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from psycopg2 import sql
+from psycopg2.extensions import encodings
+
+# Размер пачки строк при чтении через серверный курсор
+BATCH_SIZE = 10000
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+# Таблицы, доступные для выгрузки, и их столбцы (None - все столбцы)
+EXPORT_TABLES = {
+    "аквариумы": None,
+    "морепродукты": None,
+    "пользователи": ["user_id", "имя_пользователя", "роль_пользователя", "логин",
+                     "is_оперативный", "is_менеджмент"],  # Без хешей паролей
+    "холодильники": None,
+    "оптимальные_параметры_содержания": None,
+    "готовность_продукции": None,
+    "состояние_аквариума": None,
+    "состояние_особей": None,
+    "параметры_воды": None,
+    "кормления": None,
+}
+
+# Столбец даты для упорядочивания истории по аквариуму
+HISTORY_DATE_COLUMNS = {
+    "состояние_аквариума": "дата_проверки",
+    "состояние_особей": "дата_замера",
+    "параметры_воды": "дата_измерения",
+    "кормления": "дата_кормления",
+}
+
+# Таблицы со столбцом aquarium_id, которые можно выгрузить по одному аквариуму
+AQUARIUM_TABLES = {"аквариумы", "морепродукты", *HISTORY_DATE_COLUMNS}
+
+# Соответствие OID типов PostgreSQL типам Arrow (остальное выгружается строками)
+_ARROW_TYPES = {
+    16: "bool_",
+    20: "int64",
+    21: "int16",
+    23: "int32",
+    700: "float32",
+    701: "float64",
+    1700: "float64",
+    1082: "date32",
+}
+
+
+def table_query(table, aquarium_id=None):
+    """Строит запрос выгрузки таблицы (при указании аквариума - только его истории)"""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Таблица {table} недоступна для выгрузки")
+
+    columns = EXPORT_TABLES[table]
+    select = sql.SQL("*") if columns is None else sql.SQL(", ").join(map(sql.Identifier, columns))
+    query = sql.SQL("SELECT {} FROM {}").format(select, sql.Identifier(table))
+
+    if aquarium_id is None:
+        return query, None
+    if table not in AQUARIUM_TABLES:
+        raise ValueError(f"Таблицу {table} нельзя выгрузить по аквариуму")
+
+    query += sql.SQL(" WHERE aquarium_id = %s")
+    if table in HISTORY_DATE_COLUMNS:
+        query += sql.SQL(" ORDER BY {}").format(sql.Identifier(HISTORY_DATE_COLUMNS[table]))
+    return query, (aquarium_id,)
+
+
+def detect_format(path, fmt=None):
+    """Определяет формат по явному указанию или расширению файла"""
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".") or "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат выгрузки: {fmt}")
+    return fmt
+
+
+def export_query(conn, query, params, path, fmt=None, batch_size=BATCH_SIZE, archived=None):
+    """Потоково выгружает результат запроса в файл. Возвращает число строк.
+
+    archived - необязательный итератор пачек pyarrow с более старыми строками
+    из холодного архива; они записываются в файл перед результатом запроса.
+    """
+    fmt = detect_format(path, fmt)
+    if fmt == "csv":
+        return _export_csv(conn, query, params, path, archived)
+    return _export_parquet(conn, query, params, path, batch_size, archived)
+
+
+def export_table(conn, table, path, fmt=None, aquarium_id=None, batch_size=BATCH_SIZE):
+    """Выгружает таблицу целиком или историю одного аквариума вместе с холодным архивом"""
+    from services.cold_storage import read_archived
+
+    query, params = table_query(table, aquarium_id)
+    archived = read_archived(conn, table, aquarium_id)
+    return export_query(conn, query, params, path, fmt, batch_size, archived)
+
+
+def _export_csv(conn, query, params, path, archived=None):
+    """Выгрузка через COPY ... TO STDOUT: сервер сам формирует CSV, данные пишутся в файл по мере поступления"""
+    first = next(archived, None) if archived is not None else None
+    with conn.cursor() as cursor:
+        query_text = cursor.mogrify(query, params).decode(encodings[conn.encoding])
+        header = ", HEADER" if first is None else ""
+        copy_sql = sql.SQL("COPY ({}) TO STDOUT WITH (FORMAT csv{})").format(
+            sql.SQL(query_text), sql.SQL(header))
+        total = 0
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            if first is not None:
+                # Заголовок и архивные строки пишем сами, затем дописываем результат COPY
+                writer = csv.writer(f)
+                writer.writerow(first.schema.names)
+                for data in (first, *archived):
+                    for row in zip(*(column.to_pylist() for column in data.columns)):
+                        writer.writerow(_csv_value(value) for value in row)
+                    total += data.num_rows
+                f.flush()
+            cursor.copy_expert(copy_sql, f)
+        return total + cursor.rowcount
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+
+def _arrow_schema(pa, description):
+    fields = []
+    for column in description:
+        if column.type_code in (1114, 1184):  # timestamp / timestamptz
+            tz = "UTC" if column.type_code == 1184 else None
+            fields.append(pa.field(column.name, pa.timestamp("us", tz=tz)))
+        else:
+            type_name = _ARROW_TYPES.get(column.type_code, "string")
+            fields.append(pa.field(column.name, getattr(pa, type_name)()))
+    return pa.schema(fields)
+
+
+def _arrow_value(value, arrow_type, pa):
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return float(value)
+    if pa.types.is_string(arrow_type) and not isinstance(value, str):
+        return str(value)
+    return value
+
+
+def _export_parquet(conn, query, params, path, batch_size, archived=None):
+    """Выгрузка через именованный серверный курсор: в памяти не более одной пачки строк"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для выгрузки в Parquet необходимо установить пакет pyarrow")
+
+    total = 0
+    writer = None
+    try:
+        with conn.cursor(name=f"export_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if writer is None:
+                    schema = _arrow_schema(pa, cursor.description)
+                    writer = pq.ParquetWriter(path, schema, compression="zstd")
+                    # Архивные строки старше горячих, поэтому идут первыми
+                    for data in archived or ():
+                        writer.write_table(pa.Table.from_batches([data]).select(schema.names).cast(schema))
+                        total += data.num_rows
+                if not rows:
+                    break
+
+                # Перекладываем пачку строк в столбцы
+                arrays = []
+                for j, field in enumerate(schema):
+                    values = [_arrow_value(row[j], field.type, pa) for row in rows]
+                    arrays.append(pa.array(values, type=field.type))
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                total += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+
+def main(argv=None):
+    from connection import get_reporting_connection
+
+    parser = argparse.ArgumentParser(description="Выгрузка таблиц и запросов в CSV/Parquet")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--table", choices=sorted(EXPORT_TABLES), help="таблица для выгрузки")
+    source.add_argument("--query", help="произвольный запрос SELECT")
+    parser.add_argument("--aquarium", type=int, help="выгрузить историю только этого аквариума")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="формат (по умолчанию по расширению)")
+    parser.add_argument("-o", "--output", required=True, help="путь к файлу")
+    args = parser.parse_args(argv)
+    if args.aquarium is not None and args.table not in AQUARIUM_TABLES:
+        parser.error("--aquarium допустим только для таблиц: " + ", ".join(sorted(AQUARIUM_TABLES)))
+
+    conn = get_reporting_connection()
+    try:
+        if args.table:
+            count = export_table(conn, args.table, args.output, args.format, args.aquarium)
+        else:
+            count = export_query(conn, args.query, None, args.output, args.format)
+    finally:
+        conn.close()
+    print(f"Выгружено строк: {count} -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
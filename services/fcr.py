@@ -0,0 +1,182 @@
+import argparse
+import sys
+from datetime import date, timedelta
+
+from services.rollups import refresh_rollup
+
+# Сколько последних рассчитанных периодов хранить в кэше
+MAX_CACHED_PERIODS = 100
+
+# Класс рекомендательных блокировок расчета: (LOCK_CLASS, хеш периода)
+LOCK_CLASS = 36
+
+# Корм за период берется из суточной сводки, биомасса - по первому и последнему
+# замеру периода (общее_количество × средний_текущий_вес). При единственном
+# замере прирост неизвестен, и биомасса пары не заполняется. Расчет выполняется
+# одним запросом сразу для всех аквариумов и видов.
+COMPUTE_QUERY = """
+    WITH корм AS (
+        SELECT aquarium_id, seafood_id, SUM(объем_корма) AS корм
+        FROM сводка_кормлений
+        WHERE день BETWEEN %(start)s AND %(end)s
+        GROUP BY aquarium_id, seafood_id
+    ),
+    биомасса AS (
+        SELECT COALESCE(aquarium_id, 0) AS aquarium_id,
+               COALESCE(seafood_id, 0) AS seafood_id,
+               CASE WHEN COUNT(*) > 1 THEN
+                   (array_agg(общее_количество * средний_текущий_вес ORDER BY дата_замера))[1]
+               END AS начало,
+               CASE WHEN COUNT(*) > 1 THEN
+                   (array_agg(общее_количество * средний_текущий_вес ORDER BY дата_замера DESC))[1]
+               END AS конец
+        FROM состояние_особей
+        WHERE дата_замера >= %(start)s AND дата_замера < %(end)s::date + 1
+          AND общее_количество IS NOT NULL AND средний_текущий_вес IS NOT NULL
+        GROUP BY 1, 2
+    )
+    INSERT INTO кэш_fcr (начало_периода, конец_периода, aquarium_id, seafood_id,
+                         корм, биомасса_начало, биомасса_конец)
+    SELECT %(start)s, %(end)s,
+           COALESCE(f.aquarium_id, b.aquarium_id),
+           COALESCE(f.seafood_id, b.seafood_id),
+           COALESCE(f.корм, 0), b.начало, b.конец
+    FROM корм f
+    FULL JOIN биомасса b ON b.aquarium_id = f.aquarium_id AND b.seafood_id = f.seafood_id
+"""
+
+# FCR считается только по парам аквариум-вид, для которых известен прирост биомассы
+# (не меньше двух замеров за период): корм остальных пар не входит ни в числитель,
+# ни в знаменатель. При нулевом или отрицательном приросте коэффициент не определен
+RANKING_COLUMNS = """
+    SUM(c.корм) AS корм,
+    SUM(c.биомасса_конец - c.биомасса_начало) AS прирост,
+    CASE WHEN SUM(c.биомасса_конец - c.биомасса_начало) > 0
+         THEN SUM(c.корм) FILTER (WHERE c.биомасса_начало IS NOT NULL AND c.биомасса_конец IS NOT NULL)
+              / SUM(c.биомасса_конец - c.биомасса_начало)
+    END AS fcr
+"""
+
+
+def _data_marks(cursor, start, end):
+    """Отметки данных, от которых зависит расчет: по ним определяется устаревание кэша.
+
+    Для замеров периода берутся их число и наибольший номер транзакции
+    (xmin) строки: новая или исправленная строка увеличивает xmin, а
+    удаленная уменьшает число.
+    """
+    cursor.execute("SELECT COALESCE(MAX(последний_id), 0) FROM отметки_сводок WHERE таблица = 'кормления'")
+    feed_mark = cursor.fetchone()[0]
+    cursor.execute("""
+        SELECT COALESCE(MAX(xmin::text::bigint), 0), count(*)
+        FROM состояние_особей
+        WHERE дата_замера >= %s AND дата_замера < %s::date + 1
+    """, (start, end))
+    state_mark, state_count = cursor.fetchone()
+    return feed_mark, state_mark, state_count
+
+
+def ensure_period(conn, start, end):
+    """Рассчитывает FCR за период, если в кэше нет актуального результата.
+
+    Возвращает True, если расчет выполнялся. Кэш периода считается
+    устаревшим, когда после расчета появились новые кормления или замеры
+    периода были добавлены, исправлены или удалены.
+    """
+    refresh_rollup(conn, "кормления")
+    try:
+        with conn.cursor() as cursor:
+            # Блокировка периода, а не его строки кэша: пока периода нет в кэше,
+            # блокировать нечего, и параллельные расчеты столкнулись бы на вставке
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))",
+                           (LOCK_CLASS, f"{start}:{end}"))
+            marks = _data_marks(cursor, start, end)
+            cursor.execute("""
+                SELECT отметка_кормлений, отметка_замеров, замеров FROM периоды_fcr
+                WHERE начало_периода = %s AND конец_периода = %s
+            """, (start, end))
+            row = cursor.fetchone()
+            if row == marks:
+                conn.commit()
+                return False
+
+            cursor.execute("DELETE FROM периоды_fcr WHERE начало_периода = %s AND конец_периода = %s",
+                           (start, end))
+            cursor.execute("""
+                INSERT INTO периоды_fcr (начало_периода, конец_периода, отметка_кормлений,
+                                         отметка_замеров, замеров)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (start, end) + marks)
+            cursor.execute(COMPUTE_QUERY, {"start": start, "end": end})
+            # Вытесняем давно рассчитанные периоды (строки кэша удаляются каскадно)
+            cursor.execute("""
+                DELETE FROM периоды_fcr
+                WHERE (начало_периода, конец_периода) NOT IN (
+                    SELECT начало_периода, конец_периода FROM периоды_fcr
+                    ORDER BY рассчитано DESC
+                    LIMIT %s
+                )
+            """, (MAX_CACHED_PERIODS,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def fcr_by_aquarium(conn, start, end):
+    """Рейтинг аквариумов по FCR за период: (aquarium_id, тип, корм, прирост, fcr)"""
+    ensure_period(conn, start, end)
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT c.aquarium_id, a.тип_аквариума, {RANKING_COLUMNS}
+            FROM кэш_fcr c
+            LEFT JOIN аквариумы a ON a.aquarium_id = c.aquarium_id
+            WHERE c.начало_периода = %s AND c.конец_периода = %s
+            GROUP BY c.aquarium_id, a.тип_аквариума
+            ORDER BY fcr NULLS LAST, c.aquarium_id
+        """, (start, end))
+        return cursor.fetchall()
+
+
+def fcr_by_species(conn, start, end):
+    """Рейтинг видов по FCR за период: (seafood_id, название, корм, прирост, fcr)"""
+    ensure_period(conn, start, end)
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT c.seafood_id, m.название_вида, {RANKING_COLUMNS}
+            FROM кэш_fcr c
+            LEFT JOIN морепродукты m ON m.seafood_id = c.seafood_id
+            WHERE c.начало_периода = %s AND c.конец_периода = %s
+            GROUP BY c.seafood_id, m.название_вида
+            ORDER BY fcr NULLS LAST, c.seafood_id
+        """, (start, end))
+        return cursor.fetchall()
+
+
+def main(argv=None):
+    from connection import get_db_connection
+
+    today = date.today()
+    parser = argparse.ArgumentParser(description="Коэффициент конверсии корма (FCR) за период")
+    parser.add_argument("--start", type=date.fromisoformat, default=today - timedelta(days=30),
+                        help="начало периода, ГГГГ-ММ-ДД (по умолчанию 30 дней назад)")
+    parser.add_argument("--end", type=date.fromisoformat, default=today, help="конец периода включительно")
+    parser.add_argument("--by", choices=("aquarium", "species"), default="aquarium")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    try:
+        ranking = fcr_by_aquarium if args.by == "aquarium" else fcr_by_species
+        rows = ranking(conn, args.start, args.end)
+    finally:
+        conn.close()
+
+    for record_id, name, feed, gain, fcr in rows:
+        fcr_text = f"{fcr:.2f}" if fcr is not None else "—"
+        print(f"{record_id}\t{name or 'Не указан'}\tкорм {feed}\tприрост {gain}\tFCR {fcr_text}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import argparse
+import sys
+from bisect import bisect_left, insort
+
+from psycopg2.extras import execute_values
+
+from services.audit import log_change
+
+# Партия размещается только в исправных холодильниках
+WORKING_STATE = "Рабочее"
+
+
+class Fridge:
+    """Холодильник при распределении: вид, срок хранения, заполненность"""
+
+    def __init__(self, fridge_id, seafood_id, shelf_life, quantity, capacity):
+        self.fridge_id = fridge_id
+        self.seafood_id = seafood_id
+        self.shelf_life = shelf_life
+        self.quantity = quantity or 0
+        self.capacity = capacity or 0
+
+    @property
+    def free(self):
+        return self.capacity - self.quantity
+
+    @property
+    def empty(self):
+        return self.quantity <= 0
+
+
+class Allocator:
+    """Распределение партий по холодильникам (эвристика Best Fit).
+
+    В холодильнике хранится один вид с одним сроком хранения, поэтому
+    партия дополняет холодильники своей группы (вид, срок) и только потом
+    занимает пустые. Внутри группы свободные места хранятся отсортированными,
+    так что выбор холодильника - двоичный поиск: если остаток партии
+    помещается целиком, берется холодильник с наименьшим достаточным
+    местом, иначе - с наибольшим, чтобы задействовать как можно меньше
+    холодильников.
+    """
+
+    def __init__(self, fridges):
+        self.fridges = {fridge.fridge_id: fridge for fridge in fridges}
+        self.groups = {}  # (вид, срок) -> [(свободно, fridge_id)], по возрастанию
+        self.empty = []  # Пустые холодильники: [(вместимость, fridge_id)]
+        for fridge in fridges:
+            if fridge.free <= 0:
+                continue
+            if fridge.empty:
+                insort(self.empty, (fridge.free, fridge.fridge_id))
+            else:
+                insort(self.groups.setdefault((fridge.seafood_id, fridge.shelf_life), []),
+                       (fridge.free, fridge.fridge_id))
+
+    @staticmethod
+    def _take(pool, remaining):
+        i = bisect_left(pool, (remaining,))
+        return pool.pop(i) if i < len(pool) else pool.pop()
+
+    def allocate(self, seafood_id, quantity, shelf_life):
+        """Размещает партию. Возвращает ([(fridge_id, количество)], неразмещенный остаток)."""
+        group = self.groups.setdefault((seafood_id, shelf_life), [])
+        placed = []
+        remaining = quantity
+        while remaining > 0 and (group or self.empty):
+            pool = group if group else self.empty
+            free, fridge_id = self._take(pool, remaining)
+            amount = min(free, remaining)
+            fridge = self.fridges[fridge_id]
+            fridge.seafood_id = seafood_id
+            fridge.shelf_life = shelf_life
+            fridge.quantity += amount
+            remaining -= amount
+            placed.append((fridge_id, amount))
+            if fridge.free > 0:
+                insort(group, (fridge.free, fridge_id))
+        return placed, remaining
+
+    def allocate_all(self, batches):
+        """Размещает несколько партий (вид, количество, срок), крупные - первыми.
+
+        Возвращает список (партия, размещение, остаток) в исходном порядке партий.
+        """
+        order = sorted(range(len(batches)), key=lambda i: batches[i][1], reverse=True)
+        results = [None] * len(batches)
+        for i in order:
+            results[i] = (batches[i],) + self.allocate(*batches[i])
+        return results
+
+
+def _audit_fields(fridge):
+    return {"seafood_id": fridge.seafood_id, "срок_хранения": fridge.shelf_life, "количество": fridge.quantity}
+
+
+def _load_fridges(cursor, lock):
+    cursor.execute(f"""
+        SELECT fridge_id, seafood_id, срок_хранения, количество, вместимость
+        FROM холодильники
+        WHERE состояние_холодильника = %s AND вместимость > 0
+        ORDER BY fridge_id
+        {"FOR UPDATE" if lock else ""}
+    """, (WORKING_STATE,))
+    return [Fridge(*row) for row in cursor.fetchall()]
+
+
+def plan_batch(conn, seafood_id, quantity, shelf_life):
+    """Предварительный расчет размещения без записи: ([(fridge_id, количество)], остаток)"""
+    with conn.cursor() as cursor:
+        fridges = _load_fridges(cursor, lock=False)
+    return Allocator(fridges).allocate(seafood_id, quantity, shelf_life)
+
+
+def allocate_batch(conn, seafood_id, quantity, shelf_life, allow_partial=False):
+    """Размещает партию и записывает изменения холодильников одной транзакцией.
+
+    Холодильники блокируются на время расчета, поэтому параллельное
+    размещение не превысит вместимость. Если партия не помещается целиком
+    и allow_partial не задан, ничего не записывается.
+    Возвращает ([(fridge_id, количество)], неразмещенный остаток).
+    """
+    try:
+        with conn.cursor() as cursor:
+            fridges = _load_fridges(cursor, lock=True)
+            before = {fridge.fridge_id: _audit_fields(fridge) for fridge in fridges}
+            allocator = Allocator(fridges)
+            placed, remaining = allocator.allocate(seafood_id, quantity, shelf_life)
+            updates = []
+            if placed and (remaining == 0 or allow_partial):
+                for fridge_id, _ in placed:
+                    fridge = allocator.fridges[fridge_id]
+                    updates.append((fridge_id, fridge.seafood_id, fridge.shelf_life, fridge.quantity))
+                execute_values(cursor, """
+                    UPDATE холодильники f
+                    SET seafood_id = v.seafood_id, срок_хранения = v.срок, количество = v.количество
+                    FROM (VALUES %s) AS v (fridge_id, seafood_id, срок, количество)
+                    WHERE f.fridge_id = v.fridge_id
+                """, updates)
+                conn.commit()
+            else:
+                conn.rollback()
+    except Exception:
+        conn.rollback()
+        raise
+    for fridge_id, *_ in updates:
+        log_change("холодильники", fridge_id, "UPDATE",
+                   before=before[fridge_id], after=_audit_fields(allocator.fridges[fridge_id]))
+    return placed, remaining
+
+
+def main(argv=None):
+    from connection import get_db_connection
+
+    parser = argparse.ArgumentParser(description="Размещение партии продукции по холодильникам")
+    parser.add_argument("seafood_id", type=int)
+    parser.add_argument("quantity", type=int)
+    parser.add_argument("shelf_life", type=int, help="срок хранения партии")
+    parser.add_argument("--apply", action="store_true", help="записать размещение (по умолчанию - только расчет)")
+    parser.add_argument("--partial", action="store_true", help="записать, даже если партия не помещается целиком")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    try:
+        if args.apply:
+            placed, remaining = allocate_batch(conn, args.seafood_id, args.quantity, args.shelf_life, args.partial)
+        else:
+            placed, remaining = plan_batch(conn, args.seafood_id, args.quantity, args.shelf_life)
+    finally:
+        conn.close()
+
+    for fridge_id, amount in placed:
+        print(f"холодильник {fridge_id}: {amount}")
+    if remaining:
+        written = " (размещение не записано)" if args.apply and not args.partial else ""
+        print(f"Не помещается: {remaining}{written}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
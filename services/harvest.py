@@ -0,0 +1,139 @@
+import argparse
+import sys
+
+# Отметка последнего учтенного замера хранится вместе с отметками сводок
+MARK_NAME = "оценка_готовности"
+
+# Последний замер каждого вида в аквариумах с новыми замерами (или во всех)
+# сравнивается с последней записью требований к продаже этого вида.
+# Готовность - наименьшее из отношений текущего веса и размера к требуемым
+# (незаданное требование не учитывается): 1 и больше - можно собирать
+EVALUATE_QUERY = """
+    INSERT INTO оценка_готовности
+        (aquarium_id, seafood_id, health_id, дата_замера, живых_особей, средний_вес, средний_размер,
+         требуемый_вес, требуемый_размер, готовность, ожидаемый_выход)
+    SELECT z.aquarium_id, z.seafood_id, z.health_id, z.дата_замера, z.живых,
+           z.средний_текущий_вес, z.средний_текущий_размер,
+           t.требуемый_вес_к_продаже, t.требуемый_размер_к_продаже,
+           LEAST(z.средний_текущий_вес / NULLIF(t.требуемый_вес_к_продаже, 0),
+                 z.средний_текущий_размер / NULLIF(t.требуемый_размер_к_продаже, 0)),
+           z.живых * z.средний_текущий_вес
+    FROM (
+        SELECT DISTINCT ON (s.aquarium_id, s.seafood_id)
+               s.aquarium_id, s.seafood_id, s.health_id, s.дата_замера,
+               GREATEST(COALESCE(s.общее_количество, 0) - COALESCE(s.количество_умерших, 0), 0) AS живых,
+               s.средний_текущий_вес, s.средний_текущий_размер
+        FROM состояние_особей s
+        JOIN морепродукты m ON m.seafood_id = s.seafood_id AND m.aquarium_id = s.aquarium_id
+        WHERE %(full)s OR s.aquarium_id = ANY(%(aquariums)s)
+        ORDER BY s.aquarium_id, s.seafood_id, s.дата_замера DESC, s.health_id DESC
+    ) z
+    LEFT JOIN LATERAL (
+        SELECT требуемый_вес_к_продаже, требуемый_размер_к_продаже
+        FROM готовность_продукции
+        WHERE seafood_id = z.seafood_id
+        ORDER BY readiness_id DESC
+        LIMIT 1
+    ) t ON TRUE
+"""
+
+
+def evaluate_readiness(conn, full=False):
+    """Пересчитывает оценку готовности аквариумов, у которых появились новые замеры.
+
+    full=True пересчитывает все аквариумы - нужно после изменения требований
+    к продаже в готовность_продукции. Возвращает число пересчитанных аквариумов.
+    """
+    try:
+        with conn.cursor() as cursor:
+            # Как и для сводок: после блокировки SHARE все номера замеров
+            # не больше максимума уже зафиксированы
+            cursor.execute("LOCK TABLE состояние_особей IN SHARE MODE")
+            cursor.execute("SELECT COALESCE(MAX(health_id), 0) FROM состояние_особей")
+            upper = cursor.fetchone()[0]
+        conn.commit()
+
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO отметки_сводок (таблица) VALUES (%s)
+                ON CONFLICT (таблица) DO NOTHING
+            """, (MARK_NAME,))
+            cursor.execute("SELECT последний_id FROM отметки_сводок WHERE таблица = %s FOR UPDATE",
+                           (MARK_NAME,))
+            mark = cursor.fetchone()[0]
+
+            if full:
+                cursor.execute("SELECT aquarium_id FROM аквариумы")
+            else:
+                cursor.execute("""
+                    SELECT DISTINCT aquarium_id FROM состояние_особей
+                    WHERE health_id > %s AND health_id <= %s AND aquarium_id IS NOT NULL
+                """, (mark, upper))
+            aquariums = [row[0] for row in cursor.fetchall()]
+
+            if aquariums:
+                # Оценки аквариума заменяются целиком: виды, убранные из аквариума, исчезают из списка
+                if full:
+                    cursor.execute("DELETE FROM оценка_готовности")
+                else:
+                    cursor.execute("DELETE FROM оценка_готовности WHERE aquarium_id = ANY(%s)", (aquariums,))
+                cursor.execute(EVALUATE_QUERY, {"full": full, "aquariums": aquariums})
+            cursor.execute("""
+                UPDATE отметки_сводок SET последний_id = GREATEST(последний_id, %s) WHERE таблица = %s
+            """, (upper, MARK_NAME))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(aquariums)
+
+
+def harvest_list(conn, ready_only=False):
+    """Список к сбору: сначала готовые партии по ожидаемому выходу, затем остальные по готовности.
+
+    Строки: (aquarium_id, seafood_id, вид, живых особей, средний вес, средний размер,
+    требуемый вес, требуемый размер, готовность, ожидаемый выход, дата замера).
+    Готовность None - для вида не заданы требования к продаже.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT r.aquarium_id, r.seafood_id, m.название_вида, r.живых_особей,
+                   r.средний_вес, r.средний_размер, r.требуемый_вес, r.требуемый_размер,
+                   r.готовность, r.ожидаемый_выход, r.дата_замера
+            FROM оценка_готовности r
+            JOIN морепродукты m ON m.seafood_id = r.seafood_id AND m.aquarium_id = r.aquarium_id
+            WHERE r.живых_особей > 0
+              AND (NOT %s OR r.готовность >= 1)
+            ORDER BY r.готовность >= 1 DESC NULLS LAST,
+                     CASE WHEN r.готовность >= 1 THEN r.ожидаемый_выход END DESC NULLS LAST,
+                     r.готовность DESC NULLS LAST,
+                     r.aquarium_id, r.seafood_id
+        """, (ready_only,))
+        return cursor.fetchall()
+
+
+def main(argv=None):
+    from connection import get_db_connection
+
+    parser = argparse.ArgumentParser(description="Оценка готовности морепродуктов к сбору")
+    parser.add_argument("--full", action="store_true",
+                        help="пересчитать все аквариумы (после изменения требований к продаже)")
+    parser.add_argument("--ready", action="store_true", help="выводить только готовые к сбору")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    try:
+        updated = evaluate_readiness(conn, args.full)
+        print(f"Пересчитано аквариумов: {updated}")
+        for (aquarium_id, seafood_id, name, alive, weight, size, _, _, readiness, expected,
+             measured_at) in harvest_list(conn, args.ready):
+            readiness_text = f"{readiness:.0%}" if readiness is not None else "нет требований"
+            print(f"аквариум {aquarium_id:>5}  {name or seafood_id:<20} особей {alive:>7} "
+                  f"готовность {readiness_text:>14}  выход {expected or 0:>10.2f}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+# Оценка общего состояния аквариума по результатам проверки (0-100 баллов)
+
+
+def health_score(filter_state, glass_state, algae_level, water_clarity):
+    """Рассчитывает оценку состояния аквариума в баллах"""
+    # Преобразуем все значения к float для вычислений
+    filter_state = float(filter_state)
+    glass_state = float(glass_state)
+    algae_level = float(algae_level)
+    water_clarity = float(water_clarity)
+
+    score = 0.0
+
+    # Фильтр (макс 30 баллов)
+    score += filter_state * 10
+
+    # Стекло (макс 20 баллов)
+    score += glass_state * 10
+
+    # Водоросли (макс 20 баллов)
+    score += max(0.0, 20.0 - (algae_level / 5.0))
+
+    # Прозрачность (макс 30 баллов)
+    score += water_clarity * 0.3
+    return score
+
+
+def health_grade(score):
+    """Переводит оценку в баллах в уровень состояния"""
+    if score >= 80.0:
+        return "Отличное"
+    elif score >= 60.0:
+        return "Хорошее"
+    elif score >= 40.0:
+        return "Удовлетворительное"
+    else:
+        return "Критическое"
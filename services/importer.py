@@ -0,0 +1,79 @@
+import argparse
+import csv
+import os
+import sys
+
+from psycopg2 import sql
+
+from services.export import EXPORT_TABLES
+
+
+def read_header(path):
+    """Столбцы CSV-файла из строки заголовка"""
+    with open(path, encoding="utf-8", newline="") as f:
+        header = next(csv.reader(f), None)
+    if not header:
+        raise ValueError(f"В файле {path} нет строки заголовка")
+    return header
+
+
+def reset_sequences(cursor, table):
+    """Сдвигает счетчики SERIAL-столбцов за максимальный загруженный ID"""
+    cursor.execute("""
+        SELECT a.attname, pg_get_serial_sequence(quote_ident(%s), a.attname)
+        FROM pg_attribute a
+        WHERE a.attrelid = quote_ident(%s)::regclass AND a.attnum > 0 AND NOT a.attisdropped
+    """, (table, table))
+    for column, sequence in cursor.fetchall():
+        if sequence is None:
+            continue
+        cursor.execute(sql.SQL("SELECT setval(%s, GREATEST(MAX({0}), 1), MAX({0}) IS NOT NULL) FROM {1}").format(
+            sql.Identifier(column), sql.Identifier(table)), (sequence,))
+
+
+def import_csv(conn, table, path):
+    """Загружает CSV-файл (в формате выгрузки services/export.py) в таблицу.
+
+    Данные передаются серверу через COPY ... FROM STDIN одной транзакцией:
+    при ошибке в любой строке не загружается ничего. Столбцы берутся из
+    заголовка файла. Возвращает число загруженных строк.
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Таблица {table} недоступна для загрузки")
+
+    columns = read_header(path)
+    copy_sql = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, HEADER)").format(
+        sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns)))
+    try:
+        with conn.cursor() as cursor, open(path, encoding="utf-8", newline="") as f:
+            cursor.copy_expert(copy_sql, f)
+            count = cursor.rowcount
+            reset_sequences(cursor, table)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return count
+
+
+def main(argv=None):
+    from connection import get_db_connection
+
+    parser = argparse.ArgumentParser(description="Загрузка таблиц из CSV (формат выгрузки)")
+    parser.add_argument("table", choices=sorted(EXPORT_TABLES), help="таблица для загрузки")
+    parser.add_argument("path", help="CSV-файл с заголовком")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.path):
+        parser.error(f"файл не найден: {args.path}")
+
+    conn = get_db_connection()
+    try:
+        count = import_csv(conn, args.table, args.path)
+    finally:
+        conn.close()
+    print(f"Загружено строк: {count} -> {args.table}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+# Канал уведомлений триггера параметры_воды_уведомление (create_db.py)
+CHANNEL = "water_parameters"
+
+
+def listen(conn):
+    """Подписывает соединение на уведомления о новых показаниях.
+
+    Соединение переводится в autocommit: уведомления доставляются только
+    вне открытой транзакции.
+    """
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"LISTEN {CHANNEL}")
+
+
+def notified_aquariums(conn):
+    """Забирает накопившиеся уведомления.
+
+    Возвращает множество номеров аквариумов с новыми показаниями, None -
+    если затронуты любые аквариумы (уведомление без списка), или пустое
+    множество, если уведомлений не было.
+    """
+    conn.poll()
+    aquariums = set()
+    while conn.notifies:
+        payload = conn.notifies.pop(0).payload
+        if not payload:
+            conn.notifies.clear()
+            return None
+        aquariums.update(int(value) for value in payload.split(","))
+    return aquariums
+
+
+def fetch_since(conn, aquarium_id, last_id=None, limit=500):
+    """Последние показания аквариума с номером больше last_id, от старых к новым.
+
+    Без last_id возвращает последние limit показаний - начальное заполнение графика.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT parameter_id, дата_измерения, температура, pH, уровень_кислорода
+            FROM (
+                SELECT parameter_id, дата_измерения, температура, pH, уровень_кислорода
+                FROM параметры_воды
+                WHERE aquarium_id = %s AND parameter_id > %s
+                ORDER BY parameter_id DESC
+                LIMIT %s
+            ) AS последние
+            ORDER BY parameter_id
+        """, (aquarium_id, last_id or 0, limit))
+        return cursor.fetchall()
@@ -0,0 +1,199 @@
+import argparse
+import sys
+from datetime import timedelta
+
+from psycopg2.extras import execute_values
+
+# Отметка последней учтенной проверки хранится вместе с отметками сводок
+MARK_NAME = "задачи_обслуживания"
+
+# Приоритеты задач
+URGENT, NORMAL, LOW = 3, 2, 1
+PRIORITY_TITLES = {URGENT: "Срочно", NORMAL: "Обычный", LOW: "Низкий"}
+
+
+def _filter_task(filter_state, glass_state, algae_level, water_clarity):
+    if filter_state == 0:
+        return "Ремонт фильтра", URGENT, 4
+    if filter_state == 1:
+        return "Очистка фильтра", NORMAL, 24
+    return None
+
+
+def _glass_task(filter_state, glass_state, algae_level, water_clarity):
+    if glass_state == 0:
+        return "Очистка стекла (сильные загрязнения)", NORMAL, 24
+    if glass_state == 1:
+        return "Очистка стекла", LOW, 72
+    return None
+
+
+def _algae_task(filter_state, glass_state, algae_level, water_clarity):
+    if algae_level is not None and algae_level >= 60:
+        return "Удаление водорослей", NORMAL, 24
+    if algae_level is not None and algae_level >= 30:
+        return "Удаление водорослей", LOW, 72
+    return None
+
+
+def _water_task(filter_state, glass_state, algae_level, water_clarity):
+    if water_clarity is not None and water_clarity < 50:
+        return "Подмена воды (низкая прозрачность)", URGENT, 12
+    if water_clarity is not None and water_clarity < 70:
+        return "Подмена воды", LOW, 72
+    return None
+
+
+# Вид работ -> правило: по результатам проверки возвращает
+# (описание, приоритет, срок в часах от проверки) или None, если работы не нужны
+RULES = {
+    "фильтр": _filter_task,
+    "стекло": _glass_task,
+    "водоросли": _algae_task,
+    "вода": _water_task,
+}
+
+
+def tasks_for_inspection(filter_state, glass_state, algae_level, water_clarity):
+    """Задачи по одной проверке: {вид работ: (описание, приоритет, часов до срока) или None}"""
+    return {kind: rule(filter_state, glass_state, algae_level, water_clarity) for kind, rule in RULES.items()}
+
+
+def update_tasks(conn):
+    """Пересчитывает задачи аквариумов, у которых появились новые проверки.
+
+    По каждому такому аквариуму берется его последняя проверка: нужные
+    работы добавляются в очередь (или уточняются у уже открытой задачи),
+    а задачи, работы по которым проверка больше не требует, закрываются.
+    Возвращает число пересчитанных аквариумов.
+    """
+    try:
+        with conn.cursor() as cursor:
+            # Как и для сводок: после блокировки SHARE все номера проверок
+            # не больше максимума уже зафиксированы
+            cursor.execute("LOCK TABLE состояние_аквариума IN SHARE MODE")
+            cursor.execute("SELECT COALESCE(MAX(aquarium_state_id), 0) FROM состояние_аквариума")
+            upper = cursor.fetchone()[0]
+        conn.commit()
+
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO отметки_сводок (таблица) VALUES (%s)
+                ON CONFLICT (таблица) DO NOTHING
+            """, (MARK_NAME,))
+            cursor.execute("SELECT последний_id FROM отметки_сводок WHERE таблица = %s FOR UPDATE",
+                           (MARK_NAME,))
+            mark = cursor.fetchone()[0]
+            if mark >= upper:
+                conn.commit()
+                return 0
+
+            cursor.execute("""
+                SELECT DISTINCT ON (s.aquarium_id)
+                       s.aquarium_id, s.aquarium_state_id, s.дата_проверки,
+                       s.состояние_фильтра, s.состояние_стекла, s.уровень_водорослей, s.прозрачность_воды
+                FROM состояние_аквариума s
+                JOIN аквариумы a ON a.aquarium_id = s.aquarium_id
+                WHERE s.aquarium_id IN (
+                    SELECT aquarium_id FROM состояние_аквариума
+                    WHERE aquarium_state_id > %s AND aquarium_state_id <= %s
+                )
+                ORDER BY s.aquarium_id, s.дата_проверки DESC, s.aquarium_state_id DESC
+            """, (mark, upper))
+            inspections = cursor.fetchall()
+
+            needed = []
+            resolved = []
+            for aquarium_id, state_id, checked_at, *state in inspections:
+                for kind, task in tasks_for_inspection(*state).items():
+                    if task is None:
+                        resolved.append((aquarium_id, kind, checked_at))
+                    else:
+                        description, priority, hours = task
+                        needed.append((aquarium_id, kind, description, priority,
+                                       checked_at + timedelta(hours=hours), state_id))
+
+            if needed:
+                # Повторная проверка не отодвигает срок уже открытой задачи
+                execute_values(cursor, """
+                    INSERT INTO задачи_обслуживания
+                        (aquarium_id, вид_работ, описание, приоритет, срок, aquarium_state_id)
+                    VALUES %s
+                    ON CONFLICT (aquarium_id, вид_работ) WHERE выполнено IS NULL DO UPDATE SET
+                        описание = EXCLUDED.описание,
+                        приоритет = EXCLUDED.приоритет,
+                        срок = LEAST(задачи_обслуживания.срок, EXCLUDED.срок),
+                        aquarium_state_id = EXCLUDED.aquarium_state_id
+                """, needed)
+            if resolved:
+                execute_values(cursor, """
+                    UPDATE задачи_обслуживания t SET выполнено = v.дата
+                    FROM (VALUES %s) AS v (aquarium_id, вид_работ, дата)
+                    WHERE t.aquarium_id = v.aquarium_id AND t.вид_работ = v.вид_работ
+                      AND t.выполнено IS NULL
+                """, resolved)
+            cursor.execute("UPDATE отметки_сводок SET последний_id = %s WHERE таблица = %s",
+                           (upper, MARK_NAME))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(inspections)
+
+
+def worklist(conn, aquarium_id=None, limit=None):
+    """Открытые задачи по сроку, при равном сроке - по приоритету.
+
+    Строки: (task_id, aquarium_id, тип аквариума, описание, приоритет, срок).
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT t.task_id, t.aquarium_id, a.тип_аквариума, t.описание, t.приоритет, t.срок
+            FROM задачи_обслуживания t
+            JOIN аквариумы a ON a.aquarium_id = t.aquarium_id
+            WHERE t.выполнено IS NULL
+              AND (%s::int IS NULL OR t.aquarium_id = %s::int)
+            ORDER BY t.срок, t.приоритет DESC
+            LIMIT %s
+        """, (aquarium_id, aquarium_id, limit))
+        return cursor.fetchall()
+
+
+def complete_task(conn, task_id, user_id=None):
+    """Отмечает задачу выполненной. Возвращает False, если она уже закрыта."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE задачи_обслуживания SET выполнено = CURRENT_TIMESTAMP, выполнил = %s
+                WHERE task_id = %s AND выполнено IS NULL
+            """, (user_id, task_id))
+            done = cursor.rowcount == 1
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return done
+
+
+def main(argv=None):
+    from connection import get_db_connection
+
+    parser = argparse.ArgumentParser(description="Пересчет задач обслуживания по новым проверкам аквариумов")
+    parser.add_argument("--list", action="store_true", help="вывести очередь открытых задач")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    try:
+        updated = update_tasks(conn)
+        print(f"Пересчитано аквариумов: {updated}")
+        if args.list:
+            for task_id, aquarium_id, aquarium_type, description, priority, due in worklist(conn):
+                print(f"{due:%Y-%m-%d %H:%M}  [{PRIORITY_TITLES.get(priority, priority)}] "
+                      f"аквариум {aquarium_id} ({aquarium_type}): {description}  (задача {task_id})")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,404 @@
+import argparse
+import base64
+import html
+import io
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+from services.health import health_score
+
+REPORT_FORMATS = ("html", "pdf")
+
+PAGE_SIZE = (8.27, 11.69)  # A4, дюймы
+DPI = 110
+# Сколько разделов отдается процессу за раз: меньше накладных расходов на передачу
+CHUNKSIZE = 4
+# Меньше разделов проще нарисовать в текущем процессе, чем запускать пул
+MIN_PARALLEL_SECTIONS = 8
+
+AQUARIUMS_QUERY = """
+    SELECT a.aquarium_id, a.тип_аквариума, a.статус,
+           string_agg(m.название_вида, ', ' ORDER BY m.название_вида)
+    FROM аквариумы a
+    LEFT JOIN морепродукты m ON m.aquarium_id = a.aquarium_id
+    WHERE (%(aquarium_ids)s::int[] IS NULL OR a.aquarium_id = ANY(%(aquarium_ids)s::int[]))
+    GROUP BY a.aquarium_id
+    ORDER BY a.aquarium_id
+"""
+
+# История за период берется из суточных сводок одним запросом на все аквариумы
+WATER_QUERY = """
+    SELECT aquarium_id, день,
+           сумма_температуры / NULLIF(количество_температуры, 0),
+           сумма_ph / NULLIF(количество_ph, 0),
+           сумма_кислорода / NULLIF(количество_кислорода, 0)
+    FROM сводка_параметров_воды
+    WHERE день >= %(start)s AND день < %(end)s
+    ORDER BY aquarium_id, день
+"""
+
+FEEDINGS_QUERY = """
+    SELECT aquarium_id, день, SUM(количество_кормлений), SUM(объем_корма)
+    FROM сводка_кормлений
+    WHERE день >= %(start)s AND день < %(end)s
+    GROUP BY aquarium_id, день
+    ORDER BY aquarium_id, день
+"""
+
+DEATHS_QUERY = """
+    SELECT aquarium_id, день, SUM(умерших), SUM(с_повреждениями)
+    FROM сводка_состояния_особей
+    WHERE день >= %(start)s AND день < %(end)s
+    GROUP BY aquarium_id, день
+    ORDER BY aquarium_id, день
+"""
+
+INSPECTIONS_QUERY = """
+    SELECT aquarium_id, дата_проверки,
+           состояние_фильтра, состояние_стекла, уровень_водорослей, прозрачность_воды
+    FROM состояние_аквариума
+    WHERE дата_проверки >= %(start)s AND дата_проверки < %(end)s
+    ORDER BY aquarium_id, дата_проверки
+"""
+
+FRIDGES_QUERY = """
+    SELECT COALESCE(m.название_вида, 'Пусто'), f.состояние_холодильника,
+           COUNT(*), COALESCE(SUM(f.количество), 0), COALESCE(SUM(f.вместимость), 0)
+    FROM холодильники f
+    LEFT JOIN морепродукты m ON m.seafood_id = f.seafood_id
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+"""
+
+
+def detect_format(path, fmt=None):
+    """Определяет формат отчета по явному указанию или расширению файла"""
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат отчета: {fmt or 'не указан'}")
+    return fmt
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _group_by_aquarium(cursor, query, params, convert):
+    groups = {}
+    cursor.execute(query, params)
+    for aquarium_id, *values in cursor.fetchall():
+        groups.setdefault(aquarium_id, []).append(convert(values))
+    return groups
+
+
+def load_report_data(conn, start, end, aquarium_ids=None):
+    """Читает данные отчета за период [start, end).
+
+    Возвращает (разделы аквариумов, данные по ферме). Разделы содержат
+    только даты и числа, поэтому дешево передаются в процессы отрисовки.
+    """
+    params = {"start": start, "end": end, "aquarium_ids": list(aquarium_ids) if aquarium_ids else None}
+    with conn.cursor() as cursor:
+        cursor.execute(AQUARIUMS_QUERY, params)
+        aquariums = cursor.fetchall()
+        water = _group_by_aquarium(cursor, WATER_QUERY, params,
+                                   lambda v: (v[0], _float(v[1]), _float(v[2]), _float(v[3])))
+        feedings = _group_by_aquarium(cursor, FEEDINGS_QUERY, params,
+                                      lambda v: (v[0], int(v[1]), _float(v[2])))
+        deaths = _group_by_aquarium(cursor, DEATHS_QUERY, params,
+                                    lambda v: (v[0], int(v[1]), int(v[2])))
+        inspections = _group_by_aquarium(cursor, INSPECTIONS_QUERY, params,
+                                         lambda v: (v[0], health_score(*v[1:]) if None not in v[1:] else None))
+        cursor.execute(FRIDGES_QUERY)
+        fridges = [(name, state, count, int(stock), int(capacity))
+                   for name, state, count, stock, capacity in cursor.fetchall()]
+
+    sections = []
+    for aquarium_id, aquarium_type, status, species in aquariums:
+        sections.append({
+            "aquarium_id": aquarium_id,
+            "title": f"Аквариум {aquarium_id}: {aquarium_type or 'без типа'}",
+            "status": status or "",
+            "species": species or "",
+            "water": water.get(aquarium_id, []),
+            "feedings": feedings.get(aquarium_id, []),
+            "deaths": deaths.get(aquarium_id, []),
+            "inspections": inspections.get(aquarium_id, []),
+        })
+    return sections, {"start": start, "end": end, "fridges": fridges}
+
+
+def refresh_rollups():
+    """Дописывает в суточные сводки историю, накопившуюся с их последнего обновления.
+
+    Отчет читает только сводки, поэтому без обновления в него не попали
+    бы дни после последнего запуска "aquafarm rollups". Сводки пишутся на
+    основном сервере на отдельном соединении; позиция журнала после записи
+    запоминается, поэтому get_reporting_connection() выберет только реплику,
+    уже воспроизведшую обновление, а иначе - основной сервер.
+    """
+    from connection import get_db_connection, note_write
+    from services.rollups import refresh_all
+
+    conn = get_db_connection()
+    try:
+        result = refresh_all(conn)
+        note_write(conn)
+        return result
+    finally:
+        conn.close()
+
+
+def summarize(section):
+    """Итоги раздела аквариума для сводной таблицы"""
+    def mean(index):
+        values = [row[index] for row in section["water"] if row[index] is not None]
+        return sum(values) / len(values) if values else None
+
+    scores = [row[1] for row in section["inspections"] if row[1] is not None]
+    return {
+        "aquarium_id": section["aquarium_id"],
+        "title": section["title"],
+        "species": section["species"],
+        "температура": mean(1),
+        "ph": mean(2),
+        "кислород": mean(3),
+        "корм": sum(row[2] or 0 for row in section["feedings"]),
+        "умерших": sum(row[1] for row in section["deaths"]),
+        "состояние": scores[-1] if scores else None,
+    }
+
+
+def _png(figure):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    FigureCanvasAgg(figure)
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png", dpi=DPI)
+    return buffer.getvalue()
+
+
+def _plot_lines(ax, rows, columns, title):
+    for index, label in columns:
+        points = [(row[0], row[index]) for row in rows if row[index] is not None]
+        if points:
+            ax.plot(*zip(*points), marker=".", label=label)
+    ax.set_title(title, fontsize=10)
+    ax.grid(True, alpha=0.3)
+    if ax.get_legend_handles_labels()[0]:
+        ax.legend(fontsize=8)
+
+
+def render_aquarium_page(section):
+    """Рисует страницу аквариума. Возвращает (итоги, PNG).
+
+    Выполняется в процессе пула, поэтому работает только с Figure и
+    холстом Agg без pyplot.
+    """
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=PAGE_SIZE)
+    figure.suptitle(f"{section['title']} ({section['status']})\n{section['species']}", fontsize=12)
+    axes = figure.subplots(5, 1, sharex=True)
+
+    _plot_lines(axes[0], section["water"], [(1, "Температура")], "Температура, °C")
+    _plot_lines(axes[1], section["water"], [(2, "pH"), (3, "Кислород")], "pH и кислород")
+
+    feedings = section["feedings"]
+    if feedings:
+        axes[2].bar([row[0] for row in feedings], [row[2] or 0 for row in feedings], color="#2980b9")
+    axes[2].set_title("Корм за сутки", fontsize=10)
+    axes[2].grid(True, alpha=0.3)
+
+    _plot_lines(axes[3], section["deaths"], [(1, "Умерло"), (2, "С повреждениями")], "Особи")
+    _plot_lines(axes[4], section["inspections"], [(1, "Баллы")], "Оценка состояния аквариума")
+    axes[4].set_ylim(0, 100)
+
+    figure.autofmt_xdate()
+    figure.tight_layout(rect=(0, 0, 1, 0.95))
+    return summarize(section), _png(figure)
+
+
+def render_farm_page(farm, summaries):
+    """Рисует страницу итогов по ферме: корм и гибель по аквариумам, запасы холодильников"""
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=PAGE_SIZE)
+    figure.suptitle(f"Ферма: {farm['start']:%d.%m.%Y} - {farm['end'] - timedelta(days=1):%d.%m.%Y}",
+                    fontsize=12)
+    axes = figure.subplots(3, 1)
+
+    positions = range(len(summaries))
+    labels = [str(summary["aquarium_id"]) for summary in summaries]
+    # Подписи сотен аквариумов не помещаются: оставляем каждую n-ю
+    step = max(len(labels) // 40, 1)
+    axes[0].bar(positions, [summary["корм"] for summary in summaries], color="#2980b9")
+    axes[0].set_title("Корм за период по аквариумам", fontsize=10)
+    axes[1].bar(positions, [summary["умерших"] for summary in summaries], color="#c0392b")
+    axes[1].set_title("Гибель особей за период по аквариумам", fontsize=10)
+    for ax in axes[:2]:
+        ax.set_xticks(positions[::step])
+        ax.set_xticklabels(labels[::step], fontsize=6, rotation=90)
+
+    stock = {}
+    for name, _, _, quantity, capacity in farm["fridges"]:
+        stock[name] = stock.get(name, 0) + quantity
+    axes[2].barh(list(stock), list(stock.values()), color="#27ae60")
+    axes[2].set_title("Запасы в холодильниках", fontsize=10)
+
+    figure.tight_layout(rect=(0, 0, 1, 0.95))
+    return _png(figure)
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def render_sections(sections, workers=None, progress=None):
+    """Рисует страницы аквариумов, при большом числе - в пуле процессов.
+
+    Процессы запускаются методом spawn: fork процесса с интерфейсом и
+    открытыми соединениями небезопасен. Возвращает [(итоги, PNG)] в
+    порядке разделов.
+    """
+    total = len(sections)
+    if workers == 1 or total < MIN_PARALLEL_SECTIONS:
+        pages = map(render_aquarium_page, sections)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_worker)
+        pages = executor.map(render_aquarium_page, sections, chunksize=CHUNKSIZE)
+    try:
+        result = []
+        for page in pages:
+            result.append(page)
+            if progress is not None:
+                progress(len(result), total)
+        return result
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def _number(value, digits=2):
+    return f"{value:.{digits}f}" if value is not None else "—"
+
+
+def write_html(path, farm, farm_page, pages):
+    """Записывает отчет одним HTML-файлом со встроенными изображениями"""
+    def image(png):
+        return f'<img src="data:image/png;base64,{base64.b64encode(png).decode("ascii")}">'
+
+    title = f"Отчет по ферме за {farm['start']:%d.%m.%Y} - {farm['end'] - timedelta(days=1):%d.%m.%Y}"
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+                   "<style>body{font-family:sans-serif} table{border-collapse:collapse}"
+                   "td,th{border:1px solid #999;padding:2px 6px} td.n{text-align:right}"
+                   "img{max-width:100%}</style></head><body>\n")
+        file.write(f"<h1>{html.escape(title)}</h1>\n{image(farm_page)}\n")
+
+        file.write("<h2>Аквариумы</h2>\n<table><tr><th>Аквариум</th><th>Виды</th><th>Температура</th>"
+                   "<th>pH</th><th>Кислород</th><th>Корм</th><th>Умерло</th><th>Состояние</th></tr>\n")
+        for summary, _ in pages:
+            file.write(
+                f"<tr><td><a href=\"#a{summary['aquarium_id']}\">{html.escape(summary['title'])}</a></td>"
+                f"<td>{html.escape(summary['species'])}</td>"
+                f"<td class=\"n\">{_number(summary['температура'])}</td>"
+                f"<td class=\"n\">{_number(summary['ph'])}</td>"
+                f"<td class=\"n\">{_number(summary['кислород'])}</td>"
+                f"<td class=\"n\">{_number(summary['корм'])}</td>"
+                f"<td class=\"n\">{summary['умерших']}</td>"
+                f"<td class=\"n\">{_number(summary['состояние'], 0)}</td></tr>\n")
+        file.write("</table>\n")
+
+        file.write("<h2>Холодильники</h2>\n<table><tr><th>Морепродукт</th><th>Состояние</th>"
+                   "<th>Холодильников</th><th>Количество</th><th>Вместимость</th></tr>\n")
+        for name, state, count, quantity, capacity in farm["fridges"]:
+            file.write(f"<tr><td>{html.escape(name)}</td><td>{html.escape(state or '')}</td>"
+                       f"<td class=\"n\">{count}</td><td class=\"n\">{quantity}</td>"
+                       f"<td class=\"n\">{capacity}</td></tr>\n")
+        file.write("</table>\n")
+
+        for summary, png in pages:
+            file.write(f"<h2 id=\"a{summary['aquarium_id']}\">{html.escape(summary['title'])}</h2>\n"
+                       f"{image(png)}\n")
+        file.write("</body></html>\n")
+
+
+def write_pdf(path, farm_page, pages):
+    """Собирает готовые страницы в PDF (по странице на аквариум)"""
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.figure import Figure
+    from matplotlib.image import imread
+
+    with PdfPages(path) as pdf:
+        for png in [farm_page] + [png for _, png in pages]:
+            figure = Figure(figsize=PAGE_SIZE, dpi=DPI)
+            figure.figimage(imread(io.BytesIO(png), format="png"))
+            pdf.savefig(figure, dpi=DPI)
+
+
+def generate_report(conn, start, end, path, fmt=None, aquarium_ids=None, workers=None, progress=None):
+    """Строит отчет по ферме за период [start, end) и записывает его в файл.
+
+    Данные читаются несколькими запросами к суточным сводкам (перед
+    вызовом их нужно обновить, см. refresh_rollups), страницы аквариумов
+    рисуются параллельно. Возвращает число аквариумов в отчете.
+    """
+    fmt = detect_format(path, fmt)
+    sections, farm = load_report_data(conn, start, end, aquarium_ids)
+    pages = render_sections(sections, workers, progress)
+    farm_page = render_farm_page(farm, [summary for summary, _ in pages])
+    if fmt == "html":
+        write_html(path, farm, farm_page, pages)
+    else:
+        write_pdf(path, farm_page, pages)
+    return len(pages)
+
+
+def previous_month(today):
+    """Период прошлого месяца: (первый день, первый день текущего месяца)"""
+    month_start = today.replace(day=1)
+    return (month_start - timedelta(days=1)).replace(day=1), month_start
+
+
+def _date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def main(argv=None):
+    from connection import get_reporting_connection
+
+    parser = argparse.ArgumentParser(description="Отчет по ферме: параметры воды, кормления, состояние, запасы")
+    parser.add_argument("-o", "--output", required=True, help="путь к файлу (.html или .pdf)")
+    parser.add_argument("--format", choices=REPORT_FORMATS, help="формат (по умолчанию по расширению)")
+    parser.add_argument("--start", type=_date, help="начало периода, ГГГГ-ММ-ДД (по умолчанию - прошлый месяц)")
+    parser.add_argument("--end", type=_date, help="конец периода, не включается (по умолчанию - по сегодня)")
+    parser.add_argument("--aquarium", type=int, action="append", help="только этот аквариум (можно несколько)")
+    parser.add_argument("--workers", type=int, help="число процессов отрисовки (по умолчанию - по числу ядер)")
+    args = parser.parse_args(argv)
+
+    start, end = previous_month(date.today())
+    if args.start is not None:
+        start, end = args.start, date.today() + timedelta(days=1)
+    end = args.end or end
+    if start >= end:
+        parser.error("начало периода должно быть раньше конца")
+
+    refresh_rollups()
+    conn = get_reporting_connection()
+    try:
+        count = generate_report(conn, start, end, args.output, args.format, args.aquarium, args.workers)
+    finally:
+        conn.close()
+    print(f"Аквариумов в отчете: {count} -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import argparse
+import sys
+
+from psycopg2 import sql
+
+# Сколько исходных строк сворачивать за одну транзакцию
+CHUNK_SIZE = 100000
+
+
+class Rollup:
+    """Описание суточной сводки по исходной таблице.
+
+    aggregates - список (столбец сводки, агрегат, способ слияния), где способ
+    слияния - "sum", "min" или "max": так новая порция строк добавляется
+    к уже накопленным за день значениям без повторного чтения истории.
+    """
+
+    def __init__(self, source, target, id_column, date_column, keys, aggregates):
+        self.source = source
+        self.target = target
+        self.id_column = id_column
+        self.date_column = date_column
+        self.keys = keys
+        self.aggregates = aggregates
+
+
+ROLLUPS = {
+    "параметры_воды": Rollup(
+        "параметры_воды", "сводка_параметров_воды", "parameter_id", "дата_измерения",
+        ["aquarium_id"],
+        [
+            ("количество", "count(*)", "sum"),
+            ("сумма_температуры", "sum(температура)", "sum"),
+            ("количество_температуры", "count(температура)", "sum"),
+            ("мин_температура", "min(температура)", "min"),
+            ("макс_температура", "max(температура)", "max"),
+            ("сумма_ph", "sum(pH)", "sum"),
+            ("количество_ph", "count(pH)", "sum"),
+            ("мин_ph", "min(pH)", "min"),
+            ("макс_ph", "max(pH)", "max"),
+            ("сумма_кислорода", "sum(уровень_кислорода)", "sum"),
+            ("количество_кислорода", "count(уровень_кислорода)", "sum"),
+            ("мин_кислород", "min(уровень_кислорода)", "min"),
+            ("макс_кислород", "max(уровень_кислорода)", "max"),
+        ],
+    ),
+    "кормления": Rollup(
+        "кормления", "сводка_кормлений", "feeding_id", "дата_кормления",
+        ["aquarium_id", "seafood_id"],
+        [
+            ("количество_кормлений", "count(*)", "sum"),
+            ("объем_корма", "sum(общий_объем_корма)", "sum"),
+        ],
+    ),
+    "состояние_особей": Rollup(
+        "состояние_особей", "сводка_состояния_особей", "health_id", "дата_замера",
+        ["aquarium_id", "seafood_id"],
+        [
+            ("количество_замеров", "count(*)", "sum"),
+            ("умерших", "sum(количество_умерших)", "sum"),
+            ("с_повреждениями", "sum(количество_с_повреждениями)", "sum"),
+            ("с_аномальным_поведением", "sum(количество_с_аномальным_поведением)", "sum"),
+            ("сумма_количества", "sum(общее_количество)", "sum"),
+            ("сумма_веса", "sum(средний_текущий_вес)", "sum"),
+            ("сумма_размера", "sum(средний_текущий_размер)", "sum"),
+        ],
+    ),
+}
+
+_MERGE = {
+    "sum": "{t}.{c} + EXCLUDED.{c}",
+    "min": "LEAST({t}.{c}, EXCLUDED.{c})",
+    "max": "GREATEST({t}.{c}, EXCLUDED.{c})",
+}
+
+
+def _rollup_query(rollup):
+    """INSERT ... SELECT ... GROUP BY с добавлением к уже накопленным суткам"""
+    keys = [sql.Identifier(key) for key in rollup.keys]
+    columns = keys + [sql.Identifier("день")] + [sql.Identifier(a[0]) for a in rollup.aggregates]
+    # Ключи без значения сворачиваются в 0: столбцы первичного ключа не допускают NULL
+    select = [sql.SQL("COALESCE({}, 0)").format(key) for key in keys]
+    select.append(sql.SQL("{}::date").format(sql.Identifier(rollup.date_column)))
+    for _, expression, merge in rollup.aggregates:
+        # Сумма пустого набора - NULL, а NULL при слиянии обнулил бы накопленное
+        template = "COALESCE({}, 0)" if merge == "sum" else "{}"
+        select.append(sql.SQL(template.format(expression)))
+    updates = [
+        sql.SQL("{c} = " + _MERGE[merge]).format(t=sql.Identifier(rollup.target), c=sql.Identifier(name))
+        for name, _, merge in rollup.aggregates
+    ]
+    return sql.SQL("""
+        INSERT INTO {target} ({columns})
+        SELECT {select}
+        FROM {source}
+        WHERE {id} > %s AND {id} <= %s
+        GROUP BY {group}
+        ON CONFLICT ({conflict}) DO UPDATE SET {updates}
+    """).format(
+        target=sql.Identifier(rollup.target),
+        columns=sql.SQL(", ").join(columns),
+        select=sql.SQL(", ").join(select),
+        source=sql.Identifier(rollup.source),
+        id=sql.Identifier(rollup.id_column),
+        group=sql.SQL(", ").join(sql.SQL(str(i)) for i in range(1, len(keys) + 2)),
+        conflict=sql.SQL(", ").join(keys + [sql.Identifier("день")]),
+        updates=sql.SQL(", ").join(updates),
+    )
+
+
+def refresh_rollup(conn, table, chunk_size=CHUNK_SIZE):
+    """Добавляет в сводку строки, поступившие после отметки. Возвращает число свернутых строк.
+
+    Отметка - наибольший уже учтенный номер строки исходной таблицы; она
+    хранится в отметки_сводок и сдвигается в той же транзакции, что и
+    сводка, поэтому строка не может быть учтена дважды.
+    """
+    rollup = ROLLUPS[table]
+    query = _rollup_query(rollup)
+    source = sql.Identifier(rollup.source)
+    id_column = sql.Identifier(rollup.id_column)
+
+    try:
+        with conn.cursor() as cursor:
+            # Блокировка SHARE дожидается незавершенных вставок: все номера
+            # не больше полученного максимума уже зафиксированы или отменены
+            cursor.execute(sql.SQL("LOCK TABLE {} IN SHARE MODE").format(source))
+            cursor.execute(sql.SQL("SELECT COALESCE(MAX({}), 0) FROM {}").format(id_column, source))
+            upper = cursor.fetchone()[0]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    processed = 0
+    while True:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO отметки_сводок (таблица) VALUES (%s)
+                    ON CONFLICT (таблица) DO NOTHING
+                """, (table,))
+                # FOR UPDATE: параллельный запуск дождется окончания этой порции
+                cursor.execute("SELECT последний_id FROM отметки_сводок WHERE таблица = %s FOR UPDATE",
+                               (table,))
+                mark = cursor.fetchone()[0]
+                if mark >= upper:
+                    conn.commit()
+                    return processed
+                chunk_end = min(mark + chunk_size, upper)
+                cursor.execute(query, (mark, chunk_end))
+                cursor.execute(sql.SQL("SELECT count(*) FROM {} WHERE {} > %s AND {} <= %s").format(
+                    source, id_column, id_column), (mark, chunk_end))
+                processed += cursor.fetchone()[0]
+                cursor.execute("UPDATE отметки_сводок SET последний_id = %s WHERE таблица = %s",
+                               (chunk_end, table))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def refresh_all(conn, chunk_size=CHUNK_SIZE):
+    """Обновляет все сводки. Возвращает {таблица: число свернутых строк}."""
+    return {table: refresh_rollup(conn, table, chunk_size) for table in ROLLUPS}
+
+
+def daily_water_parameters(conn, aquarium_id, start=None, end=None):
+    """Суточные средние, минимумы и максимумы параметров воды аквариума"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT день,
+                   сумма_температуры / NULLIF(количество_температуры, 0), мин_температура, макс_температура,
+                   сумма_ph / NULLIF(количество_ph, 0), мин_ph, макс_ph,
+                   сумма_кислорода / NULLIF(количество_кислорода, 0), мин_кислород, макс_кислород
+            FROM сводка_параметров_воды
+            WHERE aquarium_id = %s
+              AND (%s::date IS NULL OR день >= %s::date)
+              AND (%s::date IS NULL OR день <= %s::date)
+            ORDER BY день
+        """, (aquarium_id, start, start, end, end))
+        return cursor.fetchall()
+
+
+def weekly_feed_by_species(conn, start=None, end=None):
+    """Объем корма по видам за каждую неделю"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT date_trunc('week', s.день)::date AS неделя,
+                   COALESCE(m.название_вида, 'Не указан'),
+                   SUM(s.количество_кормлений), SUM(s.объем_корма)
+            FROM сводка_кормлений s
+            LEFT JOIN морепродукты m ON m.seafood_id = s.seafood_id
+            WHERE (%s::date IS NULL OR s.день >= %s::date)
+              AND (%s::date IS NULL OR s.день <= %s::date)
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+        """, (start, start, end, end))
+        return cursor.fetchall()
+
+
+def daily_deaths(conn, aquarium_id=None, start=None, end=None):
+    """Число погибших особей по дням (по всей ферме или одному аквариуму)"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT день, SUM(умерших)
+            FROM сводка_состояния_особей
+            WHERE (%s::int IS NULL OR aquarium_id = %s::int)
+              AND (%s::date IS NULL OR день >= %s::date)
+              AND (%s::date IS NULL OR день <= %s::date)
+            GROUP BY день
+            ORDER BY день
+        """, (aquarium_id, aquarium_id, start, start, end, end))
+        return cursor.fetchall()
+
+
+def main(argv=None):
+    from connection import get_db_connection
+
+    parser = argparse.ArgumentParser(description="Обновление суточных сводок (запускается по расписанию)")
+    parser.add_argument("--table", choices=sorted(ROLLUPS), action="append",
+                        help="обновить только сводку по этой таблице")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    try:
+        for table in args.table or ROLLUPS:
+            print(f"{table}: свернуто строк {refresh_rollup(conn, table)}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
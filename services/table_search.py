@@ -0,0 +1,139 @@
+from psycopg2 import sql
+
+PAGE_SIZE = 100
+
+
+class TableQuery:
+    """Описание выборки для вкладки: базовый запрос, столбцы поиска и фильтра.
+
+    Поиск выполняется через ILIKE по столбцам с триграммными индексами,
+    фильтр - сравнением на равенство по индексированному столбцу.
+    Последний столбец выборки - версия строки (xmin) для проверки
+    одновременного редактирования при сохранении.
+    """
+
+    def __init__(self, select, search_columns, filter_column, filter_source):
+        self.select = select
+        self.search_columns = search_columns
+        self.filter_column = filter_column
+        self.filter_source = filter_source  # (таблица, столбец) для списка значений фильтра
+
+    def build(self, search=None, filter_value=None):
+        """Возвращает (условие WHERE, параметры) для заданных поиска и фильтра"""
+        conditions = []
+        params = []
+
+        if search:
+            # Символы шаблона во введенном тексте ищутся буквально
+            escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            pattern = f"%{escaped}%"
+            conditions.append(sql.SQL("({})").format(sql.SQL(" OR ").join(
+                sql.SQL("{} ILIKE %s ESCAPE '\\'").format(sql.SQL(column)) for column in self.search_columns
+            )))
+            params.extend([pattern] * len(self.search_columns))
+
+        if filter_value is not None:
+            conditions.append(sql.SQL("{} = %s").format(sql.SQL(self.filter_column)))
+            params.append(filter_value)
+
+        if not conditions:
+            return sql.SQL(""), params
+        return sql.SQL(" WHERE ") + sql.SQL(" AND ").join(conditions), params
+
+
+AQUARIUMS = TableQuery(
+    select="""
+        SELECT a.aquarium_id, a.тип_аквариума, u.имя_пользователя,
+               a.объем, a.статус, m.название_вида,
+               a.xmin::text AS версия
+        FROM аквариумы a
+        LEFT JOIN пользователи u ON a.ответственный_пользователь = u.user_id
+        -- Виды аквариума одной строкой: у страниц остается уникальный ключ aquarium_id
+        LEFT JOIN LATERAL (
+            SELECT string_agg(название_вида, ', ' ORDER BY seafood_id) AS название_вида
+            FROM морепродукты
+            WHERE aquarium_id = a.aquarium_id
+        ) m ON true
+    """,
+    search_columns=["u.имя_пользователя", "m.название_вида"],
+    filter_column="a.статус",
+    filter_source=("аквариумы", "статус"),
+)
+
+SEAFOOD = TableQuery(
+    select="""
+        SELECT m.seafood_id, m.название_вида, m.нормальный_вес,
+               m.нормальный_размер, m.тип_корма, m.норма_корма_на_одну_особь,
+               m.уровень_смертности_группы, m.aquarium_id,
+               m.xmin::text AS версия
+        FROM морепродукты m
+    """,
+    search_columns=["m.название_вида"],
+    filter_column="m.тип_корма",
+    filter_source=("морепродукты", "тип_корма"),
+)
+
+USERS = TableQuery(
+    select="""
+        SELECT u.user_id, u.имя_пользователя, u.роль_пользователя, u.логин,
+               u.xmin::text AS версия
+        FROM пользователи u
+    """,
+    search_columns=["u.имя_пользователя", "u.логин"],
+    filter_column="u.роль_пользователя",
+    filter_source=("пользователи", "роль_пользователя"),
+)
+
+REFRIGERATORS = TableQuery(
+    select="""
+        SELECT f.fridge_id, m.название_вида, f.количество,
+               f.срок_хранения, f.состояние_холодильника,
+               f.дата_последней_проверки, f.вместимость,
+               f.xmin::text AS версия
+        FROM холодильники f
+        LEFT JOIN морепродукты m ON f.seafood_id = m.seafood_id
+    """,
+    search_columns=["m.название_вида"],
+    filter_column="f.состояние_холодильника",
+    filter_source=("холодильники", "состояние_холодильника"),
+)
+
+
+def fetch_page(conn, table_query, search=None, filter_value=None, page=0, page_size=PAGE_SIZE):
+    """Возвращает (строки страницы, общее число найденных строк, номер страницы).
+
+    Если запрошенная страница оказалась за концом выборки (например, строки
+    удалены), возвращается последняя непустая страница.
+    """
+    where, params = table_query.build(search, filter_value)
+    # Первый столбец каждой выборки - идентификатор записи, по нему и сортируем
+    query = sql.SQL("SELECT *, count(*) OVER () FROM ({}{}) t ORDER BY 1 LIMIT %s OFFSET %s").format(
+        sql.SQL(table_query.select), where
+    )
+    with conn.cursor() as cursor:
+        cursor.execute(query, params + [page_size, page * page_size])
+        rows = cursor.fetchall()
+        if not rows and page > 0:
+            cursor.execute(sql.SQL("SELECT count(*) FROM ({}{}) t").format(
+                sql.SQL(table_query.select), where), params)
+            total = cursor.fetchone()[0]
+            if total == 0:
+                return [], 0, 0
+            page = (total - 1) // page_size
+            cursor.execute(query, params + [page_size, page * page_size])
+            rows = cursor.fetchall()
+
+    if not rows:
+        return [], 0, 0
+    total = rows[0][-1]
+    return [row[:-1] for row in rows], total, page
+
+
+def filter_values(conn, table_query):
+    """Возвращает список значений для выпадающего фильтра"""
+    table, column = table_query.filter_source
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("""
+            SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL ORDER BY 1
+        """).format(column=sql.Identifier(column), table=sql.Identifier(table)))
+        return [row[0] for row in cursor.fetchall()]
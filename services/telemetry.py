@@ -0,0 +1,414 @@
+import argparse
+import asyncio
+import io
+import json
+import math
+import random
+import signal
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import psycopg2
+
+from services.anomaly import process_new_readings
+
+# Параметры по умолчанию
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+BATCH_SIZE = 5000  # Сколько показаний записывать за один COPY
+FLUSH_INTERVAL = 0.5  # Максимальная задержка записи, секунды
+MAX_PENDING = 50000  # Сколько показаний можно держать в памяти до включения обратного давления
+STATS_INTERVAL = 10  # Как часто выводить метрики, секунды
+AQUARIUMS_REFRESH_INTERVAL = 30  # Как часто перечитывать список аквариумов, секунды
+DEAD_LETTER_PATH = "telemetry_rejected.jsonl"  # Показания, отвергнутые базой
+
+# Допустимые значения: границы типов столбцов параметры_воды
+# (DECIMAL(5,2), DECIMAL(3,2), DECIMAL(4,2)) и физический смысл величин
+TEMPERATURE_RANGE = (-50.0, 999.99)
+PH_RANGE = (0.0, 9.99)
+OXYGEN_RANGE = (0.0, 99.99)
+
+COPY_SQL = """
+    COPY параметры_воды (aquarium_id, дата_измерения, температура, pH, уровень_кислорода)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+
+def parse_reading(line):
+    """Разбирает строку JSON с показаниями датчиков.
+
+    Формат: {"aquarium_id": 1, "temperature": 25.1, "ph": 7.2, "oxygen": 8.4,
+    "ts": "2024-05-01T12:00:00"} (ts - необязательно, по умолчанию время приема).
+    Возвращает кортеж (aquarium_id, время, температура, pH, кислород).
+    Значения вне допустимых диапазонов вызывают ValueError.
+    """
+    data = json.loads(line)
+    if not isinstance(data, dict):
+        raise ValueError("показание должно быть объектом JSON")
+    ts = data.get("ts")
+    if ts is None:
+        measured_at = datetime.now()
+    elif isinstance(ts, (int, float)):
+        measured_at = datetime.fromtimestamp(ts)
+    else:
+        measured_at = datetime.fromisoformat(ts)
+    return (
+        int(data["aquarium_id"]),
+        measured_at,
+        _checked(data["temperature"], TEMPERATURE_RANGE, "temperature"),
+        _checked(data["ph"], PH_RANGE, "ph"),
+        _checked(data["oxygen"], OXYGEN_RANGE, "oxygen"),
+    )
+
+
+def _checked(value, limits, name):
+    # Округляем как база (до сотых), чтобы 9.996 не превратилось в недопустимое 10.00
+    value = round(float(value), 2)
+    if not math.isfinite(value) or not limits[0] <= value <= limits[1]:
+        raise ValueError(f"{name}={value} вне диапазона {limits[0]}..{limits[1]}")
+    return value
+
+
+class WriteInterrupted(Exception):
+    """Запись прервана ошибкой соединения; remaining - еще не записанные показания"""
+
+    def __init__(self, remaining, written, error):
+        super().__init__(str(error))
+        self.remaining = remaining
+        self.written = written
+
+
+class TelemetryIngestor:
+    """Буферизует показания по аквариумам и записывает их в базу пачками.
+
+    Запись выполняется через COPY в отдельном потоке, чтобы не блокировать
+    цикл событий. Когда в памяти накапливается max_pending показаний,
+    submit() перестает возвращать управление до очередной записи - чтение
+    из сокетов приостанавливается, и отправители упираются в TCP-окно.
+    """
+
+    def __init__(self, connect, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_pending=MAX_PENDING, dead_letter_path=DEAD_LETTER_PATH):
+        self.connect = connect
+        self.dead_letter_path = dead_letter_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self.buffers = defaultdict(list)
+        self.pending = 0
+        self.oldest_received = None  # Время приема самого старого незаписанного показания
+
+        self.has_space = asyncio.Event()
+        self.has_space.set()
+        self.batch_ready = asyncio.Event()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="telemetry-db")
+        self.conn = None
+        self.aquariums = None  # Существующие аквариумы (None - список еще не загружен)
+        self.aquariums_loaded = 0.0
+
+        # Метрики
+        self.started = time.monotonic()
+        self.received = 0
+        self.rejected = 0
+        self.written = 0
+        self.dead_lettered = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.last_flush_seconds = 0.0
+        self.last_lag = 0.0
+
+    async def submit(self, reading):
+        """Добавляет показание в буфер аквариума, ожидая свободного места.
+
+        Показания несуществующих аквариумов отбрасываются (считаются в rejected).
+        """
+        if self.aquariums is not None and reading[0] not in self.aquariums:
+            self.rejected += 1
+            return
+        while self.pending >= self.max_pending:
+            self.has_space.clear()
+            await self.has_space.wait()
+
+        if self.pending == 0:
+            self.oldest_received = time.monotonic()
+        self.buffers[reading[0]].append(reading)
+        self.pending += 1
+        self.received += 1
+        if self.pending >= self.batch_size:
+            self.batch_ready.set()
+
+    def submit_line(self, line):
+        """Разбирает строку; возвращает показание или None для некорректных данных"""
+        try:
+            return parse_reading(line)
+        except (ValueError, KeyError, TypeError, OverflowError, OSError):
+            # OverflowError и OSError - числа вне диапазона (1e400, ts=1e20)
+            self.rejected += 1
+            return None
+
+    async def run_flusher(self):
+        """Записывает буферы по достижении размера пачки или по таймеру"""
+        while True:
+            try:
+                await asyncio.wait_for(self.batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+        buffers, self.buffers = self.buffers, defaultdict(list)
+        count, self.pending = self.pending, 0
+        self.last_lag = time.monotonic() - self.oldest_received
+        self.oldest_received = None
+        self.batch_ready.clear()
+
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        readings = [reading for group in buffers.values() for reading in group]
+        try:
+            written = await loop.run_in_executor(self.executor, self._write, readings)
+        except WriteInterrupted as e:
+            # База недоступна: возвращаем незаписанные показания в буфер и повторим
+            # запись позже; пока буфер полон, прием приостановлен обратным давлением
+            print(f"Ошибка записи показаний: {e}", file=sys.stderr)
+            self.failed_batches += 1
+            self.written += e.written
+            remaining = defaultdict(list)
+            for reading in e.remaining:
+                remaining[reading[0]].append(reading)
+            for aquarium_id, group in remaining.items():
+                self.buffers[aquarium_id][:0] = group
+            self.pending += len(e.remaining)
+            self.oldest_received = time.monotonic() - self.last_lag
+            await asyncio.sleep(1)
+            return
+        self.last_flush_seconds = time.monotonic() - started
+        self.written += written
+        self.dead_lettered += count - written
+        self.batches += 1
+        self.has_space.set()
+
+    def _write(self, readings):
+        """Записывает показания (выполняется в потоке записи). Возвращает число записанных.
+
+        Пачка пишется одним COPY. Если база отвергает данные (ошибка данных
+        или ссылочной целостности), пачка делится пополам, пока не останутся
+        отдельные ошибочные показания; они уходят в файл отвергнутых, а
+        остальные записываются. Ошибки соединения прерывают запись
+        исключением WriteInterrupted с еще не записанными показаниями.
+        """
+        chunks = [readings]
+        written = 0
+        while chunks:
+            chunk = chunks.pop()
+            try:
+                self._refresh_aquariums()
+                self._copy(chunk)
+            except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+                if len(chunk) == 1:
+                    self._dead_letter(chunk[0], e)
+                else:
+                    middle = len(chunk) // 2
+                    chunks.append(chunk[middle:])
+                    chunks.append(chunk[:middle])
+                continue
+            except Exception as e:
+                if self.conn is not None:
+                    self.conn.close()
+                self.conn = None
+                remaining = chunk + [reading for rest in reversed(chunks) for reading in rest]
+                raise WriteInterrupted(remaining, written, e) from e
+            written += len(chunk)
+
+        # Показания уже записаны, поэтому ошибка детектора не должна вернуть их в буфер
+        try:
+            process_new_readings(self.conn, list({reading[0] for reading in readings}))
+        except Exception as e:
+            self.conn.rollback()
+            print(f"Ошибка поиска аномалий: {e}", file=sys.stderr)
+        return written
+
+    def _copy(self, readings):
+        if self.conn is None or self.conn.closed:
+            self.conn = self.connect()
+
+        data = io.StringIO()
+        for aquarium_id, measured_at, temperature, ph, oxygen in readings:
+            data.write(f"{aquarium_id},{measured_at.isoformat(sep=' ')},{temperature},{ph},{oxygen}\n")
+        data.seek(0)
+
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.copy_expert(COPY_SQL, data)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def _refresh_aquariums(self):
+        """Перечитывает список аквариумов для проверки показаний в submit()"""
+        if self.aquariums is not None and time.monotonic() - self.aquariums_loaded < AQUARIUMS_REFRESH_INTERVAL:
+            return
+        if self.conn is None or self.conn.closed:
+            self.conn = self.connect()
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT aquarium_id FROM аквариумы")
+            aquariums = {row[0] for row in cursor.fetchall()}
+        self.conn.rollback()
+        self.aquariums = aquariums  # Замена целиком: submit() читает множество из цикла событий
+        self.aquariums_loaded = time.monotonic()
+
+    def _dead_letter(self, reading, error):
+        """Дописывает отвергнутое базой показание в файл (строка JSON)"""
+        aquarium_id, measured_at, temperature, ph, oxygen = reading
+        print(f"Показание отвергнуто базой: {reading}: {error}", file=sys.stderr)
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "aquarium_id": aquarium_id, "ts": measured_at.isoformat(),
+                "temperature": temperature, "ph": ph, "oxygen": oxygen,
+                "error": str(error).strip(),
+            }, ensure_ascii=False) + "\n")
+
+    def metrics(self):
+        """Текущие метрики: пропускная способность, задержка записи, размер буфера"""
+        uptime = max(time.monotonic() - self.started, 1e-9)
+        current_lag = time.monotonic() - self.oldest_received if self.oldest_received else 0.0
+        return {
+            "received": self.received,
+            "written": self.written,
+            "rejected": self.rejected,
+            "dead_lettered": self.dead_lettered,
+            "pending": self.pending,
+            "aquariums_buffered": len(self.buffers),
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "received_per_second": round(self.received / uptime, 1),
+            "written_per_second": round(self.written / uptime, 1),
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+            "lag_seconds": round(max(current_lag, self.last_lag), 4),
+        }
+
+    async def handle_client(self, reader, writer):
+        """Обрабатывает подключение: одна строка JSON - одно показание.
+
+        Строка STATS возвращает текущие метрики в формате JSON.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                if line == b"STATS":
+                    writer.write(json.dumps(self.metrics()).encode("utf-8") + b"\n")
+                    await writer.drain()
+                    continue
+                reading = self.submit_line(line)
+                if reading is not None:
+                    await self.submit(reading)
+        finally:
+            writer.close()
+
+    async def close(self):
+        await self.flush()
+        self.executor.shutdown(wait=True)
+        if self.conn is not None:
+            self.conn.close()
+
+
+async def simulate_readings(ingestor, rate, aquariums):
+    """Заменитель брокера: генерирует показания с заданной частотой (в секунду)"""
+    tick = 0.01
+    per_tick = max(1, int(rate * tick))
+    while True:
+        started = time.monotonic()
+        for _ in range(per_tick):
+            await ingestor.submit((
+                random.randint(1, aquariums),
+                datetime.now(),
+                round(random.gauss(25, 0.5), 2),
+                round(random.gauss(7.2, 0.1), 2),
+                round(random.gauss(8, 0.4), 2),
+            ))
+        await asyncio.sleep(max(0.0, tick - (time.monotonic() - started)))
+
+
+async def report_metrics(ingestor, interval=STATS_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        stamp = datetime.now(timezone.utc).strftime("%H:%M:%S")
+        print(f"[{stamp}] {json.dumps(ingestor.metrics(), ensure_ascii=False)}", flush=True)
+
+
+async def serve(args):
+    from connection import get_db_connection
+
+    ingestor = TelemetryIngestor(get_db_connection, args.batch_size, args.flush_interval,
+                                 args.max_pending, args.dead_letter)
+    tasks = [
+        asyncio.create_task(ingestor.run_flusher()),
+        asyncio.create_task(report_metrics(ingestor, args.stats_interval)),
+    ]
+
+    if args.simulate:
+        tasks.append(asyncio.create_task(simulate_readings(ingestor, args.simulate, args.aquariums)))
+        server = None
+        print(f"Генерация показаний: {args.simulate} в секунду для {args.aquariums} аквариумов")
+    elif args.unix:
+        server = await asyncio.start_unix_server(ingestor.handle_client, path=args.unix)
+        print(f"Прием показаний на сокете {args.unix}")
+    else:
+        server = await asyncio.start_server(ingestor.handle_client, args.host, args.port)
+        print(f"Прием показаний на {args.host}:{args.port}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    try:
+        await stop.wait()
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+        for task in tasks:
+            task.cancel()
+        await ingestor.close()
+        print(f"Остановлено. {json.dumps(ingestor.metrics(), ensure_ascii=False)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервис приема показаний датчиков аквариумов")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="путь к unix-сокету вместо TCP")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL)
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING)
+    parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL)
+    parser.add_argument("--dead-letter", default=DEAD_LETTER_PATH,
+                        help="файл для показаний, отвергнутых базой")
+    parser.add_argument("--simulate", type=int, metavar="RATE",
+                        help="не слушать сокет, а генерировать RATE показаний в секунду")
+    parser.add_argument("--aquariums", type=int, default=10,
+                        help="число аквариумов для генератора показаний")
+    args = parser.parse_args(argv)
+
+    asyncio.run(serve(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())